@@ -0,0 +1,328 @@
+# alerts.py
+"""User-defined weather alerts, evaluated incrementally on every refresh.
+
+A rule watches one field for one city (or for every city):
+
+    threshold   temp > 35, humidity >= 90, wind > 15 ...
+    trend       temp falls by 8 within 3 hours, wind rises by 10 within 1 hour
+
+AlertEngine.update(city, values) is called with a city's latest values
+whenever it is refreshed (the searched city and the watchlist). Only rules
+on fields whose value changed are looked at, and of the threshold rules
+only those whose threshold lies between the old and the new value, since
+no other rule can have changed state. Trend rules on a changed field are
+all evaluated.
+
+An alert fires when a rule becomes true for a city; it does not fire again
+while the rule stays true, nor more than once per Config.ALERT_COOLDOWN
+seconds for the same rule and city, so a value hovering around a threshold
+does not flood the user. Values are metric, like the service's data.
+"""
+
+import bisect
+import operator
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import units
+from config import Config
+from weather_service import location_key
+
+FIELDS = {
+    "temp": "Temperature",
+    "wind": "Wind speed",
+    "humidity": "Humidity",
+    "pop": "Precipitation chance",
+}
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+TRENDS = ("rises", "falls")
+
+
+class Rule(NamedTuple):
+    """An alert condition; value and window are metric units and seconds."""
+    field: str
+    op: str  # one of OPERATORS or TRENDS
+    value: float  # threshold, or the change a trend must reach
+    window: float = 0  # seconds a trend is measured over
+    city: Optional[str] = None  # None for every city
+    name: str = ""
+
+
+class Alert(NamedTuple):
+    """A rule that became true for a city."""
+    rule: Rule
+    city: str
+    value: float  # the field's current value
+    change: Optional[float]  # the change over the window, for trend rules
+    ts: float
+
+
+DEFAULT_RULES = [Rule("temp", ">", 35, name="High temperature")]
+
+
+def validate(rule: Rule) -> Rule:
+    """Return rule with its value as a float, or raise ValueError."""
+    if rule.field not in FIELDS:
+        raise ValueError(f"Unknown field {rule.field!r}; expected one of {', '.join(FIELDS)}")
+    if rule.op not in OPERATORS and rule.op not in TRENDS:
+        raise ValueError(f"Unknown condition {rule.op!r}")
+    if rule.op in TRENDS and (rule.window <= 0 or rule.value <= 0):
+        raise ValueError("A trend needs a positive change and time window")
+    return rule._replace(value=float(rule.value), window=float(rule.window))
+
+
+def observation(weather: Dict, forecast: Optional[Dict] = None) -> Dict[str, float]:
+    """The alert fields of a current-weather response (and the next forecast step for pop)."""
+    main = weather.get("main", {})
+    values = {
+        "temp": main.get("temp"),
+        "wind": weather.get("wind", {}).get("speed"),
+        "humidity": main.get("humidity"),
+    }
+    steps = (forecast or {}).get("list", [])
+    if steps:
+        values["pop"] = steps[0].get("pop", 0) * 100
+    return {field: value for field, value in values.items() if value is not None}
+
+
+# Display units
+
+def to_display(field: str, value: float, unit_system: str, delta: bool = False) -> float:
+    """A metric value (or difference, for trends) of field in unit_system."""
+    if field == "temp":
+        if delta:
+            return value * 9 / 5 if unit_system == "imperial" else value
+        return units.convert_temp(value, unit_system)
+    if field == "wind":
+        return units.convert_wind(value, unit_system)
+    return value
+
+
+def from_display(field: str, value: float, unit_system: str, delta: bool = False) -> float:
+    """The metric value (or difference, for trends) of field entered in unit_system."""
+    if field == "temp":
+        if delta:
+            return value * 5 / 9 if unit_system == "imperial" else value
+        return units.to_celsius(value, unit_system)
+    if field == "wind":
+        return units.to_meters_per_second(value, unit_system)
+    return value
+
+
+def format_value(field: str, value: float, unit_system: str, delta: bool = False) -> str:
+    shown = to_display(field, value, unit_system, delta)
+    if field == "temp":
+        return f"{shown:.1f}{units.temp_symbol(unit_system)}"
+    if field == "wind":
+        return f"{shown:.1f} {units.WIND_SYMBOLS[unit_system]}"
+    return f"{shown:.0f}%"
+
+
+def describe_rule(rule: Rule, unit_system: str) -> str:
+    """e.g. 'Temperature > 95.0°F' or 'Wind speed rises by 10.0 m/s within 1 h (Oslo)'."""
+    label = FIELDS[rule.field]
+    if rule.op in TRENDS:
+        hours = rule.window / 3600
+        text = (f"{label} {rule.op} by {format_value(rule.field, rule.value, unit_system, delta=True)} "
+                f"within {hours:g} h")
+    else:
+        text = f"{label} {rule.op} {format_value(rule.field, rule.value, unit_system)}"
+    return f"{text} ({rule.city})" if rule.city else text
+
+
+def describe(alert: Alert, unit_system: str) -> str:
+    """e.g. 'Cairo: High temperature, 38.2°C (Temperature > 35.0°C)'."""
+    rule = alert.rule
+    value = format_value(rule.field, alert.value, unit_system)
+    if alert.change is not None:
+        value += f", {'+' if rule.op == 'rises' else '-'}{format_value(rule.field, alert.change, unit_system, True)}"
+    title = f"{rule.name}, " if rule.name else ""
+    return f"{alert.city}: {title}{value} ({describe_rule(rule._replace(city=None), unit_system)})"
+
+
+def rules_from_json(items: Iterable[Dict]) -> List[Rule]:
+    """Rules saved with rules_to_json(); invalid entries are skipped."""
+    rules = []
+    for item in items:
+        try:
+            rules.append(validate(Rule(**item)))
+        except (TypeError, ValueError):
+            continue
+    return rules
+
+
+def rules_to_json(rules: Iterable[Rule]) -> List[Dict]:
+    return [rule._asdict() for rule in rules]
+
+
+class _ThresholdIndex:
+    """Threshold rules of one field and scope, sorted by threshold."""
+
+    def __init__(self):
+        self.values: List[float] = []
+        self.rules: List[Rule] = []
+
+    def add(self, rule: Rule):
+        index = bisect.bisect_right(self.values, rule.value)
+        self.values.insert(index, rule.value)
+        self.rules.insert(index, rule)
+
+    def remove(self, rule: Rule):
+        index = self.rules.index(rule)
+        del self.values[index]
+        del self.rules[index]
+
+    def between(self, low: float, high: float) -> List[Rule]:
+        """Rules with low <= threshold <= high."""
+        return self.rules[bisect.bisect_left(self.values, low):bisect.bisect_right(self.values, high)]
+
+
+class AlertEngine:
+    """Evaluates rules against city updates (see module docstring)."""
+
+    def __init__(self, rules: Iterable[Rule] = (), cooldown: float = Config.ALERT_COOLDOWN, clock=time.time):
+        self.cooldown = cooldown
+        self.clock = clock
+        self.rules: List[Rule] = []
+        # field -> city key (None for every city) -> rules
+        self._thresholds: Dict[str, Dict[Optional[str], _ThresholdIndex]] = {}
+        self._trends: Dict[str, Dict[Optional[str], List[Rule]]] = {}
+        self._windows: Dict[str, float] = {}  # field -> longest trend window
+        # city key -> field -> latest value, and recent (ts, value) for trend fields
+        self._values: Dict[str, Dict[str, float]] = {}
+        self._recent: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+        self._names: Dict[str, str] = {}  # city key -> name as last given
+        self._active: Set[Tuple[Rule, str]] = set()
+        self._fired: Dict[Tuple[Rule, str], float] = {}
+        # (city key, field, window) -> (min, max) of recent values; valid until the next update
+        self._extremes: Dict[Tuple[str, str, float], Tuple[float, float]] = {}
+        self.evaluations = 0
+        self.skipped = 0
+        self.suppressed = 0
+        for rule in rules:
+            self.add_rule(rule)
+
+    # Rules
+
+    def _scope(self, rule: Rule) -> Optional[str]:
+        return location_key(rule.city) if rule.city else None
+
+    def add_rule(self, rule: Rule) -> List[Alert]:
+        """Add a rule; returns the alerts it raises for cities already seen."""
+        rule = validate(rule)
+        if rule in self.rules:
+            return []
+        self.rules.append(rule)
+        scope = self._scope(rule)
+        if rule.op in TRENDS:
+            self._trends.setdefault(rule.field, {}).setdefault(scope, []).append(rule)
+            self._windows[rule.field] = max(self._windows.get(rule.field, 0), rule.window)
+        else:
+            self._thresholds.setdefault(rule.field, {}).setdefault(scope, _ThresholdIndex()).add(rule)
+
+        now = self.clock()
+        self._extremes = {}
+        alerts = []
+        for key, values in self._values.items():
+            if rule.field in values and scope in (None, key):
+                alert = self._check(rule, key, values[rule.field], now)
+                if alert:
+                    alerts.append(alert)
+        return alerts
+
+    def remove_rule(self, rule: Rule):
+        if rule not in self.rules:
+            return
+        self.rules.remove(rule)
+        scope = self._scope(rule)
+        if rule.op in TRENDS:
+            self._trends[rule.field][scope].remove(rule)
+            self._windows[rule.field] = max(
+                (other.window for other in self.rules if other.field == rule.field and other.op in TRENDS),
+                default=0,
+            )
+        else:
+            self._thresholds[rule.field][scope].remove(rule)
+        self._active = {state for state in self._active if state[0] != rule}
+        self._fired = {state: ts for state, ts in self._fired.items() if state[0] != rule}
+
+    # Evaluation
+
+    def update(self, city: str, values: Dict[str, float], ts: Optional[float] = None) -> List[Alert]:
+        """Record a city's latest values and return the alerts that fire."""
+        ts = self.clock() if ts is None else ts
+        key = location_key(city)
+        self._names[key] = city
+        latest = self._values.setdefault(key, {})
+        alerts = []
+        for field, value in values.items():
+            if field not in FIELDS or value is None:
+                continue
+            window = self._windows.get(field)
+            if window:
+                recent = self._recent.setdefault((key, field), deque())
+                recent.append((ts, value))
+                while recent[0][0] < ts - window:
+                    recent.popleft()
+            old = latest.get(field)
+            latest[field] = value
+            self._extremes = {}
+            for rule in self._candidates(field, key, old, value):
+                alert = self._check(rule, key, value, ts)
+                if alert:
+                    alerts.append(alert)
+        return alerts
+
+    def _scoped(self, rules_by_scope: Dict, key: str) -> list:
+        return [rules_by_scope[scope] for scope in (None, key) if scope in rules_by_scope]
+
+    def _candidates(self, field: str, key: str, old: Optional[float], new: float) -> List[Rule]:
+        """Rules on field for this city whose state may differ between old and new."""
+        thresholds = self._scoped(self._thresholds.get(field, {}), key)
+        trends = self._scoped(self._trends.get(field, {}), key)
+        total = sum(len(index.rules) for index in thresholds) + sum(len(rules) for rules in trends)
+        if old == new:
+            self.skipped += total
+            return []
+        candidates = [rule for rules in trends for rule in rules]
+        for index in thresholds:
+            if old is None:
+                candidates += index.rules
+            else:
+                candidates += index.between(min(old, new), max(old, new))
+        self.skipped += total - len(candidates)
+        return candidates
+
+    def _check(self, rule: Rule, key: str, value: float, ts: float) -> Optional[Alert]:
+        self.evaluations += 1
+        change = None
+        if rule.op in TRENDS:
+            span = (key, rule.field, rule.window)
+            extremes = self._extremes.get(span)
+            if extremes is None:
+                window = [v for t, v in self._recent.get((key, rule.field), ()) if t >= ts - rule.window]
+                extremes = self._extremes[span] = (min(window), max(window)) if window else ()
+            if extremes:
+                change = value - extremes[0] if rule.op == "rises" else extremes[1] - value
+            hit = change is not None and change >= rule.value
+        else:
+            hit = OPERATORS[rule.op](value, rule.value)
+
+        state = (rule, key)
+        if not hit:
+            self._active.discard(state)
+            return None
+        if state in self._active:
+            return None  # still true; already reported
+        self._active.add(state)
+        fired = self._fired.get(state)
+        if fired is not None and ts - fired < self.cooldown:
+            self.suppressed += 1
+            return None
+        self._fired[state] = ts
+        return Alert(rule, self._names.get(key, key), value, change, ts)
+
+    def active(self) -> List[Tuple[Rule, str]]:
+        """(rule, city) pairs whose condition currently holds."""
+        return [(rule, self._names.get(key, key)) for rule, key in self._active]
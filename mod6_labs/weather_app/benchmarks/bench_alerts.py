@@ -0,0 +1,118 @@
+# bench_alerts.py
+"""Cost of evaluating alert rules on every refresh of many cities.
+
+Creates --rules rules (a fifth for every city, the rest for one city each;
+mostly thresholds, some trends) over --cities cities, then runs --rounds
+refreshes of every city. Each refresh is a 10-minute step: temperature and
+wind drift, humidity moves by whole percents and the precipitation chance
+only changes when a new 3-hour forecast step begins.
+
+    every rule     evaluate every rule for the city on each refresh
+    incremental    AlertEngine: rules on changed fields, and of threshold
+                   rules only those whose threshold was crossed
+
+Usage:
+    python benchmarks/bench_alerts.py [--rules 5000] [--cities 300] [--rounds 36]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from alerts import OPERATORS, TRENDS, AlertEngine, Rule  # noqa: E402
+
+RANGES = {"temp": (-10, 40), "wind": (0, 25), "humidity": (10, 100), "pop": (0, 100)}
+
+
+class EveryRuleEngine(AlertEngine):
+    """Evaluates every rule in scope on every refresh, changed or not."""
+
+    def _candidates(self, field, key, old, new):
+        thresholds = self._scoped(self._thresholds.get(field, {}), key)
+        trends = self._scoped(self._trends.get(field, {}), key)
+        return [rule for index in thresholds for rule in index.rules] + [rule for rules in trends for rule in rules]
+
+
+def make_rules(count, cities, rng):
+    rules = set()
+    while len(rules) < count:
+        field = rng.choice(list(RANGES))
+        low, high = RANGES[field]
+        city = None if rng.random() < 0.2 else rng.choice(cities)
+        if rng.random() < 0.15 and field != "pop":
+            rules.add(Rule(field, rng.choice(TRENDS), round(rng.uniform(3, 10), 1),
+                           rng.choice((1, 3, 6)) * 3600, city))
+        else:
+            rules.add(Rule(field, rng.choice(list(OPERATORS)), round(rng.uniform(low, high), 1), 0, city))
+    return list(rules)
+
+
+def make_updates(cities, rounds, rng):
+    state = {city: {field: rng.uniform(*RANGES[field]) for field in RANGES} for city in cities}
+    updates = []
+    for step in range(rounds):
+        batch = []
+        for city in cities:
+            values = state[city]
+            values["temp"] += rng.gauss(0, 0.4)
+            values["wind"] = max(0.0, values["wind"] + rng.gauss(0, 0.5))
+            values["humidity"] = min(100, max(0, values["humidity"] + rng.choice((-1, 0, 0, 1))))
+            if step % 18 == 0:
+                values["pop"] = rng.uniform(0, 100)
+            batch.append((city, {
+                "temp": round(values["temp"], 2),
+                "wind": round(values["wind"], 2),
+                "humidity": int(values["humidity"]),
+                "pop": round(values["pop"]),
+            }))
+        updates.append((step * 600, batch))
+    return updates
+
+
+def run(engine_class, rules, updates):
+    """Returns the engine, alerts fired, first-round seconds, and evaluations and seconds of the rest."""
+    engine = engine_class(rules, cooldown=3600, clock=lambda: 0)
+    fired = 0
+    first = first_evaluations = 0.0
+    start = time.perf_counter()
+    for round_number, (ts, batch) in enumerate(updates):
+        for city, values in batch:
+            fired += len(engine.update(city, values, ts))
+        if round_number == 0:
+            first = time.perf_counter() - start
+            first_evaluations = engine.evaluations
+            start = time.perf_counter()
+    return engine, fired, first, engine.evaluations - first_evaluations, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=36, help="refreshes of every city, 10 minutes apart")
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    cities = [f"City {i}" for i in range(args.cities)]
+    rules = make_rules(args.rules, cities, rng)
+    updates = make_updates(cities, args.rounds, rng)
+
+    print(f"{args.rules} rules, {args.cities} cities, {args.rounds} refresh rounds\n")
+    print(f"{'':<12} {'first ms':>9} {'evals/round':>12} {'ms/round':>9} {'us/city':>8} {'alerts':>7} "
+          f"{'suppressed':>11}")
+    later = args.rounds - 1
+    for label, engine_class in (("every rule", EveryRuleEngine), ("incremental", AlertEngine)):
+        engine, fired, first, evaluations, elapsed = run(engine_class, rules, updates)
+        print(f"{label:<12} {first * 1000:>9.1f} {evaluations / later:>12.0f} {elapsed / later * 1000:>9.2f} "
+              f"{elapsed / later / args.cities * 1e6:>8.1f} {fired:>7} {engine.suppressed:>11}")
+    print("\nThe first round sees every city for the first time and evaluates every rule in scope;"
+          "\nthe other columns cover the later rounds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# bench_charts.py
+"""Size of the forecast chart sent to the client as more cities are overlaid.
+
+Builds the comparison chart for 1 to --max-cities watchlist cities, each
+with a 5-day forecast (40 points, every 3 hours) of random-walk
+temperatures, and serializes it the way Flet sends a new control to the
+client. For each city count:
+
+    all points   every forecast point of every city (no budget)
+    lttb         charts.forecast_chart: CHART_POINTS shared by all series,
+                 each reduced with largest-triangle-three-buckets
+
+"peak err" is the mean difference between each series' true daily
+high/low and the highest/lowest charted point of that day, for LTTB and
+for keeping every n-th point with the same budget.
+
+Usage:
+    python benchmarks/bench_charts.py [--max-cities 50]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from flet.core.protocol import CommandEncoder  # noqa: E402
+
+import charts  # noqa: E402
+
+
+def forecast(rng, start):
+    temp = rng.uniform(-5, 25)
+    items = []
+    for step in range(40):
+        temp += rng.gauss(0, 1.5) + 3 * ((step % 8) in (3, 4)) - 3 * ((step % 8) in (0, 7))
+        items.append({"dt": start + step * 10800, "main": {"temp": temp}, "pop": rng.random()})
+    return {"list": items}
+
+
+def payload(chart):
+    """Bytes of JSON Flet sends to add this control."""
+    return len(json.dumps(chart._build_add_commands(), cls=CommandEncoder))
+
+
+def stride(points, threshold):
+    """Every n-th point, for comparison with LTTB."""
+    if threshold >= len(points):
+        return list(points)
+    every = (len(points) - 1) / (threshold - 1)
+    return [points[round(i * every)] for i in range(threshold)]
+
+
+def peak_error(series, reduce, budget):
+    errors = []
+    for points in series.values():
+        kept = set(reduce(points, budget))
+        for day in range(0, len(points), 8):
+            day_points = points[day:day + 8]
+            charted = [y for x, y in day_points if (x, y) in kept] or [day_points[0][1]]
+            true_values = [y for _, y in day_points]
+            errors.append(max(true_values) - max(charted))
+            errors.append(min(charted) - min(true_values))
+    return statistics.fmean(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-cities", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    start = int(time.time())
+    forecasts = {f"City {i}": forecast(rng, start) for i in range(args.max_cities)}
+
+    print(f"chart budget {charts.CHART_POINTS} points; forecast of 40 points per city\n")
+    print(f"{'cities':>6} {'all pts':>8} {'all KiB':>8} {'lttb pts':>9} {'lttb KiB':>9} "
+          f"{'peak err lttb':>14} {'every n-th':>11}")
+    for count in (1, 2, 5, 10, 20, 50):
+        if count > args.max_cities:
+            break
+        series = {name: charts.forecast_points(data, "temp") for name, data in list(forecasts.items())[:count]}
+        full = charts.forecast_chart(series, total_points=10 ** 9)
+        reduced = charts.forecast_chart(series)
+        budget = charts.series_budget(count)
+        full_points = sum(len(line.data_points) for line in full.data_series)
+        reduced_points = sum(len(line.data_points) for line in reduced.data_series)
+        print(f"{count:>6} {full_points:>8} {payload(full) / 1024:>8.1f} {reduced_points:>9} "
+              f"{payload(reduced) / 1024:>9.1f} {peak_error(series, charts.lttb, budget):>13.2f}° "
+              f"{peak_error(series, stride, budget):>10.2f}°")
+
+
+if __name__ == "__main__":
+    main()
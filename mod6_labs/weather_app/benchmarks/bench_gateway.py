@@ -0,0 +1,150 @@
+# bench_gateway.py
+"""Throughput of the local gateway with many concurrent dashboard clients.
+
+Each of --clients clients is a WeatherService (as in a separate app or
+weather_cli.py process) that asks for the current weather of --requests
+cities drawn from a pool of --cities names with a Zipf-like popularity.
+Client-side response caching is off, so every request is measured.
+The upstream is a mock OpenWeatherMap answering after --latency-ms.
+
+    direct      every client calls the upstream itself
+    gateway     every client calls gateway.py over HTTP; the gateway runs in
+                its own process
+
+Then --subscribers server-sent-event subscribers listen to --feeds places
+for a few refresh intervals, to show they share one refresh loop per place.
+
+Usage:
+    python benchmarks/bench_gateway.py [--clients 50] [--requests 40] [--cities 30]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import multiprocessing
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from bench_sessions import MockUpstream  # noqa: E402
+from gateway import Gateway  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+def serve_mock(latency, event_interval, ports):
+    """Child process: a Gateway over a mock upstream; sends its port to the parent."""
+    async def run():
+        service = WeatherService(transport=httpx.MockTransport(MockUpstream(latency)), geocode_file=None)
+        gateway = Gateway(service, client_per_minute=10 ** 9, event_interval=event_interval)
+        server = await gateway.start("127.0.0.1", 0)
+        ports.put(gateway.port)
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def gateway_stats(root):
+    return httpx.get(f"{root}/gateway/stats").json()
+
+
+def workload(clients, requests, cities, seed=3):
+    rng = random.Random(seed)
+    names = [f"City {i}" for i in range(cities)]
+    weights = [1 / (rank + 1) for rank in range(cities)]
+    return [rng.choices(names, weights, k=requests) for _ in range(clients)]
+
+
+async def run_clients(plan, make_service):
+    latencies = []
+    # Open every client first: creating an httpx client costs more CPU than
+    # a request, and a real dashboard would pay it once at startup.
+    services = [await make_service().__aenter__() for _ in plan]
+
+    async def client(service, cities):
+        service.cache_ttl = 0
+        for city in cities:
+            start = time.perf_counter()
+            await service.get_weather(city)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(service, cities) for service, cities in zip(services, plan)))
+    elapsed = time.perf_counter() - start
+    for service in services:
+        await service.close()
+    return latencies, elapsed
+
+
+def report(label, latencies, elapsed, upstream_requests):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<10} {len(latencies) / elapsed:>9.0f} {p50:>8.1f} {p99:>8.1f} {upstream_requests:>9}")
+
+
+async def subscribe(client, root, place, received):
+    """Counts the weather events received from /gateway/events until cancelled."""
+    async with client.stream("GET", f"{root}/gateway/events", params={"q": place}) as response:
+        async for line in response.aiter_lines():
+            if line == "event: weather":
+                received[place] = received.get(place, 0) + 1
+
+
+async def run_subscribers(root, subscribers, feeds, seconds):
+    received = {}
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        tasks = [asyncio.ensure_future(subscribe(client, root, f"City {i % feeds}", received))
+                 for i in range(subscribers)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return sum(received.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--cities", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--feeds", type=int, default=5)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    plan = workload(args.clients, args.requests, args.cities)
+    print(f"{args.clients} clients x {args.requests} requests over {args.cities} cities, "
+          f"{args.latency_ms:.0f} ms upstream latency\n")
+    print(f"{'':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9}")
+
+    upstream = MockUpstream(latency)
+    transport = httpx.MockTransport(upstream)
+    latencies, elapsed = asyncio.run(run_clients(
+        plan, lambda: WeatherService(transport=transport, geocode_file=None)))
+    report("direct", latencies, elapsed, upstream.requests)
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_mock, args=(latency, 0.25, ports), daemon=True)
+    server.start()
+    root = f"http://127.0.0.1:{ports.get(timeout=10)}"
+    try:
+        latencies, elapsed = asyncio.run(run_clients(
+            plan, lambda: WeatherService(geocode_file=None, api_root=root)))
+        report("gateway", latencies, elapsed, gateway_stats(root)["upstream_requests"])
+
+        before = gateway_stats(root)["upstream_requests"]
+        seconds = 2.0
+        events = asyncio.run(run_subscribers(root, args.subscribers, args.feeds, seconds))
+        print(f"\n{args.subscribers} event subscribers on {args.feeds} places for {seconds:.0f}s: "
+              f"{events} events delivered, {gateway_stats(root)['upstream_requests'] - before} upstream requests")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
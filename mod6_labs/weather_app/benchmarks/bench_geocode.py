@@ -0,0 +1,139 @@
+# bench_geocode.py
+"""Geocoding hit rate and end-to-end latency of a city lookup.
+
+Replays --lookups searches drawn from --cities city names with a Zipf-like
+popularity (a few cities are searched most of the time), against a mock
+OpenWeatherMap that answers every request after --latency-ms. The response
+cache is disabled so each lookup goes upstream and only the geocoding
+stage is measured.
+
+    q= per call        the old path: current weather and forecast by name
+    geocoded (cold)    WeatherService.get_city_report with an empty cache
+    geocoded (warm)    the same after a restart, reading geocode_cache.json
+
+Usage:
+    python benchmarks/bench_geocode.py [--lookups 500] [--cities 50] [--latency-ms 30]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from config import Config  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+class MockUpstream:
+    """Answers geocoding, weather, forecast and air quality requests after a delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.by_name = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        params = request.url.params
+        if "q" in params:
+            self.by_name += 1
+        await asyncio.sleep(self.latency)
+        if request.url.path.endswith("/direct"):
+            seed = sum(map(ord, params["q"]))
+            return httpx.Response(200, json=[{
+                "name": params["q"], "country": "XX",
+                "lat": seed % 180 - 90 + 0.5, "lon": seed % 360 - 180 + 0.5,
+            }])
+        return httpx.Response(200, json={"name": params.get("q", "City"), "list": []})
+
+    def transport(self):
+        return httpx.MockTransport(self)
+
+
+def workload(lookups, cities, seed=42):
+    names = [f"City {i}" for i in range(cities)]
+    weights = [1 / (rank + 1) for rank in range(cities)]
+    return random.Random(seed).choices(names, weights, k=lookups)
+
+
+async def by_name(upstream, city):
+    """What get_weather/get_forecast did before geocoding."""
+    params = {"q": city, "appid": "benchmark", "units": "metric"}
+    async with httpx.AsyncClient(transport=upstream.transport()) as client:
+        await asyncio.gather(
+            client.get(Config.BASE_URL, params=params),
+            client.get(Config.FORECAST_URL, params=params),
+        )
+
+
+async def replay(lookup, cities):
+    latencies = []
+    for city in cities:
+        start = time.perf_counter()
+        await lookup(city)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def replay_service(service, cities):
+    """Replays cities through get_city_report, then saves the geocoding cache."""
+    try:
+        return await replay(service.get_city_report, cities)
+    finally:
+        await service.close()
+
+
+def report(name, latencies, upstream, service=None):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    p95 = latencies[int(count * 0.95) - 1] * 1000
+    hit_rate = "-"
+    if service is not None:
+        hit_rate = f"{service.geocode_hits / (service.geocode_hits + service.geocode_misses):.1%}"
+    print(f"{name:<18} {hit_rate:>9} {upstream.requests / count:>10.2f} {upstream.by_name / count:>9.2f} "
+          f"{statistics.mean(latencies) * 1000:>9.1f} {p95:>9.1f}")
+
+
+def geocoded_service(upstream, geocode_file):
+    service = WeatherService(transport=upstream.transport(), geocode_file=geocode_file)
+    service.cache_ttl = 0
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    cities = workload(args.lookups, args.cities)
+    latency = args.latency_ms / 1000
+    print(f"{args.lookups} lookups over {args.cities} cities ({len(set(cities))} distinct), "
+          f"{args.latency_ms:.0f} ms per upstream request\n")
+    print(f"{'':<18} {'geo hits':>9} {'req/look':>10} {'q=/look':>9} {'mean ms':>9} {'p95 ms':>9}")
+
+    upstream = MockUpstream(latency)
+    report("q= per call", asyncio.run(replay(lambda city: by_name(upstream, city), cities)), upstream)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        geocode_file = Path(tmp) / "geocode_cache.json"
+        for name in ("geocoded (cold)", "geocoded (warm)"):
+            upstream = MockUpstream(latency)
+            service = geocoded_service(upstream, geocode_file)
+            report(name, asyncio.run(replay_service(service, cities)), upstream, service)
+
+    print("\nreq/look counts current weather, forecast and (geocoded only) air quality.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# bench_history.py
+"""History view queries over months of observations for many cities.
+
+Fills a WeatherHistory with an observation every --interval-min minutes
+for --cities cities over --days days (ending now), then times the query
+behind the History tab for each range the tab offers:
+
+    raw scan     fetch every observation in the range and bucket it in
+                 Python (what a plain observations table would need)
+    series()     WeatherHistory.series(), which groups the finest rollup
+                 table that fits the range in SQL
+
+Usage:
+    python benchmarks/bench_history.py [--cities 50] [--days 120] [--interval-min 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from weather_history import DAY, WeatherHistory  # noqa: E402
+
+RANGES = {"24h": DAY, "7d": 7 * DAY, "30d": 30 * DAY, "120d": 120 * DAY}
+MAX_POINTS = 120
+
+
+def fill(history, cities, days, interval, now):
+    rng = random.Random(5)
+    count = 0
+    start = now - days * DAY
+    for city in range(cities):
+        base = rng.uniform(-5, 25)
+        for ts in range(start, now, interval):
+            daily = 6 * ((ts % DAY) / DAY - 0.5)
+            history.record({
+                "name": f"City {city}", "sys": {"country": "XX"}, "dt": ts,
+                "main": {"temp": base + daily + rng.gauss(0, 1), "humidity": 70, "pressure": 1013},
+                "wind": {"speed": 3.0},
+            })
+            count += 1
+    history.flush()
+    return count
+
+
+def raw_scan(history, key, start, end, max_points):
+    place_id = history._places[key]
+    rows = history._conn.execute(
+        "SELECT ts, temp FROM observations WHERE place_id = ? AND ts >= ? AND ts <= ?",
+        (place_id, start, end),
+    ).fetchall()
+    step = (end - start) // max_points + 1
+    buckets = {}
+    for ts, temp in rows:
+        buckets.setdefault((ts - start) // step, []).append(temp)
+    return [(start + i * step, min(v), statistics.fmean(v), max(v)) for i, v in sorted(buckets.items())]
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--interval-min", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "history.db"
+        history = WeatherHistory(path)
+        # Everything fits the default raw retention, so the raw scan sees it all.
+        history.retention[0] = args.days * DAY + DAY
+        start = time.perf_counter()
+        count = fill(history, args.cities, args.days, args.interval_min * 60, now)
+        elapsed = time.perf_counter() - start
+        print(f"{count} observations ({args.cities} cities x {args.days} days every {args.interval_min} min) "
+              f"stored in {elapsed:.1f}s ({count / elapsed:.0f}/s)\n")
+
+        print(f"{'range':<6} {'raw scan ms':>12} {'series() ms':>12} {'points':>7}")
+        key = "city 7,xx"
+        for name, span in RANGES.items():
+            if span > args.days * DAY:
+                continue
+            raw_ms, _ = timed(lambda: raw_scan(history, key, now - span, now, MAX_POINTS), args.repeat)
+            series_ms, points = timed(
+                lambda: history.series(key, start=now - span, end=now, max_points=MAX_POINTS, now=now),
+                args.repeat,
+            )
+            print(f"{name:<6} {raw_ms:>12.2f} {series_ms:>12.2f} {len(points):>7}")
+        history.close()
+        print(f"\n{path.stat().st_size / 2 ** 20:.1f} MiB on disk "
+              f"({path.stat().st_size / count:.0f} bytes per observation with rollups)")
+
+
+if __name__ == "__main__":
+    main()
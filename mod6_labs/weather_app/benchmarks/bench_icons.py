@@ -0,0 +1,185 @@
+# bench_icons.py
+"""Icon requests and load time for a comparison view of many cities.
+
+Builds the comparison cards for --cities cities (the real
+create_comparison_card) and then loads every image they reference, the way
+the Flet client does on each render. Remote URLs are fetched from a local
+stand-in for openweathermap.org that adds --latency-ms per request, so the
+numbers are reproducible offline; local icons are read from the assets
+directory. Runs before (remote icon URLs) and after (IconCache).
+
+Usage:
+    python benchmarks/bench_icons.py [--cities 50] [--renders 5] [--latency-ms 40]
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+import flet as ft  # noqa: E402
+import httpx  # noqa: E402
+from icon_cache import ICON_CODES, IconCache  # noqa: E402
+from main import WeatherApp  # noqa: E402
+
+# Browsers and the Flutter image loader keep about this many connections per host.
+CLIENT_CONNECTIONS = 6
+
+
+def make_png(size=100):
+    """A valid size x size RGBA PNG standing in for an icon."""
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+    rows = b"".join(b"\0" + bytes(range(size)) * 4 for _ in range(size))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b""))
+
+
+class IconServer:
+    """Serves /img/wn/<code>@2x.png after a fixed delay and counts requests."""
+
+    def __init__(self, latency):
+        png = make_png()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(png)))
+                self.end_headers()
+                self.wfile.write(png)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128
+
+        self.requests = 0
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/img/wn/{{code}}@2x.png"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+class RemoteIcons:
+    """The old behaviour: every image points at the icon host."""
+
+    def __init__(self, icon_url):
+        self.icon_url = icon_url
+
+    def src(self, code):
+        return self.icon_url.format(code=code)
+
+
+def sample_weather(count):
+    """Current-weather payloads for count cities cycling through every icon code."""
+    return {
+        f"City {i}": {
+            "name": f"City {i}",
+            "sys": {"country": "XX"},
+            "main": {"temp": 10 + i % 25, "feels_like": 9 + i % 25, "humidity": 60, "pressure": 1012},
+            "weather": [{"description": "test", "icon": ICON_CODES[i % len(ICON_CODES)]}],
+            "wind": {"speed": 3.5},
+            "clouds": {"all": 40},
+        }
+        for i in range(count)
+    }
+
+
+def image_sources(control):
+    """Every ft.Image src below control."""
+    if isinstance(control, ft.Image):
+        yield control.src
+    for child in getattr(control, "controls", None) or ():
+        yield from image_sources(child)
+    content = getattr(control, "content", None)
+    if isinstance(content, ft.Control):
+        yield from image_sources(content)
+
+
+def build_cards(icons, weather):
+    """The comparison cards as WeatherApp renders them (without a page)."""
+    app = WeatherApp.__new__(WeatherApp)
+    app.icons = icons
+    app.current_unit = "metric"
+    return [app.create_comparison_card(city, data) for city, data in weather.items()]
+
+
+async def load_images(client, sources, assets_dir):
+    """Loads every source like the client: remote ones over HTTP, local ones from disk."""
+    async def load(src):
+        if src.startswith("http"):
+            response = await client.get(src)
+            return len(response.content)
+        return len((assets_dir / src.lstrip("/")).read_bytes())
+    return sum(await asyncio.gather(*(load(src) for src in sources)))
+
+
+async def render_times(icons, weather, renders, assets_dir):
+    """Seconds per render (build the cards, then load their images) and bytes loaded."""
+    limits = httpx.Limits(max_connections=CLIENT_CONNECTIONS)
+    timings = []
+    async with httpx.AsyncClient(limits=limits) as client:
+        for _ in range(renders):
+            start = time.perf_counter()
+            cards = build_cards(icons, weather)
+            sources = [src for card in cards for src in image_sources(card)]
+            size = await load_images(client, sources, assets_dir)
+            timings.append(time.perf_counter() - start)
+    return timings, size
+
+
+def run(name, icons, weather, renders, server, assets_dir):
+    before = server.requests
+    timings, size = asyncio.run(render_times(icons, weather, renders, assets_dir))
+    requests = server.requests - before
+    print(f"{name:<22} {requests / renders:>10.1f} {size / 1024:>10.0f} "
+          f"{min(timings) * 1000:>10.1f} {sum(timings) / renders * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--renders", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    server = IconServer(args.latency_ms / 1000)
+    weather = sample_weather(args.cities)
+    with tempfile.TemporaryDirectory() as tmp:
+        assets_dir = Path(tmp)
+        print(f"{args.cities} cities, {args.renders} renders, {args.latency_ms:.0f} ms icon host latency\n")
+        print(f"{'':<22} {'requests':>10} {'KiB':>10} {'best ms':>10} {'mean ms':>10}")
+        run("remote icons", RemoteIcons(server.url), weather, args.renders, server, assets_dir)
+
+        icons = IconCache(assets_dir, server.url)
+        before = server.requests
+        start = time.perf_counter()
+        asyncio.run(icons.ensure())
+        print(f"\nfilling the cache: {server.requests - before} requests, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms (once)\n")
+        run("IconCache", icons, weather, args.renders, server, assets_dir)
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# bench_sessions.py
+"""Load test: many concurrent app sessions with overlapping watchlists.
+
+Simulates what each Flet web session does when it opens: search one city
+(get_city_report) and refresh a watchlist of --watchlist cities
+(get_weather for each, in parallel). Cities are drawn from a pool of
+--cities names with a Zipf-like popularity, so sessions overlap the way
+real users do. Sessions arrive within --arrival-ms of each other and talk
+to a mock OpenWeatherMap that answers after --latency-ms with responses of
+realistic size.
+
+    per-session service   a WeatherService per session (before)
+    shared service        every session uses one instance (shared_service())
+
+Reports upstream calls, coalesced in-flight requests, wall time and the
+memory each session retains (its data plus its share of the caches).
+
+Usage:
+    python benchmarks/bench_sessions.py [--sessions 100] [--cities 40] [--watchlist 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+def current_weather(name, lat, lon):
+    return {
+        "coord": {"lon": lon, "lat": lat},
+        "weather": [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}],
+        "base": "stations",
+        "main": {"temp": 12.3, "feels_like": 11.8, "temp_min": 11.1, "temp_max": 13.4,
+                 "pressure": 1012, "humidity": 81, "sea_level": 1012, "grnd_level": 1008},
+        "visibility": 10000,
+        "wind": {"speed": 4.1, "deg": 240, "gust": 7.2},
+        "rain": {"1h": 0.3},
+        "clouds": {"all": 75},
+        "dt": 1700000000,
+        "sys": {"country": "XX", "sunrise": 1699980000, "sunset": 1700013000},
+        "timezone": 0,
+        "id": 2643743,
+        "name": name,
+        "cod": 200,
+    }
+
+
+def forecast(name, lat, lon):
+    return {
+        "cod": "200",
+        "cnt": 40,
+        "list": [
+            {"dt": 1700000000 + 10800 * i, **{k: v for k, v in current_weather(name, lat, lon).items()
+                                                if k in ("main", "weather", "clouds", "wind", "visibility")},
+             "pop": 0.2, "sys": {"pod": "d"}, "dt_txt": "2023-11-14 21:00:00"}
+            for i in range(40)
+        ],
+        "city": {"id": 2643743, "name": name, "coord": {"lat": lat, "lon": lon}, "country": "XX"},
+    }
+
+
+class MockUpstream:
+    """OpenWeatherMap stand-in answering every request after a delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        params = request.url.params
+        path = request.url.path
+        if path.endswith("/direct"):
+            seed = sum(map(ord, params["q"]))
+            return httpx.Response(200, json=[{"name": params["q"], "country": "XX",
+                                              "lat": seed % 160 - 80 + 0.5, "lon": seed % 340 - 170 + 0.5}])
+        lat, lon = float(params["lat"]), float(params["lon"])
+        if path.endswith("/forecast"):
+            return httpx.Response(200, json=forecast("City", lat, lon))
+        if path.endswith("/air_pollution"):
+            return httpx.Response(200, json={"list": [{"main": {"aqi": 2}, "components": {"pm2_5": 8.1}}]})
+        return httpx.Response(200, json=current_weather("City", lat, lon))
+
+
+class Session:
+    """The per-session state WeatherApp keeps: current report and watchlist data."""
+
+    def __init__(self, search, watchlist):
+        self.search = search
+        self.watchlist = watchlist
+        self.report = None
+        self.watchlist_weather_data = {}
+
+    async def open(self, service, delay):
+        await asyncio.sleep(delay)
+        self.report = await service.get_city_report(self.search)
+        results = await asyncio.gather(*(service.get_weather(city) for city in self.watchlist))
+        self.watchlist_weather_data = dict(zip(self.watchlist, results))
+
+
+def make_sessions(count, cities, watchlist, seed=7):
+    rng = random.Random(seed)
+    names = [f"City {i}" for i in range(cities)]
+    weights = [1 / (rank + 1) for rank in range(cities)]
+
+    def pick(k):
+        chosen = set()
+        while len(chosen) < k:
+            chosen.add(rng.choices(names, weights)[0])
+        return sorted(chosen)
+
+    return [Session(pick(1)[0], pick(watchlist)) for _ in range(count)]
+
+
+async def run(mode, args):
+    upstream = MockUpstream(args.latency_ms / 1000)
+    transport = httpx.MockTransport(upstream)
+    sessions = make_sessions(args.sessions, args.cities, args.watchlist)
+    rng = random.Random(11)
+    delays = [rng.uniform(0, args.arrival_ms / 1000) for _ in sessions]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    if mode == "shared":
+        shared = WeatherService(transport=transport, geocode_file=None)
+        services = [shared] * len(sessions)
+    else:
+        services = [WeatherService(transport=transport, geocode_file=None) for _ in sessions]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session.open(service, delay)
+                           for session, service, delay in zip(sessions, services, delays)))
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    coalesced = sum(service.coalesced for service in set(services))
+    return upstream.requests, coalesced, elapsed, retained / len(sessions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--cities", type=int, default=40)
+    parser.add_argument("--watchlist", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--arrival-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions, watchlists of {args.watchlist} from {args.cities} cities, "
+          f"arriving within {args.arrival_ms:.0f} ms, {args.latency_ms:.0f} ms upstream latency\n")
+    print(f"{'':<22} {'upstream':>9} {'coalesced':>10} {'wall ms':>9} {'KiB/session':>12}")
+    results = {}
+    for mode, label in (("per-session", "per-session service"), ("shared", "shared service")):
+        results[mode] = asyncio.run(run(mode, args))
+        requests, coalesced, elapsed, per_session = results[mode]
+        print(f"{label:<22} {requests:>9} {coalesced:>10} {elapsed * 1000:>9.0f} {per_session / 1024:>12.1f}")
+
+    before, after = results["per-session"][0], results["shared"][0]
+    print(f"\nupstream calls reduced by {1 - after / before:.1%} ({before} -> {after})")
+
+
+if __name__ == "__main__":
+    main()
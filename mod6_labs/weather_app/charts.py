@@ -0,0 +1,158 @@
+# charts.py
+"""Hourly forecast charts with a fixed point budget.
+
+The forecast has a point every 3 hours for 5 days (40 per city). A chart
+overlaying the watchlist would send 40 points per city to the client; here
+every chart shares CHART_POINTS points between its series, and each series
+is reduced with largest-triangle-three-buckets (LTTB), which keeps the
+points that shape the line (peaks, troughs, turns) rather than every n-th.
+The budget stays fixed for up to CHART_POINTS // 2 series (two points,
+first and last, is the least a line can have).
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import flet as ft
+
+Point = Tuple[float, float]
+
+CHART_POINTS = 160  # data points per chart, shared by all of its series
+CHART_FIELDS = {"temp": "Temperature", "pop": "Precipitation chance"}
+PALETTE = [
+    ft.Colors.BLUE_700, ft.Colors.ORANGE_700, ft.Colors.GREEN_700, ft.Colors.PURPLE_400,
+    ft.Colors.RED_700, ft.Colors.TEAL_400, ft.Colors.BROWN_400, ft.Colors.PINK_300,
+    ft.Colors.INDIGO_300, ft.Colors.LIME_800,
+]
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Reduce points (sorted by x) to at most threshold points with largest-triangle-three-buckets.
+
+    The first and last points are always kept. Each bucket in between
+    contributes the point forming the largest triangle with the point
+    chosen before it and the average of the next bucket.
+    """
+    count = len(points)
+    if threshold >= count:
+        return list(points)
+    if threshold <= 2:
+        return [points[0], points[-1]][:max(threshold, 0)]
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        next_points = points[next_start:next_end] or points[-1:]
+        avg_x = sum(x for x, _ in next_points) / len(next_points)
+        avg_y = sum(y for _, y in next_points) / len(next_points)
+
+        ax, ay = points[previous]
+        best, best_area = int(bucket * every) + 1, -1.0
+        for index in range(int(bucket * every) + 1, next_start):
+            x, y = points[index]
+            # Twice the triangle's area; only the comparison matters.
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = index, area
+        sampled.append(points[best])
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def series_budget(series_count: int, total: int = CHART_POINTS) -> int:
+    """Points each of series_count overlaid series may use."""
+    return max(2, total // max(1, series_count))
+
+
+def forecast_points(forecast: Dict, field: str, convert: Optional[Callable[[float], float]] = None) -> List[Point]:
+    """(time, value) for every step of a forecast: temp (converted) or pop (0-100 %)."""
+    points = []
+    for item in forecast.get("list", []):
+        if field == "temp":
+            value = item.get("main", {}).get("temp")
+            if value is None:
+                continue
+            value = convert(value) if convert else value
+        else:
+            value = item.get("pop", 0) * 100
+        points.append((item["dt"], value))
+    return points
+
+
+def _time_labels(start: float, end: float) -> List[ft.ChartAxisLabel]:
+    """A label at each local midnight between start and end."""
+    labels = []
+    day = datetime.fromtimestamp(start).replace(hour=0, minute=0, second=0, microsecond=0)
+    while day.timestamp() <= end:
+        if day.timestamp() >= start:
+            labels.append(ft.ChartAxisLabel(value=day.timestamp(), label=ft.Text(day.strftime("%a"), size=10)))
+        day += timedelta(days=1)
+    return labels
+
+
+def forecast_chart(
+    series: Dict[str, Sequence[Point]],
+    field: str = "temp",
+    total_points: int = CHART_POINTS,
+    height: int = 240,
+) -> ft.LineChart:
+    """
+    Line chart of one or more forecast series (name -> points), within total_points.
+
+    Series are colored in order from PALETTE (see chart_legend).
+    """
+    budget = series_budget(len(series), total_points)
+    data_series = []
+    min_x, max_x = float("inf"), float("-inf")
+    for index, points in enumerate(series.values()):
+        points = lttb(points, budget)
+        if not points:
+            continue
+        min_x, max_x = min(min_x, points[0][0]), max(max_x, points[-1][0])
+        data_series.append(ft.LineChartData(
+            data_points=[ft.LineChartDataPoint(x, round(y, 1)) for x, y in points],
+            color=PALETTE[index % len(PALETTE)],
+            stroke_width=2,
+            curved=True,
+            prevent_curve_over_shooting=True,
+        ))
+    if not data_series:
+        min_x = max_x = 0
+    return ft.LineChart(
+        data_series=data_series,
+        left_axis=ft.ChartAxis(labels_size=40),
+        bottom_axis=ft.ChartAxis(labels=_time_labels(min_x, max_x), labels_size=24),
+        horizontal_grid_lines=ft.ChartGridLines(color=ft.Colors.with_opacity(0.2, ft.Colors.GREY), width=1),
+        tooltip_bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.BLUE_GREY_900),
+        min_x=min_x,
+        max_x=max_x,
+        min_y=0 if field == "pop" else None,
+        max_y=100 if field == "pop" else None,
+        height=height,
+        expand=True,
+    )
+
+
+def chart_legend(names: Sequence[str]) -> ft.Row:
+    """Colored name tags matching the series colors of forecast_chart."""
+    return ft.Row(
+        [
+            ft.Row(
+                [
+                    ft.Container(width=12, height=12, border_radius=6, bgcolor=PALETTE[index % len(PALETTE)]),
+                    ft.Text(name, size=12),
+                ],
+                spacing=4,
+            )
+            for index, name in enumerate(names)
+        ],
+        wrap=True,
+        spacing=12,
+        alignment=ft.MainAxisAlignment.CENTER,
+    )
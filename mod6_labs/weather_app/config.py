@@ -2,6 +2,7 @@
 """Configuration management for the Weather App."""
 
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,10 +13,20 @@ class Config:
     
     # API Configuration
     API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
+    WEATHER_PATH = "/data/2.5/weather"
+    FORECAST_PATH = "/data/2.5/forecast"
+    GEOCODE_PATH = "/geo/1.0/direct"
+    AIR_QUALITY_PATH = "/data/2.5/air_pollution"
     BASE_URL = os.getenv(
         "OPENWEATHER_BASE_URL", 
         "https://api.openweathermap.org/data/2.5/weather"
     )
+    # The other endpoints live next to BASE_URL, so pointing it at a
+    # gateway (e.g. http://127.0.0.1:8765/data/2.5/weather) moves them all
+    API_ROOT = BASE_URL[:-len(WEATHER_PATH)] if BASE_URL.endswith(WEATHER_PATH) else "https://api.openweathermap.org"
+    FORECAST_URL = os.getenv("OPENWEATHER_FORECAST_URL", API_ROOT + FORECAST_PATH)
+    GEOCODE_URL = API_ROOT + GEOCODE_PATH
+    AIR_QUALITY_URL = API_ROOT + AIR_QUALITY_PATH
     
     # App Configuration
     APP_TITLE = "Weather App"
@@ -23,8 +34,35 @@ class Config:
     APP_HEIGHT = 600
     
     # API Settings
+    # Data is always fetched in metric; this is the default display unit
     UNITS = "metric"  # metric, imperial, or standard
     TIMEOUT = 10  # seconds
+    CACHE_TTL = 600  # seconds a response is reused (OpenWeatherMap updates ~10 min)
+    CACHE_MAX_ENTRIES = 1000  # least recently used responses are dropped beyond this
+    GEOCODE_CACHE_FILE = Path("geocode_cache.json")  # city name -> coordinates
+    GEOCODE_SAVE_DELAY = 2.0  # seconds new locations are batched before writing the file
+    GRID_PRECISION = 5  # geohash characters; coordinates in one ~5 km cell share a request
+    IP_LOCATION_URL = "https://ipapi.co/json/"
+    IP_LOOKUP_URL = "https://ipapi.co/{ip}/json/"
+    IP_LOCATION_TTL = 3600  # seconds the IP-based location is reused
+    HISTORY_DB = Path("weather_history.db")  # observed weather over time
+    HISTORY_FLUSH_DELAY = 2.0  # seconds observations are batched before writing
+    HISTORY_RAW_DAYS = 30  # days every observation is kept
+    HISTORY_HOURLY_DAYS = 400  # days hourly min/max/mean are kept
+    HISTORY_DAILY_DAYS = 3650  # days daily min/max/mean are kept
+    ALERT_COOLDOWN = 3600  # seconds before the same alert may fire again for a city
+    
+    # Local gateway (gateway.py)
+    GATEWAY_HOST = "127.0.0.1"
+    GATEWAY_PORT = 8765
+    GATEWAY_UPSTREAM = os.getenv("OPENWEATHER_UPSTREAM", "https://api.openweathermap.org")
+    GATEWAY_UPSTREAM_PER_MINUTE = 60  # OpenWeatherMap free plan limit
+    GATEWAY_CLIENT_PER_MINUTE = 600  # requests per minute allowed for each client address
+    GATEWAY_EVENT_INTERVAL = 60  # seconds between refresh checks for server-sent events
+    
+    # Weather icons are downloaded once into the Flet assets directory
+    ASSETS_DIR = Path(__file__).parent / "assets"
+    ICON_URL = "https://openweathermap.org/img/wn/{code}@2x.png"
     
     @classmethod
     def validate(cls):
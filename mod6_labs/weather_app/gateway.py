@@ -0,0 +1,416 @@
+# gateway.py
+"""Local weather gateway: one WeatherService shared by many dashboards.
+
+Runs a small asyncio HTTP server that answers OpenWeatherMap-style requests
+from its WeatherService, so every client shares one response cache, one
+geocoding cache and coalesced in-flight requests, and the upstream API
+sees at most Config.GATEWAY_UPSTREAM_PER_MINUTE calls. Each client address
+is limited to Config.GATEWAY_CLIENT_PER_MINUTE requests (429 beyond that).
+
+Endpoints (query parameters as in the OpenWeatherMap API; appid is
+ignored and data is always metric):
+
+    GET /data/2.5/weather?q=London | ?lat=..&lon=..
+    GET /data/2.5/forecast?q=London | ?lat=..&lon=..
+    GET /data/2.5/air_pollution?lat=..&lon=..
+    GET /geo/1.0/direct?q=London
+    GET /gateway/batch?q=London&q=Paris&q=51.5,-0.12   current weather for many
+    GET /gateway/events?q=London | ?lat=..&lon=..      server-sent events
+    GET /gateway/stats
+
+/gateway/events keeps the connection open and sends a "weather" event
+with the current weather whenever it changes (checked every
+Config.GATEWAY_EVENT_INTERVAL seconds); all subscribers to one place share
+one refresh loop.
+
+To use it from the app or weather_cli.py, point the service at it:
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765/data/2.5/weather python main.py
+
+Usage:
+    python gateway.py [--host 127.0.0.1] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from config import Config
+from weather_service import (
+    NotFoundError, TransientServiceError, WeatherService, WeatherServiceError, location_key,
+)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_CLIENTS_TRACKED = 10000
+BACKLOG = 1024  # pending connections; many dashboards may connect at once
+HEARTBEAT = 15.0  # seconds between SSE keep-alive comments
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    429: "Too Many Requests", 502: "Bad Gateway", 503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    """The client's request is malformed."""
+    pass
+
+
+class TokenBucket:
+    """Allows per_minute events on average, in bursts of up to burst."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = per_minute / 60
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 6)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """Takes a token if one is available; returns 0, or seconds until one will be."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Takes a token now, possibly on credit; returns seconds to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """An httpx transport that spaces requests to stay under a rate limit."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, per_minute: float, max_wait: float = Config.TIMEOUT):
+        self.inner = inner
+        self.bucket = TokenBucket(per_minute)
+        self.max_wait = max_wait
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        wait = self.bucket.reserve()
+        if wait > self.max_wait:
+            self.bucket.tokens += 1  # give the reservation back
+            raise httpx.PoolTimeout("upstream rate limit reached", request=request)
+        if wait:
+            await asyncio.sleep(wait)
+        self.requests += 1
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def _json(status: int, body) -> Tuple[int, bytes]:
+    return status, json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def _coordinates(params: Dict[str, str]) -> Tuple[float, float]:
+    try:
+        lat, lon = float(params["lat"]), float(params["lon"])
+    except (KeyError, ValueError):
+        raise BadRequest("Pass q=<city> or numeric lat and lon")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise BadRequest(f"Coordinates out of range: {lat}, {lon}")
+    return lat, lon
+
+
+class Feed:
+    """One refresh loop for a place, fanned out to every SSE subscriber."""
+
+    def __init__(self, fetch, interval: float):
+        self.fetch = fetch
+        self.interval = interval
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last: Optional[bytes] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+        if self.last is not None:
+            queue.put_nowait(self.last)
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def _publish(self, event: bytes):
+        for queue in list(self.subscribers):
+            if queue.full():
+                # A subscriber that stopped reading only needs the newest state.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self):
+        last_dt = None
+        while True:
+            try:
+                data = await self.fetch()
+                if data.get("dt") != last_dt or self.last is None:
+                    last_dt = data.get("dt")
+                    self.last = b"event: weather\ndata: " + json.dumps(data).encode("utf-8") + b"\n\n"
+                    self._publish(self.last)
+            except WeatherServiceError as e:
+                self._publish(b"event: error\ndata: " + json.dumps({"message": str(e)}).encode("utf-8") + b"\n\n")
+            await asyncio.sleep(self.interval)
+
+
+class Gateway:
+    """HTTP front end for a WeatherService (see module docstring)."""
+
+    def __init__(
+        self,
+        service: WeatherService,
+        client_per_minute: float = Config.GATEWAY_CLIENT_PER_MINUTE,
+        event_interval: float = Config.GATEWAY_EVENT_INTERVAL,
+    ):
+        self.service = service
+        self.client_per_minute = client_per_minute
+        self.event_interval = event_interval
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._feeds: Dict[Tuple, Feed] = {}
+        self._streams: Set[asyncio.Task] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.requests = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    async def start(self, host: str = Config.GATEWAY_HOST, port: int = Config.GATEWAY_PORT):
+        self.server = await asyncio.start_server(
+            self._handle_connection, host, port, limit=MAX_HEADER_BYTES, backlog=BACKLOG
+        )
+        return self.server
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for stream in list(self._streams):
+            stream.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    # Connection handling
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = (writer.get_extra_info("peername") or ("?",))[0]
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, *_json(400, {"message": "Malformed request line"}), keep_alive=False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                # Request bodies are never read, so after a request with one the
+                # connection is closed rather than its body parsed as the next request.
+                if "transfer-encoding" in headers or headers.get("content-length", "0") not in ("", "0"):
+                    keep_alive = False
+
+                self.requests += 1
+                retry_after = self._admit(client)
+                if method != "GET":
+                    await self._respond(writer, *_json(405, {"message": "Only GET is supported"}), keep_alive)
+                elif retry_after:
+                    self.rejected += 1
+                    await self._respond(writer, *_json(429, {"cod": "429", "message": "Too many requests"}),
+                                        keep_alive, extra={"Retry-After": str(max(1, round(retry_after)))})
+                else:
+                    url = urlsplit(target)
+                    if url.path == "/gateway/events":
+                        await self._stream_events(writer, parse_qs(url.query))
+                        return
+                    status, body = await self._route(url.path, parse_qs(url.query))
+                    await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _admit(self, client: str) -> float:
+        """0 if the client may make a request now, else seconds until it may."""
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_per_minute)
+            if len(self._clients) > MAX_CLIENTS_TRACKED:
+                self._clients.popitem(last=False)
+        self._clients.move_to_end(client)
+        return bucket.try_take()
+
+    async def _respond(self, writer, status: int, body: bytes, keep_alive: bool, extra: Optional[Dict] = None):
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        headers += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # Endpoints
+
+    async def _route(self, path: str, query: Dict[str, list]) -> Tuple[int, bytes]:
+        params = {name: values[-1] for name, values in query.items()}
+        try:
+            if params.get("units", "metric") != "metric":
+                raise BadRequest("The gateway serves metric units only; convert on the client")
+            if path == Config.WEATHER_PATH:
+                return _json(200, await self._current(params))
+            if path == Config.FORECAST_PATH:
+                if params.get("q"):
+                    return _json(200, await self.service.get_forecast(params["q"]))
+                return _json(200, await self.service.get_forecast_by_coordinates(*_coordinates(params)))
+            if path == Config.AIR_QUALITY_PATH:
+                return _json(200, await self.service.get_air_quality(*_coordinates(params)))
+            if path == Config.GEOCODE_PATH:
+                location = await self.service.resolve(params.get("q", ""))
+                return _json(200, [location._asdict()])
+            if path == "/gateway/batch":
+                return _json(200, {"results": await self._batch(query.get("q", []))})
+            if path == "/gateway/stats":
+                return _json(200, self.stats())
+            return _json(404, {"cod": "404", "message": f"Unknown endpoint {path}"})
+        except BadRequest as e:
+            return _json(400, {"cod": "400", "message": str(e)})
+        except NotFoundError as e:
+            return _json(404, {"cod": "404", "message": str(e)})
+        except TransientServiceError as e:
+            return _json(503, {"cod": "503", "message": str(e)})
+        except WeatherServiceError as e:
+            return _json(502, {"cod": "502", "message": str(e)})
+
+    async def _current(self, params: Dict[str, str]) -> Dict:
+        if params.get("q"):
+            return await self.service.get_weather(params["q"])
+        return await self.service.get_weather_by_coordinates(*_coordinates(params))
+
+    async def _batch(self, queries: list) -> Dict[str, Dict]:
+        """Current weather for each query (city or "lat,lon"), fetched concurrently."""
+        async def one(query: str) -> Dict:
+            parts = query.replace(",", " ").split()
+            try:
+                if len(parts) == 2:
+                    try:
+                        lat, lon = float(parts[0]), float(parts[1])
+                    except ValueError:
+                        pass
+                    else:
+                        return await self.service.get_weather_by_coordinates(lat, lon)
+                return await self.service.get_weather(query)
+            except WeatherServiceError as e:
+                return {"error": str(e)}
+
+        results = await asyncio.gather(*(one(query) for query in queries))
+        return dict(zip(queries, results))
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, query: Dict[str, list]):
+        params = {name: values[-1] for name, values in query.items()}
+        try:
+            if params.get("q"):
+                key = ("q", location_key(params["q"]))
+            else:
+                grid = self.service.grid_query(*_coordinates(params))
+                key = ("coord", grid["lat"], grid["lon"])
+        except (BadRequest, WeatherServiceError) as e:
+            await self._respond(writer, *_json(400, {"message": str(e)}), keep_alive=False)
+            return
+
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = Feed(lambda: self._current(params), self.event_interval)
+        queue = feed.subscribe()
+        self._streams.add(asyncio.current_task())
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n"
+        )
+        try:
+            await writer.drain()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    event = b": keep-alive\n\n"
+                writer.write(event)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._streams.discard(asyncio.current_task())
+            feed.unsubscribe(queue)
+            if not feed.subscribers:
+                self._feeds.pop(key, None)
+
+    def stats(self) -> Dict:
+        service = self.service
+        return {
+            "uptime": round(time.monotonic() - self.started, 1),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "upstream_requests": service.requests_made,
+            "coalesced": service.coalesced,
+            "cached_responses": len(service._cache),
+            "geocode_hits": service.geocode_hits,
+            "geocode_misses": service.geocode_misses,
+            "event_feeds": len(self._feeds),
+            "event_subscribers": sum(len(feed.subscribers) for feed in self._feeds.values()),
+        }
+
+
+async def serve(host: str, port: int, upstream: str, upstream_per_minute: float):
+    transport = RateLimitedTransport(httpx.AsyncHTTPTransport(), upstream_per_minute)
+    async with WeatherService(transport=transport, api_root=upstream) as service:
+        gateway = Gateway(service)
+        server = await gateway.start(host, port)
+        print(f"Weather gateway on http://{host}:{gateway.port} -> {upstream}")
+        print(f"Point clients at it with OPENWEATHER_BASE_URL=http://{host}:{gateway.port}{Config.WEATHER_PATH}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=Config.GATEWAY_HOST)
+    parser.add_argument("--port", type=int, default=Config.GATEWAY_PORT)
+    parser.add_argument("--upstream", default=Config.GATEWAY_UPSTREAM, help="API root to forward to")
+    parser.add_argument("--upstream-per-minute", type=float, default=Config.GATEWAY_UPSTREAM_PER_MINUTE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.upstream.rstrip("/"), args.upstream_per_minute))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
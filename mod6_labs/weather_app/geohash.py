@@ -0,0 +1,67 @@
+# geohash.py
+"""Geohash encoding for snapping coordinates to a grid.
+
+A geohash of n characters names a grid cell; every point inside the cell
+encodes to the same string, so it works as a cache key for "roughly here".
+Approximate cell sizes at the equator:
+
+    precision 4: 39 km x 19.5 km
+    precision 5: 4.9 km x 4.9 km
+    precision 6: 1.2 km x 0.61 km
+    precision 7: 153 m x 153 m
+"""
+
+from typing import Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lon: float, precision: int = 5) -> str:
+    """Geohash of the cell containing (lat, lon)."""
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError(f"Coordinates out of range: {lat}, {lon}")
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # bits alternate longitude, latitude, starting with longitude
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def center(geohash: str) -> Tuple[float, float]:
+    """(lat, lon) at the middle of a geohash cell."""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
@@ -0,0 +1,129 @@
+# icon_cache.py
+"""Local cache for the OpenWeatherMap condition icons.
+
+There are only 18 icon codes (9 conditions, day and night), so each one is
+downloaded once into the Flet assets directory and every later render
+points ft.Image at the local copy instead of openweathermap.org. Cached
+files are checked to be complete PNGs before use; a missing or damaged
+icon is fetched again, and until it is available the remote URL is used.
+"""
+
+import asyncio
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+import httpx
+from config import Config
+
+# Condition codes used by the API; each exists with a "d" and "n" suffix.
+ICON_CODES = tuple(
+    f"{condition}{time_of_day}"
+    for condition in ("01", "02", "03", "04", "09", "10", "11", "13", "50")
+    for time_of_day in ("d", "n")
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_END = b"IEND\xaeB`\x82"
+
+
+def is_valid_png(data: bytes) -> bool:
+    """True if data starts with the PNG signature and ends with the IEND chunk."""
+    return data.startswith(PNG_SIGNATURE) and data.endswith(PNG_END)
+
+
+class IconCache:
+    """Downloads weather icons once and hands out local image sources."""
+
+    def __init__(
+        self,
+        assets_dir: Path = Config.ASSETS_DIR,
+        icon_url: str = Config.ICON_URL,
+        timeout: float = Config.TIMEOUT,
+    ):
+        self.assets_dir = Path(assets_dir)
+        self.directory = self.assets_dir / "icons"
+        self.icon_url = icon_url
+        self.timeout = timeout
+        self._ready = set()  # codes whose local file has been validated
+        self._lock = None  # created on first ensure(), inside the event loop
+        self.downloads = 0
+
+    def filename(self, code: str) -> str:
+        return f"{code}@2x.png"
+
+    def path(self, code: str) -> Path:
+        return self.directory / self.filename(code)
+
+    def remote_url(self, code: str) -> str:
+        return self.icon_url.format(code=code)
+
+    def is_cached(self, code: str) -> bool:
+        """Checks the local file once per process; damaged files are removed."""
+        if code in self._ready:
+            return True
+        path = self.path(code)
+        try:
+            valid = is_valid_png(path.read_bytes())
+        except OSError:
+            return False
+        if valid:
+            self._ready.add(code)
+        else:
+            path.unlink(missing_ok=True)
+        return valid
+
+    def src(self, code: str) -> str:
+        """Image source for code: the local asset if cached, else the remote URL."""
+        if self.is_cached(code):
+            return f"/icons/{self.filename(code)}"
+        return self.remote_url(code)
+
+    async def _download(self, client: httpx.AsyncClient, code: str) -> bool:
+        try:
+            response = await client.get(self.remote_url(code))
+        except httpx.HTTPError:
+            return False
+        if response.status_code != 200 or not is_valid_png(response.content):
+            return False
+        # Write to a temporary name first so a half-written file is never served.
+        path = self.path(code)
+        partial = path.with_suffix(".part")
+        partial.write_bytes(response.content)
+        partial.replace(path)
+        self._ready.add(code)
+        self.downloads += 1
+        return True
+
+    async def ensure(self, codes: Optional[Iterable[str]] = None) -> int:
+        """Downloads the given codes (default: all) that are not cached yet.
+
+        Returns how many icons are still missing afterwards, e.g. when offline.
+        """
+        codes = list(ICON_CODES if codes is None else codes)
+        if all(not code or self.is_cached(code) for code in codes):
+            return 0
+        # Sessions sharing this cache wait for each other instead of downloading twice.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            missing = {code for code in codes if code and not self.is_cached(code)}
+            if not missing:
+                return 0
+            self.directory.mkdir(parents=True, exist_ok=True)
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                results = await asyncio.gather(*(self._download(client, code) for code in missing))
+            return results.count(False)
+
+
+_shared_icons: Optional[IconCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_icons() -> IconCache:
+    """The process-wide IconCache used by every app session."""
+    global _shared_icons
+    with _shared_lock:
+        if _shared_icons is None:
+            _shared_icons = IconCache()
+        return _shared_icons
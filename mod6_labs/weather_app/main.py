@@ -4,24 +4,49 @@
 import flet as ft
 import json
 import asyncio
-from weather_service import WeatherService
+import time
+from datetime import datetime
+from weather_service import shared_service
+from weather_history import DAY, series_key
+from icon_cache import shared_icons
+import alerts
+import charts
+import units
 from config import Config
 from pathlib import Path
 
+# OpenWeatherMap air quality index (1-5)
+AQI_LABELS = {1: "Good", 2: "Fair", 3: "Moderate", 4: "Poor", 5: "Very Poor"}
+
+# History tab: range choices (seconds) and the most points drawn per line
+HISTORY_RANGES = {"24h": DAY, "7d": 7 * DAY, "30d": 30 * DAY, "1y": 365 * DAY}
+HISTORY_POINTS = 120
+
 class WeatherApp:
     """Main Weather Application class."""
     
     def __init__(self, page: ft.Page):
         self.page = page
-        self.weather_service = WeatherService()
+        # Shared by every session in the process (one per browser tab on the web)
+        self.weather_service = shared_service()
+        self.icons = shared_icons()
         self.history_file = Path("search_history.json")
         self.watchlist_file = Path("watchlist.json")
         self.search_history = self._load_json_file(self.history_file, [])
         self.watchlist = self._load_json_file(self.watchlist_file, [])
-        self.current_unit = self._load_json_file(Path("unit_preference.json"), {"unit": "metric"}).get("unit", "metric")
+        self.alert_rules_file = Path("alert_rules.json")
+        saved_rules = self._load_json_file(self.alert_rules_file, None)
+        self.alert_engine = alerts.AlertEngine(
+            alerts.rules_from_json(saved_rules) if saved_rules is not None else alerts.DEFAULT_RULES
+        )
+        self.current_unit = self._load_json_file(Path("unit_preference.json"), {"unit": Config.UNITS}).get("unit", Config.UNITS)
         self.current_weather_data = None
         self.current_forecast_data = None
+        self.current_air_quality = None
         self.watchlist_weather_data = {}
+        self.watchlist_forecast_data = {}
+        self.chart_field = "temp"
+        self.history_range = "7d"
         self.setup_page()
         self.build_ui()
     
@@ -58,9 +83,13 @@ class WeatherApp:
         self.search_history = self.search_history[:10]
         self.save_history()
     
+    def save_alert_rules(self):
+        """Save alert rules to file."""
+        self._save_json_file(self.alert_rules_file, alerts.rules_to_json(self.alert_engine.rules))
+    
     def load_unit_preference(self):
         """Load temperature unit preference from file."""
-        return self._load_json_file(Path("unit_preference.json"), {"unit": "metric"}).get("unit", "metric")
+        return self._load_json_file(Path("unit_preference.json"), {"unit": Config.UNITS}).get("unit", Config.UNITS)
     
     def save_unit_preference(self):
         """Save temperature unit preference to file."""
@@ -111,6 +140,13 @@ class WeatherApp:
             on_click=self.toggle_units,
         )
 
+        # Alert rules button
+        self.alerts_button = ft.IconButton(
+            icon=ft.Icons.NOTIFICATIONS,
+            tooltip="Weather alerts",
+            on_click=self.open_alerts_dialog,
+        )
+        
         # Title
         self.title = ft.Text(
             "Weather App",
@@ -153,6 +189,13 @@ class WeatherApp:
             expand=True,
         )
         
+        # Current location button
+        self.location_button = ft.IconButton(
+            icon=ft.Icons.MY_LOCATION,
+            tooltip="Weather at my location",
+            on_click=lambda e: self.page.run_task(self.get_location_weather),
+        )
+        
         # Search button
         self.search_button = ft.IconButton(
             icon=ft.Icons.SEARCH,
@@ -179,9 +222,14 @@ class WeatherApp:
             icon=ft.Icons.COMPARE,
         )
         
+        self.history_tab = ft.Tab(
+            text="History",
+            icon=ft.Icons.SHOW_CHART,
+        )
+        
         self.tabs = ft.Tabs(
             selected_index=0,
-            tabs=[self.weather_tab, self.forecast_tab, self.comparison_tab],
+            tabs=[self.weather_tab, self.forecast_tab, self.comparison_tab, self.history_tab],
             visible=False,
             on_change=self.on_tab_change,
             tab_alignment=ft.TabAlignment.CENTER
@@ -211,6 +259,14 @@ class WeatherApp:
             padding=20,
         )
         
+        # History container
+        self.history_container = ft.Container(
+            visible=False,
+            border=ft.border.all(1, ft.Colors.BLUE_200),
+            border_radius=10,
+            padding=20,
+        )
+        
         # Error message
         self.error_message = ft.Text(
             "",
@@ -227,6 +283,7 @@ class WeatherApp:
                 self.title,
                 ft.Row(
                     [
+                        self.alerts_button,
                         self.unit_button,
                         self.theme_button,
                     ],
@@ -247,6 +304,7 @@ class WeatherApp:
                     ft.Row(
                         [
                             self.city_input,
+                            self.location_button,
                             self.search_button,
                         ],
                         spacing=5,
@@ -259,6 +317,7 @@ class WeatherApp:
                     self.weather_container,
                     self.forecast_container,
                     self.comparison_container,
+                    self.history_container,
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                 scroll=ft.ScrollMode.AUTO,
@@ -268,6 +327,9 @@ class WeatherApp:
         
         # Build comparison UI
         self.build_comparison_ui()
+        
+        # Fill the local icon cache in the background
+        self.page.run_task(self.icons.ensure)
     
     def on_input_focus(self, e):
         """Show suggestions when input is focused."""
@@ -339,7 +401,7 @@ class WeatherApp:
             # Calculate position based on input field
             self.suggestions_container.top = 118  # Approximate position below search field
             self.suggestions_container.left = 20
-            self.suggestions_container.right = 65
+            self.suggestions_container.right = 110
             self.suggestions_container.visible = True
         else:
             self.suggestions_container.visible = False
@@ -370,20 +432,25 @@ class WeatherApp:
             self.update_suggestions(self.city_input.value or "")
     
     def on_tab_change(self, e):
-        """Handle tab switching between current weather, forecast, and comparison."""
+        """Handle tab switching between current weather, forecast, comparison and history."""
         tab_index = e.control.selected_index
-        
-        # Set visibility for all containers
-        self.weather_container.visible = (tab_index == 0)
-        self.forecast_container.visible = (tab_index == 1)
-        self.comparison_container.visible = (tab_index == 2)
+        self.show_tab(tab_index)
         
         # Refresh comparison data when tab is opened
         if tab_index == 2:
             self.page.run_task(self.refresh_comparison)
+        elif tab_index == 3:
+            self.display_history()
         
         self.page.update()
     
+    def show_tab(self, tab_index: int):
+        """Show the container of one tab and hide the others."""
+        self.weather_container.visible = (tab_index == 0)
+        self.forecast_container.visible = (tab_index == 1)
+        self.comparison_container.visible = (tab_index == 2)
+        self.history_container.visible = (tab_index == 3)
+    
     def toggle_theme(self, e):
         """Toggle between light and dark theme."""
         if self.page.theme_mode == ft.ThemeMode.LIGHT:
@@ -412,7 +479,7 @@ class WeatherApp:
         
         # Redisplay if weather data exists
         if self.current_weather_data:
-            self.display_weather(self.current_weather_data)
+            self.display_weather(self.current_weather_data, self.current_air_quality)
         
         # Redisplay if forecast data exists
         if self.current_forecast_data:
@@ -422,30 +489,23 @@ class WeatherApp:
         if self.watchlist_weather_data:
             self.update_comparison_display()
         
+        # Redisplay history chart
+        if self.current_weather_data:
+            self.display_history()
+        
         # Restore tab visibility state
         if self.tabs.visible:
-            if current_tab == 0:
-                self.weather_container.visible = True
-                self.forecast_container.visible = False
-                self.comparison_container.visible = False
-            elif current_tab == 1:
-                self.weather_container.visible = False
-                self.forecast_container.visible = True
-                self.comparison_container.visible = False
-            else:
-                self.weather_container.visible = False
-                self.forecast_container.visible = False
-                self.comparison_container.visible = True
+            self.show_tab(current_tab)
         
         self.page.update()
     
     def convert_temp(self, temp_celsius):
-        """Convert temperature based on current unit."""
-        return (temp_celsius * 9/5) + 32 if self.current_unit == "imperial" else temp_celsius
+        """Convert temperature based on current unit (data is always metric)."""
+        return units.convert_temp(temp_celsius, self.current_unit)
     
     def get_unit_symbol(self):
         """Get temperature unit symbol."""
-        return "°F" if self.current_unit == "imperial" else "°C"
+        return units.temp_symbol(self.current_unit)
     
     def _extract_weather_data(self, data: dict):
         """Extract common weather data fields."""
@@ -475,30 +535,50 @@ class WeatherApp:
             self.show_error("Please enter a city name")
             return
         
+        # Geocode the city, then fetch weather, forecast and air quality in parallel
+        await self.show_report(self.weather_service.get_city_report(city), city)
+    
+    async def get_location_weather(self):
+        """Fetch and display weather for the current (IP-based) location."""
+        # On the web, locate the visitor rather than the server
+        await self.show_report(self.weather_service.get_location_report(self.page.client_ip))
+    
+    async def show_report(self, pending_report, city=None):
+        """Await a WeatherService report and display its weather and forecast.
+        
+        city is the name as typed, as in the watchlist, so alert rules and
+        state for a place are shared; located reports use the geocoded name.
+        """
         # Show loading, hide previous results
         self.loading.visible = True
         self.error_message.visible = False
         self.weather_container.visible = False
         self.forecast_container.visible = False
+        self.history_container.visible = False
         self.tabs.visible = False
         self.page.update()
         
         try:
-            # Fetch both current weather and forecast data
-            weather_data, forecast_data = await asyncio.gather(
-                self.weather_service.get_weather(city),
-                self.weather_service.get_forecast(city, self.current_unit),
+            report = await pending_report
+            weather_data = report["weather"]
+            forecast_data = report["forecast"]
+            
+            # Fetch any icons not cached yet before rendering
+            await self.icons.ensure(
+                [weather_data.get("weather", [{}])[0].get("icon")]
+                + [item["weather"][0]["icon"] for item in forecast_data.get("list", [])]
             )
             
-            # Display weather and forecast
-            self.display_weather(weather_data)
+            # Display weather, forecast and recorded history
+            self.display_weather(weather_data, report["air_quality"])
             self.display_forecast(forecast_data)
+            self.display_history()
+            self.check_alerts([(city or report["location"].name, weather_data, forecast_data)])
             
             # Show tabs
             self.tabs.visible = True
             self.tabs.selected_index = 0  # Start with current weather
-            self.weather_container.visible = True
-            self.forecast_container.visible = False
+            self.show_tab(0)
             
         except Exception as e:
             self.show_error(str(e))
@@ -580,7 +660,7 @@ class WeatherApp:
                         ),
                         ft.Container(
                             ft.Image(
-                                src=f"https://openweathermap.org/img/wn/{most_common_icon}@2x.png",
+                                src=self.icons.src(most_common_icon),
                                 width=80,
                                 height=80,
                             ),
@@ -644,6 +724,7 @@ class WeatherApp:
                     weight=ft.FontWeight.BOLD,
                     color=ft.Colors.BLUE_700,
                 ),
+                self.create_forecast_chart({data.get("city", {}).get("name", ""): data}),
                 ft.Row(
                     forecast_cards,
                     alignment=ft.MainAxisAlignment.CENTER,
@@ -658,10 +739,52 @@ class WeatherApp:
         
         self.page.update()
     
-    def display_weather(self, data: dict):
+    def on_chart_field_change(self, e):
+        """Switch the forecast charts between temperature and precipitation chance."""
+        self.chart_field = next(iter(e.control.selected))
+        if self.current_forecast_data:
+            self.display_forecast(self.current_forecast_data)
+        if self.watchlist_forecast_data:
+            self.update_comparison_display()
+    
+    def create_forecast_chart(self, forecasts: dict, legend: bool = False):
+        """Chart of the 3-hourly forecast for one or more cities (name -> forecast data)."""
+        unit = self.get_unit_symbol() if self.chart_field == "temp" else "%"
+        series = {
+            name: charts.forecast_points(forecast, self.chart_field, self.convert_temp)
+            for name, forecast in forecasts.items()
+        }
+        controls = [
+            ft.Row(
+                [
+                    ft.Text(
+                        f"{charts.CHART_FIELDS[self.chart_field]} ({unit}), every 3 hours",
+                        size=16,
+                        weight=ft.FontWeight.BOLD,
+                    ),
+                    ft.SegmentedButton(
+                        selected={self.chart_field},
+                        segments=[
+                            ft.Segment(value=field, label=ft.Text(label))
+                            for field, label in charts.CHART_FIELDS.items()
+                        ],
+                        on_change=self.on_chart_field_change,
+                    ),
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                wrap=True,
+            ),
+        ]
+        if legend:
+            controls.append(charts.chart_legend(list(series)))
+        controls.append(charts.forecast_chart(series, self.chart_field))
+        return ft.Column(controls, spacing=10)
+    
+    def display_weather(self, data: dict, air_quality: dict = None):
         """Display weather information."""
         # Store current weather data
         self.current_weather_data = data
+        self.current_air_quality = air_quality
         
         # Extract data using helper
         weather = self._extract_weather_data(data)
@@ -688,7 +811,7 @@ class WeatherApp:
                     ft.Row(
                         [
                             ft.Image(
-                                src=f"https://openweathermap.org/img/wn/{weather['icon_code']}@2x.png",
+                                src=self.icons.src(weather['icon_code']),
                                 width=100,
                                 height=100,
                             ),
@@ -724,17 +847,18 @@ class WeatherApp:
                 ft.Row(
                     [
                         self.create_info_card(ft.Icons.WATER_DROP, "Humidity", f"{weather['humidity']}%"),
-                        self.create_info_card(ft.Icons.AIR, "Wind Speed", f"{weather['wind_speed']} m/s"),
+                        self.create_info_card(ft.Icons.AIR, "Wind Speed", units.format_wind(weather['wind_speed'], self.current_unit)),
                     ],
                     alignment=ft.MainAxisAlignment.CENTER,
                 ),
                 ft.Row(
                     [
-                        self.create_info_card(ft.Icons.COMPRESS, "Pressure", f"{weather['pressure']} hPa"),
+                        self.create_info_card(ft.Icons.COMPRESS, "Pressure", units.format_pressure(weather['pressure'], self.current_unit)),
                         self.create_info_card(ft.Icons.CLOUD, "Cloudiness", f"{weather['cloudiness']} %"),
                     ],
                     alignment=ft.MainAxisAlignment.CENTER,
                 ),
+                *self.create_air_quality_row(air_quality),
             ],
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             spacing=10,
@@ -753,24 +877,229 @@ class WeatherApp:
             self.weather_container.opacity = 1
             self.page.update()
 
-        # Check for high temperature alert
-        if temp > 35:
-            alert = ft.Banner(
-                bgcolor=ft.Colors.AMBER_100,
-                leading=ft.Icon(ft.Icons.WARNING, color=ft.Colors.AMBER, size=40),
-                content=ft.Text("⚠️ High temperature alert!"),
-                actions=[
-                    ft.TextButton("OK", on_click=lambda e: setattr(self.page.banner, 'open', False) or self.page.update()),
-                ],
-            )
-            self.page.banner = alert
-            self.page.banner.open = True
-            self.page.update()
-        
         self.page.run_task(fade_in)
 
 
 
+    def on_history_range_change(self, e):
+        """Redraw the history chart for the chosen time range."""
+        self.history_range = next(iter(e.control.selected))
+        self.display_history()
+        self.page.update()
+    
+    def display_history(self):
+        """Display the recorded temperature of the current city as min/mean/max lines."""
+        history = self.weather_service.history
+        if not self.current_weather_data or history is None:
+            return
+        
+        span = HISTORY_RANGES[self.history_range]
+        now = time.time()
+        points = history.series(
+            series_key(self.current_weather_data), "temp",
+            start=now - span, end=now, max_points=HISTORY_POINTS,
+        )
+        
+        range_selector = ft.SegmentedButton(
+            selected={self.history_range},
+            segments=[ft.Segment(value=name, label=ft.Text(name)) for name in HISTORY_RANGES],
+            on_change=self.on_history_range_change,
+        )
+        
+        if len(points) < 2:
+            chart = ft.Text(
+                "Not enough history yet. Observations are recorded each time this city is refreshed.",
+                color=ft.Colors.GREY_600,
+                text_align=ft.TextAlign.CENTER,
+            )
+        else:
+            def line(values, color, width):
+                return ft.LineChartData(
+                    data_points=[
+                        ft.LineChartDataPoint(point.ts, round(self.convert_temp(value), 1))
+                        for point, value in zip(points, values)
+                    ],
+                    color=color,
+                    stroke_width=width,
+                    curved=True,
+                    prevent_curve_over_shooting=True,
+                )
+            
+            # A handful of date labels along the bottom
+            label_format = "%H:%M" if span <= DAY else "%b %d"
+            step = max(1, len(points) // 5)
+            labels = [
+                ft.ChartAxisLabel(
+                    value=point.ts,
+                    label=ft.Text(datetime.fromtimestamp(point.ts).strftime(label_format), size=10),
+                )
+                for point in points[::step]
+            ]
+            chart = ft.LineChart(
+                data_series=[
+                    line([point.max for point in points], ft.Colors.ORANGE_300, 1),
+                    line([point.mean for point in points], ft.Colors.BLUE_700, 3),
+                    line([point.min for point in points], ft.Colors.LIGHT_BLUE_300, 1),
+                ],
+                left_axis=ft.ChartAxis(labels_size=40),
+                bottom_axis=ft.ChartAxis(labels=labels, labels_size=24),
+                horizontal_grid_lines=ft.ChartGridLines(
+                    color=ft.Colors.with_opacity(0.2, ft.Colors.GREY), width=1,
+                ),
+                tooltip_bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.BLUE_GREY_900),
+                min_x=points[0].ts,
+                max_x=points[-1].ts,
+                height=280,
+                expand=True,
+            )
+        
+        self.history_container.content = ft.Column(
+            [
+                ft.Text(
+                    f"Temperature history ({self.get_unit_symbol()})",
+                    size=20,
+                    weight=ft.FontWeight.BOLD,
+                ),
+                ft.Text("Lowest, mean and highest reading per interval", size=12, color=ft.Colors.GREY_600),
+                range_selector,
+                chart,
+            ],
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            spacing=10,
+        )
+    
+    def check_alerts(self, updates):
+        """Run refreshed cities (name, weather, forecast) through the alert rules and show what fires."""
+        fired = []
+        for city, weather_data, forecast_data in updates:
+            fired += self.alert_engine.update(city, alerts.observation(weather_data, forecast_data))
+        self.show_alerts(fired)
+    
+    def show_alerts(self, fired, limit=5):
+        """Show new alerts in a banner."""
+        if not fired:
+            return
+        lines = [alerts.describe(alert, self.current_unit) for alert in fired[:limit]]
+        if len(fired) > limit:
+            lines.append(f"...and {len(fired) - limit} more")
+        self.page.banner = ft.Banner(
+            bgcolor=ft.Colors.AMBER_100,
+            leading=ft.Icon(ft.Icons.WARNING, color=ft.Colors.AMBER, size=40),
+            content=ft.Column([ft.Text(f"⚠️ {line}", color=ft.Colors.BLACK) for line in lines], tight=True),
+            actions=[
+                ft.TextButton("OK", on_click=lambda e: setattr(self.page.banner, 'open', False) or self.page.update()),
+            ],
+        )
+        self.page.banner.open = True
+        self.page.update()
+    
+    def open_alerts_dialog(self, e):
+        """Show the alert rules with a form to add more."""
+        unit_symbol = self.get_unit_symbol()
+        wind_symbol = units.WIND_SYMBOLS[self.current_unit]
+        self.rule_field = ft.Dropdown(
+            label="Field",
+            value="temp",
+            options=[ft.dropdown.Option(key=field, text=label) for field, label in alerts.FIELDS.items()],
+            width=200,
+        )
+        self.rule_op = ft.Dropdown(
+            label="Condition",
+            value=">",
+            options=[ft.dropdown.Option(op) for op in list(alerts.OPERATORS) + list(alerts.TRENDS)],
+            width=120,
+        )
+        self.rule_value = ft.TextField(label=f"Value ({unit_symbol}, {wind_symbol} or %)", width=160)
+        self.rule_hours = ft.TextField(label="Within hours (trends)", width=160)
+        self.rule_city = ft.TextField(label="City (empty for all)", width=200)
+        self.rules_column = ft.Column(spacing=0, tight=True)
+        self.refresh_rules_list()
+        
+        self.alerts_dialog = ft.AlertDialog(
+            title=ft.Text("Weather alerts"),
+            content=ft.Column(
+                [
+                    self.rules_column,
+                    ft.Divider(),
+                    ft.Row([self.rule_field, self.rule_op, self.rule_value], wrap=True),
+                    ft.Row([self.rule_hours, self.rule_city], wrap=True),
+                ],
+                tight=True,
+                scroll=ft.ScrollMode.AUTO,
+                width=520,
+            ),
+            actions=[
+                ft.TextButton("Add rule", on_click=self.add_alert_rule),
+                ft.TextButton("Close", on_click=lambda e: self.page.close(self.alerts_dialog)),
+            ],
+        )
+        self.page.open(self.alerts_dialog)
+    
+    def refresh_rules_list(self):
+        """List the current alert rules with delete buttons."""
+        self.rules_column.controls = [
+            ft.Row(
+                [
+                    ft.Text(alerts.describe_rule(rule, self.current_unit), expand=True),
+                    ft.IconButton(
+                        icon=ft.Icons.DELETE_OUTLINE,
+                        tooltip="Delete rule",
+                        on_click=lambda e, r=rule: self.delete_alert_rule(r),
+                    ),
+                ],
+            )
+            for rule in self.alert_engine.rules
+        ] or [ft.Text("No alert rules", color=ft.Colors.GREY_600)]
+    
+    def add_alert_rule(self, e):
+        """Add the rule described by the dialog's form."""
+        field, op = self.rule_field.value, self.rule_op.value
+        trend = op in alerts.TRENDS
+        try:
+            value = alerts.from_display(field, float(self.rule_value.value), self.current_unit, delta=trend)
+            hours = float(self.rule_hours.value) if trend else 0
+        except (TypeError, ValueError):
+            self.rule_value.error_text = "Enter a number (and hours for a trend)"
+            self.page.update()
+            return
+        try:
+            rule = alerts.Rule(field, op, value, hours * 3600, (self.rule_city.value or "").strip() or None)
+            fired = self.alert_engine.add_rule(rule)
+        except ValueError as error:
+            self.rule_value.error_text = str(error)
+            self.page.update()
+            return
+        self.rule_value.error_text = None
+        self.rule_value.value = ""
+        self.save_alert_rules()
+        self.refresh_rules_list()
+        self.page.update()
+        self.show_alerts(fired)
+    
+    def delete_alert_rule(self, rule):
+        """Remove an alert rule."""
+        self.alert_engine.remove_rule(rule)
+        self.save_alert_rules()
+        self.refresh_rules_list()
+        self.page.update()
+    
+    def create_air_quality_row(self, air_quality: dict = None):
+        """Air quality index and PM2.5 cards, or nothing if no data is available."""
+        readings = (air_quality or {}).get("list") or []
+        if not readings:
+            return []
+        aqi = readings[0].get("main", {}).get("aqi")
+        pm2_5 = readings[0].get("components", {}).get("pm2_5")
+        return [
+            ft.Row(
+                [
+                    self.create_info_card(ft.Icons.MASKS, "Air Quality", AQI_LABELS.get(aqi, "Unknown")),
+                    self.create_info_card(ft.Icons.GRAIN, "PM2.5", f"{pm2_5:.0f} µg/m³" if pm2_5 is not None else "-"),
+                ],
+                alignment=ft.MainAxisAlignment.CENTER,
+            )
+        ]
+    
     def create_info_card(self, icon, label, value):
         """Create an info card for weather details."""
         return ft.Container(
@@ -878,6 +1207,7 @@ class WeatherApp:
             self.save_watchlist()
             if city in self.watchlist_weather_data:
                 del self.watchlist_weather_data[city]
+            self.watchlist_forecast_data.pop(city, None)
             self.update_comparison_display()
     
     async def refresh_comparison(self):
@@ -892,17 +1222,32 @@ class WeatherApp:
         self.page.update()
         
         try:
-            # Fetch weather for all cities
+            # Fetch weather and forecast for all cities
             tasks = [self.weather_service.get_weather(city) for city in self.watchlist]
+            tasks += [self.weather_service.get_forecast(city) for city in self.watchlist]
             results = await asyncio.gather(*tasks, return_exceptions=True)
             
             # Store results
             self.watchlist_weather_data = {}
-            for city, result in zip(self.watchlist, results):
+            self.watchlist_forecast_data = {}
+            count = len(self.watchlist)
+            for city, result, forecast in zip(self.watchlist, results[:count], results[count:]):
                 if isinstance(result, Exception):
                     print(f"Error fetching weather for {city}: {result}")
                 else:
                     self.watchlist_weather_data[city] = result
+                if not isinstance(forecast, Exception):
+                    self.watchlist_forecast_data[city] = forecast
+            
+            await self.icons.ensure(
+                data.get("weather", [{}])[0].get("icon")
+                for data in self.watchlist_weather_data.values()
+            )
+            
+            self.check_alerts([
+                (city, data, self.watchlist_forecast_data.get(city))
+                for city, data in self.watchlist_weather_data.items()
+            ])
             
             # Update display
             self.update_comparison_display()
@@ -944,6 +1289,22 @@ class WeatherApp:
                 )
             )
         else:
+            # Overlay the forecasts of all watched cities
+            forecasts = {
+                city: self.watchlist_forecast_data[city]
+                for city in self.watchlist
+                if city in self.watchlist_forecast_data
+            }
+            if forecasts:
+                self.comparison_cards_container.controls.append(
+                    ft.Container(
+                        content=self.create_forecast_chart(forecasts, legend=True),
+                        border=ft.border.all(1, ft.Colors.BLUE_200),
+                        border_radius=10,
+                        padding=15,
+                    )
+                )
+            
             # Create comparison cards
             for city in self.watchlist:
                 weather_data = self.watchlist_weather_data.get(city)
@@ -1029,7 +1390,7 @@ class WeatherApp:
                                 [
                                     ft.Container(
                                         ft.Image(
-                                            src=f"https://openweathermap.org/img/wn/{weather['icon_code']}@2x.png",
+                                            src=self.icons.src(weather['icon_code']),
                                             width=60,
                                             height=60,
                                         ),
@@ -1078,7 +1439,7 @@ class WeatherApp:
                                     ft.Row(
                                         [
                                             ft.Icon(ft.Icons.AIR, size=16, color=ft.Colors.BLUE_700),
-                                            ft.Text(f"{weather['wind_speed']} m/s", size=13, color=ft.Colors.GREY_700),
+                                            ft.Text(units.format_wind(weather['wind_speed'], self.current_unit), size=13, color=ft.Colors.GREY_700),
                                         ],
                                         spacing=5,
                                     ),
@@ -1105,4 +1466,4 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    ft.app(target=main, assets_dir="assets")
\ No newline at end of file
@@ -2,7 +2,20 @@
 """Simple tests for weather service."""
 
 import asyncio
-from weather_service import WeatherService, WeatherServiceError
+import io
+import json
+import tempfile
+import time
+import httpx
+from pathlib import Path
+from weather_service import NotFoundError, WeatherService, WeatherServiceError, shared_service
+from icon_cache import IconCache, PNG_SIGNATURE, PNG_END
+import alerts
+import charts
+import units
+from weather_cli import Writer, run_batch
+from gateway import Gateway
+from weather_history import WeatherHistory
 
 
 async def test_valid_city():
@@ -43,6 +56,334 @@ async def test_empty_city():
         return True
 
 
+async def test_icon_cache_validation():
+    """Test that damaged cached icons are discarded and valid ones served locally."""
+    with tempfile.TemporaryDirectory() as tmp:
+        icons = IconCache(Path(tmp), "https://example.invalid/{code}.png")
+        icons.directory.mkdir()
+        icons.path("10d").write_bytes(PNG_SIGNATURE + b"truncated")
+        icons.path("01n").write_bytes(PNG_SIGNATURE + b"data" + PNG_END)
+        
+        damaged_src = icons.src("10d")
+        valid_src = icons.src("01n")
+        if (damaged_src == "https://example.invalid/10d.png"
+                and not icons.path("10d").exists()
+                and valid_src == "/icons/01n@2x.png"):
+            print("✅ Icon cache rejects damaged files and serves valid ones locally")
+            return True
+        print(f"❌ Unexpected icon sources: {damaged_src}, {valid_src}")
+        return False
+
+
+async def test_unit_conversions():
+    """Test temperature, wind speed and pressure conversions."""
+    checks = [
+        (units.convert_temp(100, "imperial"), 212),
+        (units.convert_temp(-40, "imperial"), -40),
+        (units.convert_temp(0, "standard"), 273.15),
+        (units.convert_temp(21.5, "metric"), 21.5),
+        (round(units.convert_wind(10, "imperial"), 2), 22.37),
+        (units.convert_wind(10, "metric"), 10),
+        (round(units.convert_pressure(1013.25, "imperial"), 2), 29.92),
+        (units.format_temp(20, "imperial"), "68.0°F"),
+        (units.format_wind(10, "imperial"), "22.4 mph"),
+        (units.format_pressure(1013, "metric"), "1013 hPa"),
+    ]
+    failed = [(got, expected) for got, expected in checks if got != expected]
+    if failed:
+        print(f"❌ Conversions wrong (got, expected): {failed}")
+        return False
+    print("✅ Unit conversions are correct")
+    return True
+
+
+async def test_unit_switch_uses_cache():
+    """Test that current and forecast data are both metric and a unit switch needs no request."""
+    requested_units = []
+    
+    def handler(request):
+        requested_units.append(request.url.params["units"])
+        if request.url.path.endswith("/direct"):
+            return httpx.Response(200, json=[{"name": "London", "country": "GB", "lat": 51.5, "lon": -0.13}])
+        if request.url.path.endswith("/forecast"):
+            return httpx.Response(200, json={"list": [{"dt": 0, "main": {"temp": 20.0}}]})
+        return httpx.Response(200, json={"name": "London", "main": {"temp": 20.0}, "wind": {"speed": 10}})
+    
+    service = WeatherService(transport=httpx.MockTransport(handler), geocode_file=None)
+    shown = {}
+    for unit in ("metric", "imperial", "metric"):
+        weather, forecast = await asyncio.gather(
+            service.get_weather("London"), service.get_forecast("London")
+        )
+        shown[unit] = (
+            units.format_temp(weather["main"]["temp"], unit),
+            units.format_temp(forecast["list"][0]["main"]["temp"], unit),
+        )
+    
+    # One geocoding request, then one each for weather and forecast
+    if (requested_units == ["metric"] * 3
+            and service.requests_made == 3
+            and shown["imperial"] == ("68.0°F", "68.0°F")
+            and shown["metric"] == ("20.0°C", "20.0°C")):
+        print("✅ Unit switch reuses cached metric data")
+        return True
+    print(f"❌ Requests {requested_units}, shown {shown}")
+    return False
+
+
+async def test_geocode_cache():
+    """Test that a city is geocoded once, persisted, and then fetched by coordinates."""
+    paths = []
+    
+    def handler(request):
+        paths.append((request.url.path, dict(request.url.params)))
+        if request.url.path.endswith("/direct"):
+            return httpx.Response(200, json=[{"name": "Paris", "country": "FR", "lat": 48.8566, "lon": 2.3522}])
+        return httpx.Response(200, json={"list": []})
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        geocode_file = Path(tmp) / "geocode_cache.json"
+        service = WeatherService(transport=httpx.MockTransport(handler), geocode_file=geocode_file)
+        await asyncio.gather(service.get_city_report("Paris"), service.resolve("  paris "))
+        await service.close()
+        
+        restarted = WeatherService(transport=httpx.MockTransport(handler), geocode_file=geocode_file)
+        location = await restarted.resolve("PARIS")
+    
+    geocode_calls = [path for path, _ in paths if path.endswith("/direct")]
+    coordinates = {(params.get("lat"), params.get("lon"), "q" in params)
+                   for path, params in paths if not path.endswith("/direct")}
+    by_coordinates = len(coordinates) == 1 and not coordinates.pop()[2]
+    if (len(geocode_calls) == 1 and by_coordinates and len(paths) == 4
+            and location.name == "Paris" and restarted.geocode_hits == 1):
+        print("✅ Geocoding is cached on disk and data is fetched by coordinates")
+        return True
+    print(f"❌ Unexpected requests: {paths}")
+    return False
+
+
+async def test_grid_cache_and_ip_location():
+    """Test that nearby coordinates share a request and the IP location is reused."""
+    paths = []
+    
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.host == "ipapi.co":
+            return httpx.Response(200, json={"city": "London", "country_code": "GB",
+                                             "latitude": 51.5074, "longitude": -0.1278})
+        return httpx.Response(200, json={"name": "London", "main": {"temp": 12.0}})
+    
+    service = WeatherService(transport=httpx.MockTransport(handler), geocode_file=None)
+    await service.get_weather_by_coordinates(51.5074, -0.1278)
+    await service.get_weather_by_coordinates(51.5079, -0.1270)  # about 80 m away
+    await service.get_location_weather()
+    await service.get_location_weather()
+    
+    try:
+        await service.get_weather_by_coordinates(95, 0)
+        out_of_range = False
+    except WeatherServiceError:
+        out_of_range = True
+    
+    if paths == ["/data/2.5/weather", "/json/"] and out_of_range:
+        print("✅ Nearby coordinates share one cache entry and the IP location is cached")
+        return True
+    print(f"❌ Unexpected requests: {paths}, out of range rejected: {out_of_range}")
+    return False
+
+
+async def test_batch_cli():
+    """Test that the batch CLI streams results, retries server errors and reports failures."""
+    failures = {"weather": 1}
+    
+    def handler(request):
+        params = request.url.params
+        if request.url.path.endswith("/direct"):
+            if params["q"] == "Nowhere":
+                return httpx.Response(200, json=[])
+            return httpx.Response(200, json=[{"name": "London", "country": "GB", "lat": 51.5, "lon": -0.13}])
+        if failures["weather"]:
+            failures["weather"] -= 1
+            return httpx.Response(503)
+        return httpx.Response(200, json={"name": "London", "main": {"temp": 10.0}, "wind": {"speed": 1.0}})
+    
+    output = io.StringIO()
+    async with WeatherService(transport=httpx.MockTransport(handler), geocode_file=None) as service:
+        outcomes = await run_batch(
+            io.StringIO("London\n# comment\n\n51.5,-0.13\nNowhere\n"),
+            service, Writer(output, "ndjson"), "imperial", concurrency=2, retries=2, backoff=0,
+        )
+    records = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda r: r["line"])
+    
+    if ([r["line"] for r in records] == [1, 4, 5]
+            and [r["ok"] for r in records] == [True, True, False]
+            and records[0]["temp"] == 50.0
+            and outcomes["ok"] == 2):
+        print("✅ Batch CLI streams results, retries and reports errors")
+        return True
+    print(f"❌ Unexpected batch output: {records}")
+    return False
+
+
+async def test_shared_single_flight():
+    """Test that concurrent sessions asking for the same data cause one upstream call."""
+    calls = []
+    
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"name": "Tokyo", "main": {"temp": 18.0}})
+    
+    service = WeatherService(transport=httpx.MockTransport(handler), geocode_file=None)
+    results = await asyncio.gather(*(service.get_weather_by_coordinates(35.68, 139.69) for _ in range(20)))
+    
+    if (len(calls) == 1 and service.coalesced == 19
+            and all(result is results[0] for result in results)
+            and shared_service() is shared_service()):
+        print("✅ Concurrent identical requests share one upstream call")
+        return True
+    print(f"❌ {len(calls)} upstream calls, {service.coalesced} coalesced")
+    return False
+
+
+async def test_gateway():
+    """Test that clients of the local gateway share its cache and get API-style errors."""
+    calls = []
+    
+    async def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.endswith("/direct"):
+            if request.url.params["q"] == "Nowhere":
+                return httpx.Response(200, json=[])
+            return httpx.Response(200, json=[{"name": "Oslo", "country": "NO", "lat": 59.91, "lon": 10.75}])
+        return httpx.Response(200, json={"name": "Oslo", "dt": 1, "main": {"temp": 4.0}})
+    
+    upstream = WeatherService(transport=httpx.MockTransport(handler), geocode_file=None)
+    gateway = Gateway(upstream, client_per_minute=60)
+    await gateway.start("127.0.0.1", 0)
+    root = f"http://127.0.0.1:{gateway.port}"
+    try:
+        clients = [WeatherService(geocode_file=None, api_root=root) for _ in range(3)]
+        results = [await client.get_weather("Oslo") for client in clients]
+        try:
+            await clients[0].get_weather("Nowhere")
+            not_found = False
+        except NotFoundError:
+            not_found = True
+        async with httpx.AsyncClient() as client:
+            imperial = await client.get(root + "/data/2.5/weather", params={"q": "Oslo", "units": "imperial"})
+            statuses = [(await client.get(root + "/gateway/stats")).status_code for _ in range(20)]
+        # A body the gateway does not read must not be taken for the next request.
+        reader, writer = await asyncio.open_connection("127.0.0.1", gateway.port)
+        smuggled = b"GET /gateway/stats HTTP/1.1\r\n\r\n"
+        writer.write(b"POST /gateway/stats HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(smuggled), smuggled))
+        try:
+            replies = (await asyncio.wait_for(reader.read(), 5)).count(b"HTTP/1.1 ")
+        except asyncio.TimeoutError:
+            replies = None  # the connection was kept open
+        writer.close()
+    finally:
+        await gateway.close()
+    
+    if (all(result["name"] == "Oslo" for result in results) and calls.count("/data/2.5/weather") == 1
+            and not_found and imperial.status_code == 400 and 429 in statuses and replies == 1):
+        print("✅ Gateway serves many clients from one cache")
+        return True
+    print(f"❌ Gateway: upstream {calls}, 404 {not_found}, imperial {imperial.status_code}, {statuses}, "
+          f"{replies} replies to a POST")
+    return False
+
+
+async def test_weather_history():
+    """Test that current weather is recorded once per observation and rolled up for range queries."""
+    start = (int(time.time()) // 86400 - 3) * 86400  # midnight UTC three days ago
+    clock = {"dt": start}
+    
+    async def handler(request):
+        return httpx.Response(200, json={
+            "name": "Oslo", "sys": {"country": "NO"}, "dt": clock["dt"],
+            "main": {"temp": (clock["dt"] - start) / 3600, "humidity": 80, "pressure": 1000},
+            "wind": {"speed": 2.0},
+        })
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        history = WeatherHistory(Path(tmp) / "history.db")
+        service = WeatherService(transport=httpx.MockTransport(handler), geocode_file=None, history=history)
+        service.cache_ttl = 0
+        for hour in range(48):
+            clock["dt"] = start + hour * 3600
+            await service.get_weather_by_coordinates(59.91, 10.75)
+            await service.get_weather_by_coordinates(59.91, 10.75)  # same observation again
+        history.close()
+        recorded = history.recorded
+        
+        history = WeatherHistory(Path(tmp) / "history.db")
+        end = start + 47 * 3600
+        raw = history.series("oslo,no", start=end - 5 * 3600, end=end, max_points=100)
+        daily = history.series("oslo,no", start=start, end=end, max_points=2)
+        history.prune(time.time() + 3651 * 86400)
+        pruned = history.series("oslo,no", start=start, end=end, max_points=2)
+        history.close()
+    
+    if (recorded == 48 and [point.mean for point in raw] == [42, 43, 44, 45, 46, 47]
+            and [(point.min, point.mean, point.max) for point in daily] == [(0, 11.5, 23), (24, 35.5, 47)]
+            and pruned == []):
+        print("✅ Weather history records each observation once and serves rollups")
+        return True
+    print(f"❌ Weather history: {recorded} recorded, raw {raw}, daily {daily}, after pruning {pruned}")
+    return False
+
+
+async def test_chart_downsampling():
+    """Test that overlaid forecast series share a fixed point budget and keep their extremes."""
+    points = [(hour * 3600, 10 + (5 if hour % 24 == 14 else 0) - (5 if hour % 24 == 4 else 0)) for hour in range(240)]
+    reduced = charts.lttb(points, 30)
+    kept = {y for _, y in reduced}
+    chart = charts.forecast_chart({f"City {i}": points for i in range(10)}, total_points=160)
+    total = sum(len(line.data_points) for line in chart.data_series)
+    
+    if (len(reduced) == 30 and reduced[0] == points[0] and reduced[-1] == points[-1]
+            and kept == {5, 10, 15} and total == 160 and charts.lttb(points[:5], 10) == points[:5]):
+        print("✅ Chart series are downsampled to a fixed budget with LTTB")
+        return True
+    print(f"❌ Chart downsampling: {len(reduced)} points, values {kept}, {total} points charted")
+    return False
+
+
+async def test_alert_engine():
+    """Test that alerts fire once per crossing, respect the cooldown and skip unaffected rules."""
+    rules = [
+        alerts.Rule("temp", ">", 35),
+        alerts.Rule("temp", "falls", 8, 3 * 3600),
+        alerts.Rule("humidity", ">=", 90, city="Oslo"),
+        alerts.Rule("wind", ">", 40),
+    ]
+    engine = alerts.AlertEngine(rules, cooldown=3600)
+    fired = []
+    for ts, temp in ((0, 30), (600, 36), (1200, 37), (1800, 34), (2400, 36), (6000, 34), (7200, 36), (9000, 27)):
+        fired += [(a.rule.op, a.ts) for a in engine.update("Cairo", {"temp": temp, "humidity": 95, "wind": 5}, ts)]
+    evaluations = engine.evaluations
+    engine.update("Cairo", {"temp": 27, "humidity": 95, "wind": 5}, 9600)  # nothing changed
+    unchanged_evaluations = engine.evaluations - evaluations
+    oslo = engine.update("Oslo", {"humidity": 95}, 0)
+    
+    # A trend rule added later must use each city's own readings of its own field
+    late = alerts.AlertEngine([alerts.Rule("temp", "rises", 5, 3600)], cooldown=3600, clock=lambda: 600)
+    late.update("A", {"wind": 3, "temp": 1}, 0)
+    late.update("B", {"temp": 0}, 0)
+    late.update("B", {"temp": 10}, 600)
+    added = late.add_rule(alerts.Rule("wind", "rises", 2, 3600))
+    
+    if (fired == [(">", 600), (">", 7200), ("falls", 9000)] and engine.suppressed == 1
+            and unchanged_evaluations == 0 and engine.skipped > 0
+            and [a.rule.city for a in oslo] == ["Oslo"] and engine.add_rule(alerts.Rule("temp", "<", 30)) and not added):
+        print("✅ Alert rules fire on transitions and skip unchanged values")
+        return True
+    print(f"❌ Alert engine: fired {fired}, {engine.suppressed} suppressed, {engine.evaluations} evaluations, "
+          f"added rule raised {added}")
+    return False
+
+
 async def run_tests():
     """Run all tests."""
     print("Running Weather Service Tests\n")
@@ -52,6 +393,17 @@ async def run_tests():
     results.append(await test_valid_city())
     results.append(await test_invalid_city())
     results.append(await test_empty_city())
+    results.append(await test_icon_cache_validation())
+    results.append(await test_unit_conversions())
+    results.append(await test_unit_switch_uses_cache())
+    results.append(await test_geocode_cache())
+    results.append(await test_grid_cache_and_ip_location())
+    results.append(await test_batch_cli())
+    results.append(await test_shared_single_flight())
+    results.append(await test_gateway())
+    results.append(await test_weather_history())
+    results.append(await test_chart_downsampling())
+    results.append(await test_alert_engine())
     
     print("\n" + "=" * 50)
     passed = sum(results)
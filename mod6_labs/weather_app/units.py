@@ -0,0 +1,82 @@
+# units.py
+"""Unit conversion for weather values.
+
+The service always fetches data in metric units (Celsius, m/s, hPa), so a
+cached response is valid whatever the user picked; everything shown on
+screen goes through these helpers to convert to the display units.
+"""
+
+# Units the API is queried in; every cached response uses them.
+CANONICAL_UNITS = "metric"
+
+UNIT_SYSTEMS = ("metric", "imperial", "standard")
+
+TEMP_SYMBOLS = {"metric": "°C", "imperial": "°F", "standard": "K"}
+WIND_SYMBOLS = {"metric": "m/s", "imperial": "mph", "standard": "m/s"}
+PRESSURE_SYMBOLS = {"metric": "hPa", "imperial": "inHg", "standard": "hPa"}
+
+MPH_PER_MS = 3600 / 1609.344
+INHG_PER_HPA = 1 / 33.8639
+
+
+def _check(units: str):
+    if units not in UNIT_SYSTEMS:
+        raise ValueError(f"Unknown unit system {units!r}; expected one of {', '.join(UNIT_SYSTEMS)}")
+
+
+def convert_temp(celsius: float, units: str) -> float:
+    """Convert a Celsius temperature to the given unit system."""
+    _check(units)
+    if units == "imperial":
+        return celsius * 9 / 5 + 32
+    if units == "standard":
+        return celsius + 273.15
+    return celsius
+
+
+def convert_wind(meters_per_second: float, units: str) -> float:
+    """Convert a wind speed in m/s to the given unit system."""
+    _check(units)
+    return meters_per_second * MPH_PER_MS if units == "imperial" else meters_per_second
+
+
+def convert_pressure(hpa: float, units: str) -> float:
+    """Convert a pressure in hPa to the given unit system."""
+    _check(units)
+    return hpa * INHG_PER_HPA if units == "imperial" else hpa
+
+
+def temp_symbol(units: str) -> str:
+    return TEMP_SYMBOLS[units]
+
+
+def format_temp(celsius: float, units: str, decimals: int = 1) -> str:
+    """e.g. format_temp(20, "imperial") -> '68.0°F'."""
+    return f"{convert_temp(celsius, units):.{decimals}f}{TEMP_SYMBOLS[units]}"
+
+
+def format_wind(meters_per_second: float, units: str, decimals: int = 1) -> str:
+    """e.g. format_wind(10, "imperial") -> '22.4 mph'."""
+    return f"{convert_wind(meters_per_second, units):.{decimals}f} {WIND_SYMBOLS[units]}"
+
+
+def format_pressure(hpa: float, units: str) -> str:
+    """e.g. format_pressure(1013, "imperial") -> '29.91 inHg'."""
+    decimals = 2 if units == "imperial" else 0
+    return f"{convert_pressure(hpa, units):.{decimals}f} {PRESSURE_SYMBOLS[units]}"
+
+
+def to_celsius(value: float, units: str) -> float:
+    """Convert a temperature in the given unit system back to Celsius."""
+    _check(units)
+    if units == "imperial":
+        return (value - 32) * 5 / 9
+    if units == "standard":
+        return value - 273.15
+    return value
+
+
+def to_meters_per_second(value: float, units: str) -> float:
+    """Convert a wind speed in the given unit system back to m/s."""
+    _check(units)
+    return value / MPH_PER_MS if units == "imperial" else value
@@ -0,0 +1,210 @@
+# weather_cli.py
+"""Fetch current weather for many cities or coordinates without the UI.
+
+Reads one query per line from a file or stdin: a city name ("London",
+"Paris, FR") or a "lat,lon" pair ("51.5,-0.12"). Blank lines and lines
+starting with # are skipped. Results are written to stdout as NDJSON or
+CSV in the order they complete, each carrying the input line number, and
+a summary goes to stderr.
+
+Input is read lazily through a bounded queue, so memory use does not grow
+with the size of the input. Timeouts, rate limits and server errors are
+retried with exponential backoff; other errors (unknown city, bad key) are
+reported once. Names are geocoded through the same cache as the app.
+
+Usage:
+    python weather_cli.py cities.txt > weather.ndjson
+    cat coords.txt | python weather_cli.py --format csv --units imperial
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple, Union
+
+import units
+from weather_service import TransientServiceError, WeatherService, WeatherServiceError
+
+FIELDS = [
+    "line", "query", "ok", "name", "country", "lat", "lon", "temp", "feels_like",
+    "humidity", "pressure", "wind_speed", "description", "icon", "dt", "error",
+]
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 3
+BACKOFF = 0.5  # seconds before the first retry; doubled for each further retry
+
+
+def parse_query(line: str) -> Union[str, Tuple[float, float]]:
+    """'51.5, -0.12' -> (51.5, -0.12); anything else is a city name."""
+    parts = line.replace(",", " ").split()
+    if len(parts) == 2:
+        try:
+            return float(parts[0]), float(parts[1])
+        except ValueError:
+            pass
+    return line
+
+
+def summarize(data: Dict, unit_system: str) -> Dict:
+    """The output record for one successful lookup, converted to unit_system."""
+    main = data.get("main", {})
+    weather = data.get("weather", [{}])[0]
+    coord = data.get("coord", {})
+    return {
+        "ok": True,
+        "name": data.get("name"),
+        "country": data.get("sys", {}).get("country"),
+        "lat": coord.get("lat"),
+        "lon": coord.get("lon"),
+        "temp": round(units.convert_temp(main.get("temp", 0), unit_system), 2),
+        "feels_like": round(units.convert_temp(main.get("feels_like", 0), unit_system), 2),
+        "humidity": main.get("humidity"),
+        "pressure": round(units.convert_pressure(main.get("pressure", 0), unit_system), 2),
+        "wind_speed": round(units.convert_wind(data.get("wind", {}).get("speed", 0), unit_system), 2),
+        "description": weather.get("description"),
+        "icon": weather.get("icon"),
+        "dt": data.get("dt"),
+    }
+
+
+async def fetch_with_retry(service: WeatherService, query, retries: int, backoff: float = BACKOFF) -> Dict:
+    """Current weather for a city name or (lat, lon), retrying transient failures."""
+    for attempt in range(retries + 1):
+        try:
+            if isinstance(query, tuple):
+                return await service.get_weather_by_coordinates(*query)
+            return await service.get_weather(query)
+        except TransientServiceError:
+            if attempt == retries:
+                raise
+            # Jitter keeps concurrent workers from retrying in lockstep.
+            await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class Writer:
+    """Writes result records to a text stream as NDJSON or CSV, one line at a time."""
+
+    def __init__(self, stream, output_format: str):
+        self.stream = stream
+        self.csv = None
+        if output_format == "csv":
+            self.csv = csv.DictWriter(stream, FIELDS, extrasaction="ignore")
+            self.csv.writeheader()
+
+    def write(self, record: Dict):
+        if self.csv:
+            self.csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+async def run_batch(
+    stream,
+    service: WeatherService,
+    writer: Writer,
+    unit_system: str = "metric",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = BACKOFF,
+) -> Counter:
+    """
+    Look up every query line from stream and write each result as it completes.
+
+    Returns:
+        Counter with "ok" and one entry per kind of error
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    outcomes: Counter = Counter()
+    loop = asyncio.get_running_loop()
+
+    async def read_lines():
+        number = 0
+        while True:
+            # stdin may block, so read on a thread to keep the workers running.
+            line = await loop.run_in_executor(None, stream.readline)
+            if not line:
+                break
+            number += 1
+            line = line.strip()
+            if line and not line.startswith("#"):
+                await queue.put((number, line))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            number, line = item
+            record = {"line": number, "query": line}
+            try:
+                data = await fetch_with_retry(service, parse_query(line), retries, backoff)
+                record.update(summarize(data, unit_system))
+                outcomes["ok"] += 1
+            except WeatherServiceError as e:
+                record.update(ok=False, error=str(e))
+                # Count by message without the query so the summary stays small.
+                outcomes[str(e).replace(line, "<query>")] += 1
+            writer.write(record)
+
+    await asyncio.gather(read_lines(), *(work() for _ in range(concurrency)))
+    return outcomes
+
+
+def print_summary(outcomes: Counter, elapsed: float, service: WeatherService, out=sys.stderr):
+    total = sum(outcomes.values())
+    failed = total - outcomes["ok"]
+    lookups = service.geocode_hits + service.geocode_misses
+    print(f"{total} queries in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f}/s): "
+          f"{outcomes['ok']} ok, {failed} failed", file=out)
+    print(f"{service.requests_made} API requests"
+          + (f", geocode cache hit rate {service.geocode_hits / lookups:.0%}" if lookups else ""), file=out)
+    for message, count in outcomes.most_common():
+        if message != "ok":
+            print(f"  {count:>6}  {message}", file=out)
+
+
+async def main_async(args) -> Counter:
+    stream = open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin
+    writer = Writer(sys.stdout, args.format)
+    start = time.perf_counter()
+    try:
+        async with WeatherService() as service:
+            outcomes = await run_batch(stream, service, writer, args.units, args.concurrency, args.retries)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print_summary(outcomes, time.perf_counter() - start, service)
+    return outcomes
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="file with one query per line (default: stdin)")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--units", choices=units.UNIT_SYSTEMS, default="metric")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"requests in flight at once (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"retries for timeouts, rate limits and server errors (default {DEFAULT_RETRIES})")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.retries < 0:
+        parser.error("--retries must not be negative")
+
+    outcomes = asyncio.run(main_async(args))
+    failed = sum(outcomes.values()) - outcomes["ok"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# weather_history.py
+"""Local time-series store of observed weather.
+
+Every current-weather result the service fetches is recorded per place
+(see WeatherService(history=...)). Observations are kept in SQLite:
+
+    observations   one row per (place, observation time), kept HISTORY_RAW_DAYS
+    rollups        hourly and daily count/min/max/sum per field, updated on
+                   insert and kept HISTORY_HOURLY_DAYS / HISTORY_DAILY_DAYS
+
+Both tables are WITHOUT ROWID and keyed by (place, time), so a range query
+reads one contiguous run of the primary key. series() picks the finest
+table whose resolution and retention fit the range and groups it in SQL
+to at most max_points buckets, so a year of history costs about as much
+to query as a day.
+"""
+
+import asyncio
+import atexit
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from config import Config
+
+# Fields recorded from a current-weather response (metric units)
+FIELDS = ("temp", "humidity", "pressure", "wind_speed")
+HOUR = 3600
+DAY = 86400
+ROLLUP_WIDTHS = (HOUR, DAY)
+PRUNE_INTERVAL = HOUR  # seconds between retention sweeps
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+)
+
+
+class Point(NamedTuple):
+    """One bucket of a series: start time (unix seconds) and min/mean/max of the field."""
+    ts: int
+    min: float
+    mean: float
+    max: float
+
+
+def series_key(data: Dict) -> str:
+    """The place a current-weather response belongs to: "london,gb", or its coordinates."""
+    name = data.get("name")
+    if name:
+        return " ".join(f"{name},{data.get('sys', {}).get('country', '')}".split()).casefold()
+    coord = data.get("coord", {})
+    return f"{coord.get('lat')},{coord.get('lon')}"
+
+
+def observation(data: Dict) -> Dict:
+    """The recorded fields of a current-weather response."""
+    main = data.get("main", {})
+    return {
+        "temp": main.get("temp"),
+        "humidity": main.get("humidity"),
+        "pressure": main.get("pressure"),
+        "wind_speed": data.get("wind", {}).get("speed"),
+    }
+
+
+def _schema() -> List[str]:
+    rollup_columns = ", ".join(
+        f"{field}_n INTEGER NOT NULL DEFAULT 0, {field}_min REAL, {field}_max REAL, {field}_sum REAL"
+        for field in FIELDS
+    )
+    return [
+        """CREATE TABLE IF NOT EXISTS places (
+            id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            name TEXT,
+            country TEXT
+        )""",
+        f"""CREATE TABLE IF NOT EXISTS observations (
+            place_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            {", ".join(f"{field} REAL" for field in FIELDS)},
+            PRIMARY KEY (place_id, ts)
+        ) WITHOUT ROWID""",
+        f"""CREATE TABLE IF NOT EXISTS rollups (
+            place_id INTEGER NOT NULL,
+            width INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            {rollup_columns},
+            PRIMARY KEY (place_id, width, bucket)
+        ) WITHOUT ROWID""",
+    ]
+
+
+def _rollup_upsert() -> str:
+    """Folds one observation (named parameters) into its bucket."""
+    columns = ["place_id", "width", "bucket"]
+    values = [":place_id", ":width", ":bucket"]
+    updates = []
+    for field in FIELDS:
+        columns += [f"{field}_n", f"{field}_min", f"{field}_max", f"{field}_sum"]
+        values += [f":{field} IS NOT NULL", f":{field}", f":{field}", f":{field}"]
+        # SQLite's two-argument min()/max() return NULL if either side is NULL.
+        updates += [
+            f"{field}_n = {field}_n + excluded.{field}_n",
+            f"{field}_min = coalesce(min({field}_min, excluded.{field}_min), {field}_min, excluded.{field}_min)",
+            f"{field}_max = coalesce(max({field}_max, excluded.{field}_max), {field}_max, excluded.{field}_max)",
+            f"{field}_sum = coalesce({field}_sum, 0) + coalesce(excluded.{field}_sum, 0)",
+        ]
+    return (f"INSERT INTO rollups ({', '.join(columns)}) VALUES ({', '.join(values)}) "
+            f"ON CONFLICT (place_id, width, bucket) DO UPDATE SET {', '.join(updates)}")
+
+
+class WeatherHistory:
+    """Append-only store of observations with hourly/daily rollups (see module docstring)."""
+
+    def __init__(self, path=Config.HISTORY_DB, flush_delay: float = Config.HISTORY_FLUSH_DELAY):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.retention = {
+            0: Config.HISTORY_RAW_DAYS * DAY,
+            HOUR: Config.HISTORY_HOURLY_DAYS * DAY,
+            DAY: Config.HISTORY_DAILY_DAYS * DAY,
+        }
+        # Flet may call in from worker threads; one connection, one lock.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        for pragma in PRAGMAS:
+            self._conn.execute(pragma)
+        with self._conn:
+            for statement in _schema():
+                self._conn.execute(statement)
+        self._upsert = _rollup_upsert()
+        self._insert = (f"INSERT OR IGNORE INTO observations (place_id, ts, {', '.join(FIELDS)}) "
+                        f"VALUES (:place_id, :ts, {', '.join(':' + field for field in FIELDS)})")
+        self._places: Dict[str, int] = dict(self._conn.execute("SELECT key, id FROM places"))
+        self._last_ts: Dict[str, int] = {}
+        self._pending: List[Dict] = []
+        self._flush_task: Optional[asyncio.Future] = None
+        self._pruned = 0.0
+        self.recorded = 0
+
+    # Writing
+
+    def record(self, data: Dict):
+        """
+        Queue a current-weather response for storage.
+
+        Responses repeat while they are cached; only a new observation time
+        for a place is queued. Queued rows are written together after
+        flush_delay seconds, or by flush()/close() outside an event loop.
+        """
+        ts = data.get("dt")
+        if ts is None:
+            return
+        key = series_key(data)
+        if self._last_ts.get(key) == ts:
+            return
+        self._last_ts[key] = ts
+        self._pending.append({
+            "key": key,
+            "name": data.get("name"),
+            "country": data.get("sys", {}).get("country"),
+            "ts": int(ts),
+            **observation(data),
+        })
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no event loop: rows wait for flush() or close()
+
+        async def flush_later():
+            await asyncio.sleep(self.flush_delay)
+            self._flush_task = None
+            self.flush()
+
+        self._flush_task = loop.create_task(flush_later())
+
+    def _place_id(self, row: Dict) -> int:
+        place_id = self._places.get(row["key"])
+        if place_id is None:
+            cursor = self._conn.execute(
+                "INSERT INTO places (key, name, country) VALUES (?, ?, ?)",
+                (row["key"], row["name"], row["country"]),
+            )
+            place_id = self._places[row["key"]] = cursor.lastrowid
+        return place_id
+
+    def flush(self):
+        """Write queued observations and their rollups in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                self._write(pending)
+            except sqlite3.Error:
+                # Place ids handed out in the failed transaction are gone.
+                self._places = dict(self._conn.execute("SELECT key, id FROM places"))
+                raise
+            if time.time() - self._pruned > PRUNE_INTERVAL:
+                self._prune(time.time())
+
+    def _write(self, pending: List[Dict]):
+        with self._conn:
+            for row in pending:
+                row["place_id"] = self._place_id(row)
+                if self._conn.execute(self._insert, row).rowcount != 1:
+                    continue  # already stored, e.g. by an earlier run
+                self.recorded += 1
+                for width in ROLLUP_WIDTHS:
+                    row["width"] = width
+                    row["bucket"] = row["ts"] - row["ts"] % width
+                    self._conn.execute(self._upsert, row)
+
+    def prune(self, now: Optional[float] = None):
+        """Drop observations and rollups older than their retention."""
+        with self._lock:
+            self._prune(time.time() if now is None else now)
+
+    def _prune(self, now: float):
+        with self._conn:
+            self._conn.execute("DELETE FROM observations WHERE ts < ?", (int(now - self.retention[0]),))
+            for width in ROLLUP_WIDTHS:
+                self._conn.execute("DELETE FROM rollups WHERE width = ? AND bucket < ?",
+                                   (width, int(now - self.retention[width])))
+        self._pruned = now
+
+    def close(self):
+        """Write queued observations and close the database."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # Reading
+
+    def places(self) -> List[str]:
+        """Keys of every place with recorded history."""
+        return sorted(self._places)
+
+    def series(
+        self,
+        key: str,
+        field: str = "temp",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: int = 200,
+        now: Optional[float] = None,
+    ) -> List[Point]:
+        """
+        Min/mean/max of field for a place between start and end, in at most max_points buckets.
+
+        Args:
+            key: series_key() of the place
+            field: One of FIELDS
+            start, end: Unix seconds (default: the last 24 hours)
+
+        Returns:
+            Points in time order; empty buckets are left out
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field {field!r}; expected one of {FIELDS}")
+        now = time.time() if now is None else now
+        end = now if end is None else end
+        start = end - DAY if start is None else start
+        self.flush()
+        place_id = self._places.get(key)
+        if place_id is None or end <= start:
+            return []
+
+        max_points = max(1, max_points)
+        # Read the coarsest table that is still no coarser than a bucket,
+        # among those that go back far enough (daily rollups as a last resort).
+        covering = [width for width in (0,) + ROLLUP_WIDTHS if start >= now - self.retention[width]] or [DAY]
+        fitting = [width for width in covering if width <= (end - start) / max_points]
+        width = max(fitting) if fitting else min(covering)
+
+        start, end = int(start), int(end)
+        if width:
+            start -= start % width
+        # Both ends are inclusive, so this step gives at most max_points buckets.
+        step = (end - start) // max_points + 1
+        if width:
+            step = math.ceil(step / width) * width
+
+        if width == 0:
+            sql = (f"SELECT (ts - :start) / :step AS i, min({field}), avg({field}), max({field}) "
+                   f"FROM observations WHERE place_id = :place_id AND ts >= :start AND ts <= :end "
+                   f"AND {field} IS NOT NULL GROUP BY i ORDER BY i")
+        else:
+            sql = (f"SELECT (bucket - :start) / :step AS i, min({field}_min), "
+                   f"sum({field}_sum) / sum({field}_n), max({field}_max) "
+                   f"FROM rollups WHERE place_id = :place_id AND width = :width "
+                   f"AND bucket >= :start AND bucket <= :end AND {field}_n > 0 GROUP BY i ORDER BY i")
+        params = {"place_id": place_id, "width": width, "start": start, "end": end, "step": step}
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [Point(start + i * step, low, mean, high) for i, low, mean, high in rows]
+
+
+_shared_history: Optional[WeatherHistory] = None
+_shared_lock = threading.Lock()
+
+
+def shared_history() -> WeatherHistory:
+    """The process-wide WeatherHistory on Config.HISTORY_DB."""
+    global _shared_history
+    with _shared_lock:
+        if _shared_history is None:
+            _shared_history = WeatherHistory()
+            atexit.register(_shared_history.close)
+        return _shared_history
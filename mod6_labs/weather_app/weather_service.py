@@ -1,9 +1,20 @@
 # weather_service.py
 """Weather API service layer."""
 
+import asyncio
+import ipaddress
+import json
+import threading
+import time
 import httpx
-from typing import Dict, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
 from config import Config
+from units import CANONICAL_UNITS
+from weather_history import WeatherHistory, shared_history
+import geohash
 
 
 class WeatherServiceError(Exception):
@@ -11,79 +22,205 @@ class WeatherServiceError(Exception):
     pass
 
 
+class NotFoundError(WeatherServiceError):
+    """The city or coordinates are unknown to the API."""
+    pass
+
+
+class TransientServiceError(WeatherServiceError):
+    """A failure worth retrying: timeout, network error, rate limit or server error."""
+    pass
+
+
+class Location(NamedTuple):
+    """A geocoded city."""
+    name: str
+    country: str
+    lat: float
+    lon: float
+
+
+def is_public_ip(ip: str) -> bool:
+    """False for loopback, private and malformed addresses."""
+    try:
+        return ipaddress.ip_address(ip).is_global
+    except ValueError:
+        return False
+
+
+def location_key(city: str) -> str:
+    """Normalize a city name so "new  york" and "New York" share one entry."""
+    return " ".join(city.split()).casefold()
+
+
 class WeatherService:
-    """Service for fetching weather data from OpenWeatherMap API."""
-    
-    def __init__(self):
+    """Service for fetching weather data from OpenWeatherMap API.
+
+    City names are geocoded once and the coordinates kept in
+    Config.GEOCODE_CACHE_FILE; weather, forecast and air quality are then
+    requested by coordinates, snapped to the centre of a geohash cell of
+    Config.GRID_PRECISION characters so nearby points share one request and
+    one cache entry. Every request is made in CANONICAL_UNITS
+    (metric) and kept for Config.CACHE_TTL seconds, so switching the display
+    units never needs a new request; see units.py for the conversions.
+
+    Each request opens its own HTTP client unless the service is used as
+    "async with WeatherService() as service:", which keeps one connection
+    pool open for bulk work (see weather_cli.py).
+
+    One instance can serve many callers at once (see shared_service()):
+    concurrent identical requests are coalesced into a single upstream call,
+    and cached responses are shared, so callers must not modify them. All
+    callers are expected to run on the same event loop, as Flet sessions do.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        geocode_file: Optional[Path] = Config.GEOCODE_CACHE_FILE,
+        api_root: Optional[str] = None,
+        history: Optional[WeatherHistory] = None,
+    ):
         self.api_key = Config.API_KEY
         self.base_url = Config.BASE_URL
+        self.forecast_url = Config.FORECAST_URL
+        self.geocode_url = Config.GEOCODE_URL
+        self.air_quality_url = Config.AIR_QUALITY_URL
+        if api_root:
+            # e.g. the real API when Config.BASE_URL points at a gateway
+            self.base_url = api_root + Config.WEATHER_PATH
+            self.forecast_url = api_root + Config.FORECAST_PATH
+            self.geocode_url = api_root + Config.GEOCODE_PATH
+            self.air_quality_url = api_root + Config.AIR_QUALITY_PATH
         self.timeout = Config.TIMEOUT
-    
-    async def get_forecast(self, city: str, units: str = "metric") -> Dict:
-        """Get 5-day weather forecast."""
-        forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
-        params = {
-            "q": city,
-            "appid": self.api_key,
-            "units": units,
-        }
-        
+        self.cache_ttl = Config.CACHE_TTL
+        self.grid_precision = Config.GRID_PRECISION
+        self.ip_location_url = Config.IP_LOCATION_URL
+        self.ip_lookup_url = Config.IP_LOOKUP_URL
+        self.ip_location_ttl = Config.IP_LOCATION_TTL
+        self.transport = transport
+        # Records every current-weather result (see weather_history.py)
+        self.history = history
+        self._session: Optional[httpx.AsyncClient] = None
+        # (url, query) -> (expires_at, data), least recently used first
+        self._cache: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self.cache_max_entries = Config.CACHE_MAX_ENTRIES
+        # key -> future of the request in flight; followers await the same future
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.requests_made = 0
+        self.coalesced = 0
+        # location_key(city) -> Location; city names don't move, so no expiry
+        self.geocode_file = Path(geocode_file) if geocode_file else None
+        self._locations: Dict[str, Location] = self._load_locations()
+        self._save_task: Optional[asyncio.Task] = None
+        self.geocode_hits = 0
+        self.geocode_misses = 0
+        # IP address ("" for this machine) -> (expires_at, Location)
+        self._ip_locations: "OrderedDict[str, Tuple[float, Location]]" = OrderedDict()
+
+    def _load_locations(self) -> Dict[str, Location]:
+        if not self.geocode_file or not self.geocode_file.exists():
+            return {}
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(forecast_url, params=params)
-                
-                if response.status_code == 404:
-                    raise WeatherServiceError(f"City '{city}' not found.")
-                elif response.status_code != 200:
-                    raise WeatherServiceError(f"Error fetching forecast: {response.status_code}")
-                
-                return response.json()
-        except httpx.TimeoutException:
-            raise WeatherServiceError("Request timed out.")
-        except httpx.NetworkError:
-            raise WeatherServiceError("Network error occurred.")
-        except Exception as e:
-            raise WeatherServiceError(f"Error fetching forecast: {str(e)}")
+            with open(self.geocode_file, 'r') as f:
+                return {key: Location(**value) for key, value in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            # A damaged cache only costs a few lookups; start over.
+            return {}
 
-    async def get_weather(self, city: str) -> Dict:
+    def save_locations(self):
+        """Write the geocoding cache to disk now."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        if not self.geocode_file:
+            return
+        partial = self.geocode_file.with_suffix(".part")
+        with open(partial, 'w') as f:
+            json.dump({key: loc._asdict() for key, loc in self._locations.items()}, f)
+        partial.replace(self.geocode_file)
+
+    def _schedule_save(self):
+        """Save new locations after a short delay, so a burst of lookups writes the file once."""
+        if self._save_task is not None or not self.geocode_file:
+            return
+
+        async def save_later():
+            await asyncio.sleep(Config.GEOCODE_SAVE_DELAY)
+            self._save_task = None
+            self.save_locations()
+
+        self._save_task = asyncio.ensure_future(save_later())
+
+    async def __aenter__(self):
+        self._session = httpx.AsyncClient(timeout=self.timeout, transport=self.transport)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Save pending geocoding results and close the shared HTTP client."""
+        if self._save_task is not None:
+            self.save_locations()
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    @asynccontextmanager
+    async def _client(self):
+        if self._session is not None:
+            yield self._session
+            return
+        async with httpx.AsyncClient(timeout=self.timeout, transport=self.transport) as client:
+            yield client
+
+    async def _single_flight(self, key: Hashable, start: Callable[[], Awaitable]):
+        """Run start() unless a call with the same key is already running; then share its result."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            pending = self._inflight[key] = asyncio.ensure_future(start())
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller giving up must not cancel the request for the others
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, url: str, query: Dict, not_found: str) -> Dict:
         """
-        Fetch weather data for a given city.
-        
-        Args:
-            city: Name of the city
-            
-        Returns:
-            Dictionary containing weather data
-            
+        GET url with query (plus API key and units), served from the cache when fresh.
+
         Raises:
             WeatherServiceError: If the request fails
         """
-        if not city:
-            raise WeatherServiceError("City name cannot be empty")
-        
-        # Build request parameters
-        params = {
-            "q": city,
-            "appid": self.api_key,
-            "units": Config.UNITS,
-        }
-        
+        key = (url, tuple(sorted(query.items())))
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            return cached[1]
+        return await self._single_flight(key, lambda: self._request(url, query, not_found, key))
+
+    async def _request(self, url: str, query: Dict, not_found: str, key: Tuple) -> Dict:
+        params = {**query, "appid": self.api_key, "units": CANONICAL_UNITS}
+
         try:
-            # Make async HTTP request
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                
+            async with self._client() as client:
+                self.requests_made += 1
+                response = await client.get(url, params=params)
+
                 # Check for HTTP errors
                 if response.status_code == 404:
-                    raise WeatherServiceError(
-                        f"City '{city}' not found. Please check the spelling."
-                    )
+                    raise NotFoundError(not_found)
                 elif response.status_code == 401:
                     raise WeatherServiceError(
                         "Invalid API key. Please check your configuration."
                     )
+                elif response.status_code == 429:
+                    raise TransientServiceError(
+                        "Too many requests. Please try again later."
+                    )
                 elif response.status_code >= 500:
-                    raise WeatherServiceError(
+                    raise TransientServiceError(
                         "Weather service is currently unavailable. "
                         "Please try again later."
                     )
@@ -91,69 +228,236 @@ class WeatherService:
                     raise WeatherServiceError(
                         f"Error fetching weather data: {response.status_code}"
                     )
-                
+
                 # Parse JSON response
                 data = response.json()
-                return data
-                
+
+        except WeatherServiceError:
+            raise
         except httpx.TimeoutException:
-            raise WeatherServiceError(
+            raise TransientServiceError(
                 "Request timed out. Please check your internet connection."
             )
         except httpx.NetworkError:
-            raise WeatherServiceError(
+            raise TransientServiceError(
                 "Network error. Please check your internet connection."
             )
         except httpx.HTTPError as e:
             raise WeatherServiceError(f"HTTP error occurred: {str(e)}")
         except Exception as e:
             raise WeatherServiceError(f"An unexpected error occurred: {str(e)}")
-    
+
+        self._cache[key] = (time.monotonic() + self.cache_ttl, data)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+        return data
+
+    def grid_query(self, lat: float, lon: float) -> Dict:
+        """
+        Query parameters for the grid cell containing (lat, lon).
+
+        Raises:
+            WeatherServiceError: If the coordinates are out of range
+        """
+        try:
+            cell = geohash.encode(lat, lon, self.grid_precision)
+        except ValueError as e:
+            raise WeatherServiceError(str(e))
+        lat, lon = geohash.center(cell)
+        return {"lat": round(lat, 4), "lon": round(lon, 4)}
+
+    def clear_cache(self):
+        """Forget all cached responses (geocoded locations are kept)."""
+        self._cache.clear()
+
+    async def resolve(self, city: str) -> Location:
+        """
+        Geocode a city name, from the local cache when it was seen before.
+
+        Concurrent calls for the same name share one request.
+
+        Raises:
+            WeatherServiceError: If the city is unknown or the request fails
+        """
+        if not city or not city.strip():
+            raise WeatherServiceError("City name cannot be empty")
+        key = location_key(city)
+        location = self._locations.get(key)
+        if location is not None:
+            self.geocode_hits += 1
+            return location
+
+        # A lookup already in flight for this name counts as a hit.
+        if ("geocode", key) in self._inflight:
+            self.geocode_hits += 1
+        else:
+            self.geocode_misses += 1
+        return await self._single_flight(("geocode", key), lambda: self._geocode(city, key))
+
+    async def _geocode(self, city: str, key: str) -> Location:
+        not_found = f"City '{city}' not found. Please check the spelling."
+        results = await self._fetch(self.geocode_url, {"q": city.strip(), "limit": 1}, not_found)
+        if not results:
+            raise NotFoundError(not_found)
+        match = results[0]
+        location = Location(match.get("name", city), match.get("country", ""), match["lat"], match["lon"])
+        self._locations[key] = location
+        self._schedule_save()
+        return location
+
+    async def get_forecast(self, city: str) -> Dict:
+        """Get 5-day weather forecast (3-hour steps, metric units)."""
+        location = await self.resolve(city)
+        return await self.get_forecast_by_coordinates(location.lat, location.lon)
+
+    async def get_forecast_by_coordinates(self, lat: float, lon: float) -> Dict:
+        """Get 5-day weather forecast for coordinates."""
+        return await self._fetch(
+            self.forecast_url,
+            self.grid_query(lat, lon),
+            f"No forecast for {lat}, {lon}.",
+        )
+
+    async def get_air_quality(self, lat: float, lon: float) -> Dict:
+        """Get current air pollution data (AQI 1-5 and components) for coordinates."""
+        return await self._fetch(
+            self.air_quality_url,
+            self.grid_query(lat, lon),
+            f"No air quality data for {lat}, {lon}.",
+        )
+
+    async def get_city_report(self, city: str) -> Dict:
+        """
+        Geocode city, then fetch current weather, forecast and air quality in parallel.
+
+        Returns:
+            {"location": Location, "weather": ..., "forecast": ..., "air_quality": ...}
+            air_quality is None if only that request failed.
+        """
+        return await self.get_report(await self.resolve(city))
+
+    async def get_location_report(self, ip: Optional[str] = None) -> Dict:
+        """get_city_report() for the current location (see locate_by_ip)."""
+        return await self.get_report(await self.locate_by_ip(ip))
+
+    async def get_report(self, location: Location) -> Dict:
+        """Current weather, forecast and air quality for a location, fetched in parallel."""
+        weather, forecast, air_quality = await asyncio.gather(
+            self.get_weather_by_coordinates(location.lat, location.lon),
+            self.get_forecast_by_coordinates(location.lat, location.lon),
+            self.get_air_quality(location.lat, location.lon),
+            return_exceptions=True,
+        )
+        for result in (weather, forecast):
+            if isinstance(result, BaseException):
+                raise result
+        if isinstance(air_quality, BaseException):
+            air_quality = None
+        return {
+            "location": location,
+            "weather": weather,
+            "forecast": forecast,
+            "air_quality": air_quality,
+        }
+
+    async def get_weather(self, city: str) -> Dict:
+        """
+        Fetch weather data for a given city.
+
+        Args:
+            city: Name of the city
+
+        Returns:
+            Dictionary containing weather data in metric units
+
+        Raises:
+            WeatherServiceError: If the request fails
+        """
+        location = await self.resolve(city)
+        return await self.get_weather_by_coordinates(location.lat, location.lon)
+
     async def get_weather_by_coordinates(
-        self, 
-        lat: float, 
+        self,
+        lat: float,
         lon: float
     ) -> Dict:
         """
         Fetch weather data by coordinates.
-        
+
         Args:
             lat: Latitude
             lon: Longitude
-            
+
         Returns:
-            Dictionary containing weather data
+            Dictionary containing weather data in metric units
         """
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "appid": self.api_key,
-            "units": Config.UNITS,
-        }
-        
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                response.raise_for_status()
-                return response.json()
-                
-        except Exception as e:
-            raise WeatherServiceError(f"Error fetching weather data: {str(e)}")
-        
+        data = await self._fetch(
+            self.base_url,
+            self.grid_query(lat, lon),
+            f"No weather data for {lat}, {lon}.",
+        )
+        if self.history is not None:
+            self.history.record(data)
+        return data
 
+    async def locate_by_ip(self, ip: Optional[str] = None) -> Location:
+        """
+        Approximate location from an IP address.
 
-    async def get_location_weather(self):
-        """Get weather for current location."""
-        # This would require geolocation API
-        # For now, use IP-based service
+        Without ip (or with a local/private address, e.g. the desktop app),
+        the location of this machine's public address is used. Results are
+        kept for Config.IP_LOCATION_TTL seconds.
+
+        Raises:
+            WeatherServiceError: If the location service fails
+        """
+        ip = ip if ip and is_public_ip(ip) else ""
+        cached = self._ip_locations.get(ip)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        return await self._single_flight(("ip", ip), lambda: self._locate(ip))
+
+    async def _locate(self, ip: str) -> Location:
+        url = self.ip_lookup_url.format(ip=ip) if ip else self.ip_location_url
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get("https://ipapi.co/json/")
+            async with self._client() as client:
+                response = await client.get(url)
+                response.raise_for_status()
                 data = response.json()
-                lat, lon = data['latitude'], data['longitude']
-                weather = await self.weather_service.get_weather_by_coordinates(
-                    lat, lon
-                )
-                self.display_weather(weather)
-        except Exception as e:
-            self.show_error("Could not get your location")
\ No newline at end of file
+            location = Location(
+                data.get("city", ""), data.get("country_code", ""),
+                float(data["latitude"]), float(data["longitude"]),
+            )
+        except (httpx.HTTPError, ValueError, KeyError, TypeError):
+            raise WeatherServiceError("Could not get your location")
+        self._ip_locations[ip] = (time.monotonic() + self.ip_location_ttl, location)
+        self._ip_locations.move_to_end(ip)
+        if len(self._ip_locations) > self.cache_max_entries:
+            self._ip_locations.popitem(last=False)
+        return location
+
+    async def get_location_weather(self, ip: Optional[str] = None) -> Dict:
+        """Get weather for current location (or that of ip, see locate_by_ip)."""
+        location = await self.locate_by_ip(ip)
+        return await self.get_weather_by_coordinates(location.lat, location.lon)
+
+
+_shared_service: Optional[WeatherService] = None
+_shared_lock = threading.Lock()
+
+
+def shared_service() -> WeatherService:
+    """
+    The process-wide WeatherService.
+
+    A Flet web app builds a WeatherApp per browser session; they all use
+    this instance so sessions looking at the same cities share its cache
+    and in-flight requests instead of each calling the API.
+    """
+    global _shared_service
+    # Flet runs sync handlers (and main) on worker threads.
+    with _shared_lock:
+        if _shared_service is None:
+            _shared_service = WeatherService(history=shared_history())
+        return _shared_service
@@ -0,0 +1,143 @@
+# bench_login.py
+"""Load test for the login lookup: logins/sec at increasing client concurrency.
+
+Compares opening a new connection per login (the old login_click) with the
+pooled, prepared lookup of the auth backend. With --backend sqlite (the
+default) a temporary users database is created and seeded, so the test runs
+offline and reproducibly; --backend mysql uses the fletapp server and needs
+--username/--password of an existing user.
+
+Usage:
+    python benchmarks/bench_login.py [--backend sqlite] [--clients 1 10 50 100 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from auth_backend import BACKENDS, USER_LOOKUP_SQL, create_backend  # noqa: E402
+from passwords import PasswordHasher, parse_params  # noqa: E402
+
+# A deliberately cheap hash so the numbers show the database path; pass the
+# production PASSWORD_HASH setting with --hash to include hashing cost.
+BENCH_HASH = "pbkdf2_sha256$1000"
+
+DEFAULT_CLIENTS = (1, 10, 50, 100, 200)
+
+
+def connect_per_call(backend):
+    """What login_click did before pooling: connect, query, close (then verify the hash)."""
+    sql = backend.sql(USER_LOOKUP_SQL)
+
+    def login(username, password):
+        connection = backend.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, (username,))
+            row = cursor.fetchone()
+        finally:
+            connection.close()
+        ok = backend.hasher.submit(backend.hasher.verify, password, row[2] if row else None).result()
+        return row if ok else None
+    return login
+
+
+def seed(backend, users):
+    """Fills a fresh SQLite backend with users user0..userN (password = name reversed)."""
+    connection = backend.connect()
+    with connection:
+        connection.executemany(
+            backend.sql("INSERT INTO users (username, password) VALUES ({p}, {p})"),
+            ((f"user{i}", backend.hasher.hash(f"user{i}"[::-1])) for i in range(users))
+        )
+    connection.close()
+    return "user0", "0resu"
+
+
+def run_clients(login, clients, logins_per_client, username, password):
+    """Runs clients threads doing logins_per_client logins each; returns (logins/sec, latencies, errors)."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client():
+        local = []
+        start_barrier.wait()
+        for _ in range(logins_per_client):
+            start = time.perf_counter()
+            try:
+                if login(username, password) is None:
+                    raise RuntimeError("login failed: check --username/--password")
+            except Exception as e:  # counted, not fatal: overload shows up as errors
+                with lock:
+                    errors.append(e)
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies, errors
+
+
+def report(label, clients, rate, latencies, errors):
+    if latencies:
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+    else:
+        p50 = p95 = float("nan")
+    print(f"{label:<8} clients {clients:>4} | {rate:>9.0f} logins/s | "
+          f"p50 {p50:>7.2f} ms  p95 {p95:>7.2f} ms | errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--users", type=int, default=10_000, help="users to seed (sqlite only)")
+    parser.add_argument("--hash", default=BENCH_HASH, help="password hash setting (see passwords.py)")
+    parser.add_argument("--hash-workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, nargs="+", default=DEFAULT_CLIENTS)
+    parser.add_argument("--logins", type=int, default=50, help="logins per client")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hasher = PasswordHasher(*parse_params(args.hash), workers=args.hash_workers)
+        options = {"size": args.pool_size, "max_overflow": args.max_overflow, "hasher": hasher}
+        if args.backend == "sqlite":
+            options["path"] = os.path.join(tmp, "users.db")
+        backend = create_backend(args.backend, **options)
+        username, password = args.username, args.password
+        if args.backend == "sqlite":
+            username, password = seed(backend, args.users)
+        elif not (username and password):
+            parser.error("--username and --password are required with --backend mysql")
+
+        print(f"backend {backend.name}, pool size {args.pool_size} + {args.max_overflow} overflow, "
+              f"hash {hasher.setting}")
+        for clients in args.clients:
+            for label, login in (("connect", connect_per_call(backend)), ("pool", backend.authenticate)):
+                rate, latencies, errors = run_clients(login, clients, args.logins, username, password)
+                report(label, clients, rate, latencies, errors)
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# bench_rate_limit.py
+"""Measures the cost of one rate-limit check, in memory and with SQLite persistence.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [--checks 200000] [--keys 1 1000 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from rate_limit import LoginRateLimiter  # noqa: E402
+
+
+def bench(limiter, checks, keys, seed=42):
+    rng = random.Random(seed)
+    usernames = [f"user{rng.randrange(keys)}" for _ in range(checks)]
+    clients = [f"10.0.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(checks)]
+    start = time.perf_counter()
+    for username, client in zip(usernames, clients):
+        limiter.check(username, client)
+    return (time.perf_counter() - start) / checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, nargs="+", default=(1, 1_000, 100_000))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for keys in args.keys:
+            for label, path in (("memory", None), ("sqlite", os.path.join(tmp, f"limits{keys}.db"))):
+                limiter = LoginRateLimiter(path)
+                per_check = bench(limiter, args.checks, keys)
+                limiter.close()
+
+                # Memory is measured on a separate run (with a fresh file for
+                # sqlite) because tracing slows the checks down.
+                tracemalloc.start()
+                limiter = LoginRateLimiter(path and path.replace(".db", "-memory.db"))
+                bench(limiter, args.checks, keys)
+                memory, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                tracked = len(limiter.users) + len(limiter.clients)
+                limiter.close()
+                print(f"{label:<6} {keys:>7} usernames | {per_check * 1e6:6.2f} us/check | "
+                      f"{tracked:>7} keys tracked, {memory / max(tracked, 1):6.0f} B/key")
+
+
+if __name__ == "__main__":
+    main()
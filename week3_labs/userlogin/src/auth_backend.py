@@ -0,0 +1,250 @@
+"""User lookup backends for the login app.
+
+The backend is chosen with the AUTH_BACKEND environment variable:
+"mysql" (default) uses the fletapp server from db_connection.DB_CONFIG,
+"sqlite" uses a local file (AUTH_SQLITE_PATH, default users.db) so the app
+and its benchmarks run without a MySQL server. Both use the same users
+table and the same pooled query path.
+
+Passwords are stored as salted hashes (see passwords.py). Accounts that
+still hold a plaintext password, or a hash made with an older cost, are
+upgraded the next time they log in, or all at once with migrate-passwords.
+
+Add a user or hash every remaining plaintext password from the command line:
+    python src/auth_backend.py add-user alice secret
+    python src/auth_backend.py migrate-passwords
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from db_connection import ConnectionPool, DatabaseError, DB_CONFIG
+from passwords import PasswordHasher, is_hashed
+
+DEFAULT_BACKEND = "mysql"
+DEFAULT_SQLITE_PATH = "users.db"
+
+# Statements are written with {p} for the driver's placeholder.
+USER_LOOKUP_SQL = "SELECT id, username, password FROM users WHERE username = {p}"
+ADD_USER_SQL = "INSERT INTO users (username, password) VALUES ({p}, {p})"
+SET_PASSWORD_SQL = "UPDATE users SET password = {p} WHERE id = {p}"
+ALL_PASSWORDS_SQL = "SELECT id, password FROM users"
+
+
+class AuthBackend:
+    """Looks users up through a ConnectionPool; subclasses supply the driver details."""
+
+    name = None
+    placeholder = "?"
+    schema = None
+    driver_errors = ()
+
+    def __init__(self, hasher=None, **pool_options):
+        self.hasher = hasher or PasswordHasher()
+        self.pool = ConnectionPool(self.connect, ping=self.ping, prepare=self.prepare,
+                                   errors=self.driver_errors, **pool_options)
+        # Blocking driver calls made from async code; one thread per possible connection.
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.size + self.pool.max_overflow,
+                                            thread_name_prefix="auth-db")
+
+    # Driver hooks
+
+    def connect(self):
+        raise NotImplementedError
+
+    def ping(self, connection):
+        """Raises if connection is no longer usable."""
+
+    def prepare(self, connection):
+        return connection.cursor()
+
+    # Shared query path
+
+    def sql(self, template):
+        return template.format(p=self.placeholder)
+
+    def execute(self, template, params, fetch=True, commit=False):
+        """Runs a statement on a pooled connection; driver errors become DatabaseError."""
+        sql = self.sql(template)
+        try:
+            with self.pool.connection() as pooled:
+                cursor = pooled.statement(sql)
+                cursor.execute(sql, params)
+                rows = cursor.fetchall() if fetch else None
+                if commit:
+                    pooled.connection.commit()
+                return rows
+        except self.driver_errors as e:
+            raise DatabaseError(str(e)) from e
+
+    def create_schema(self):
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(self.schema)
+            connection.commit()
+            cursor.close()
+        except self.driver_errors as e:
+            raise DatabaseError(str(e)) from e
+        finally:
+            connection.close()
+
+    def find_user(self, username):
+        """Returns the (id, username, stored password) row for username, or None."""
+        rows = self.execute(USER_LOOKUP_SQL, (username,))
+        return tuple(rows[0]) if rows else None
+
+    def authenticate(self, username, password):
+        """Returns (id, username) if the credentials are valid, else None.
+
+        Password verification runs on the hasher's thread pool. A valid
+        password stored in plaintext or with outdated parameters is rehashed.
+        """
+        row = self.find_user(username)
+        stored = row[2] if row else None
+        if not self.hasher.submit(self.hasher.verify, password, stored).result():
+            return None
+        if self.hasher.needs_rehash(stored):
+            self.set_password(row[0], password)
+        return row[0], row[1]
+
+    async def authenticate_async(self, username, password):
+        """authenticate() for the event loop: the lookup runs on the database
+        executor and the password check on the hasher's pool."""
+        loop = asyncio.get_running_loop()
+        row = await loop.run_in_executor(self._executor, self.find_user, username)
+        stored = row[2] if row else None
+        if not await self.hasher.verify_async(password, stored):
+            return None
+        if self.hasher.needs_rehash(stored):
+            await loop.run_in_executor(self._executor, self.set_password, row[0], password)
+        return row[0], row[1]
+
+    def set_password(self, user_id, password):
+        encoded = self.hasher.submit(self.hasher.hash, password).result()
+        self.execute(SET_PASSWORD_SQL, (encoded, user_id), fetch=False, commit=True)
+
+    def add_user(self, username, password):
+        encoded = self.hasher.submit(self.hasher.hash, password).result()
+        self.execute(ADD_USER_SQL, (username, encoded), fetch=False, commit=True)
+
+    def migrate_passwords(self):
+        """Hashes every password still stored in plaintext; returns how many were converted.
+
+        Existing hashes with outdated parameters cannot be converted without
+        the password and are left for rehash-on-login.
+        """
+        rows = self.execute(ALL_PASSWORDS_SQL, ())
+        plaintext = [(user_id, stored) for user_id, stored in rows if not is_hashed(stored)]
+        for user_id, password in plaintext:
+            self.set_password(user_id, password)
+        return len(plaintext)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+        self.hasher.close()
+
+
+class MySQLBackend(AuthBackend):
+    name = "mysql"
+    placeholder = "%s"
+    schema = '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL
+        )
+    '''
+
+    def __init__(self, config=None, hasher=None, **pool_options):
+        # Imported here so the SQLite backend works without the MySQL driver installed.
+        import mysql.connector
+        self._mysql = mysql.connector
+        self.driver_errors = (mysql.connector.Error,)
+        self.config = dict(config or DB_CONFIG)
+        # Each lookup sees the latest committed users instead of a snapshot
+        # held open by the last statement on this pooled connection.
+        self.config.setdefault("autocommit", True)
+        super().__init__(hasher, **pool_options)
+
+    def connect(self):
+        return self._mysql.connect(**self.config)
+
+    def ping(self, connection):
+        connection.ping(reconnect=False)
+
+    def prepare(self, connection):
+        # Server-side prepared statement, prepared on first execute and reused after.
+        return connection.cursor(prepared=True)
+
+
+class SQLiteBackend(AuthBackend):
+    name = "sqlite"
+    placeholder = "?"
+    schema = '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        )
+    '''
+    driver_errors = (sqlite3.Error,)
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, hasher=None, **pool_options):
+        self.path = path
+        # A local file does not go stale, so connections never need recycling.
+        pool_options.setdefault("recycle", None)
+        super().__init__(hasher, **pool_options)
+        self.create_schema()
+
+    def connect(self):
+        # sqlite3 keeps compiled statements in a per-connection cache, so
+        # reusing pooled connections also reuses the prepared lookup.
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        connection.execute("PRAGMA journal_mode = WAL")
+        return connection
+
+    def ping(self, connection):
+        connection.execute("SELECT 1")
+
+
+BACKENDS = {backend.name: backend for backend in (MySQLBackend, SQLiteBackend)}
+
+
+def create_backend(name=None, **options):
+    """Creates the backend named by name, or by AUTH_BACKEND if name is None."""
+    name = (name or os.environ.get("AUTH_BACKEND") or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown auth backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == "sqlite":
+        options.setdefault("path", os.environ.get("AUTH_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    return BACKENDS[name](**options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage login users.")
+    parser.add_argument("--backend", choices=BACKENDS, help="default: $AUTH_BACKEND or mysql")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add-user")
+    add.add_argument("username")
+    add.add_argument("password")
+    commands.add_parser("migrate-passwords", help="hash every plaintext password")
+    args = parser.parse_args()
+
+    backend = create_backend(args.backend)
+    try:
+        if args.command == "add-user":
+            backend.create_schema()
+            backend.add_user(args.username, args.password)
+            print(f"Added {args.username} to the {backend.name} backend")
+        elif args.command == "migrate-passwords":
+            print(f"Hashed {backend.migrate_passwords()} plaintext passwords")
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,185 @@
-import mysql.connector
-from mysql.connector import Error
-
-def connect_db():
-    try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="fletapp"
-        )
-        if connection.is_connected():
-            print("Connected to MySQL database")
-            return connection
-    except Error as e:
-        print(f"Error: {e}")
-        return None
\ No newline at end of file
+import threading
+import time
+from contextlib import contextmanager
+
+# MySQL server settings (used by auth_backend.MySQLBackend).
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "database": "fletapp",
+}
+
+# Pool tuning: connections kept open, extra connections allowed under load
+# (closed again when returned), seconds to wait for a free connection,
+# maximum age of a connection in seconds, and idle seconds after which a
+# connection is pinged before it is handed out.
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_TIMEOUT = 5.0
+POOL_RECYCLE = 1800
+POOL_PING_AFTER = 30.0
+
+
+class DatabaseError(Exception):
+    """A database operation failed, whatever the driver."""
+
+
+class PoolTimeout(DatabaseError):
+    """No connection became free within the pool timeout."""
+
+
+class PooledConnection:
+    """A connection plus the bookkeeping the pool needs and its prepared statements."""
+
+    def __init__(self, connection, prepare=None):
+        self.connection = connection
+        self.created = self.last_used = time.monotonic()
+        self._prepare = prepare or (lambda connection: connection.cursor())
+        self._statements = {}
+
+    def statement(self, sql):
+        """Returns a cursor prepared for sql, created on first use and reused afterwards."""
+        cursor = self._statements.get(sql)
+        if cursor is None:
+            cursor = self._statements[sql] = self._prepare(self.connection)
+        return cursor
+
+    def close(self):
+        for cursor in self._statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._statements.clear()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Keeps database connections open between logins instead of reconnecting every time.
+
+    Up to size connections stay in the pool; under load up to max_overflow
+    extra connections are opened and closed again once returned. Connections
+    older than recycle seconds are replaced, and connections that sat idle
+    for more than ping_after seconds are checked with ping() before use.
+    A transaction still open when a connection is returned is rolled back.
+
+    connect opens a driver connection, prepare creates the cursor cached per
+    statement, and errors lists the driver exceptions after which a
+    connection is closed rather than reused.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, timeout=POOL_TIMEOUT,
+                 recycle=POOL_RECYCLE, ping_after=POOL_PING_AFTER, ping=None, prepare=None,
+                 errors=(DatabaseError,)):
+        self._connect = connect
+        self._ping = ping
+        self._prepare = prepare
+        self._errors = tuple(errors)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        # Idle connections, most recently returned last. _available is
+        # notified whenever one is returned or a slot frees up for a new one.
+        self._idle = []
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+    def _discard(self, pooled):
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+        pooled.close()
+
+    def _healthy(self, pooled):
+        now = time.monotonic()
+        if self.recycle is not None and now - pooled.created > self.recycle:
+            return False
+        if self._ping is not None and now - pooled.last_used > self.ping_after:
+            try:
+                self._ping(pooled.connection)
+            except Exception:
+                return False
+        return True
+
+    def _reserve(self, deadline):
+        """Waits for an idle connection or a free slot; returns the connection, or None for a slot."""
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._opened < self.size + self.max_overflow:
+                    self._opened += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no database connection free after {self.timeout}s")
+                self._available.wait(remaining)
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            pooled = self._reserve(deadline)
+            if pooled is None:
+                try:
+                    return PooledConnection(self._connect(), self._prepare)
+                except BaseException:
+                    with self._available:
+                        self._opened -= 1
+                        self._available.notify()
+                    raise
+            if self._healthy(pooled):
+                return pooled
+            self._discard(pooled)
+
+    def _reset(self, pooled):
+        """Ends a transaction left open, so the next user does not read from its old snapshot."""
+        connection = pooled.connection
+        if getattr(connection, "in_transaction", True):
+            connection.rollback()
+
+    def _checkin(self, pooled):
+        try:
+            self._reset(pooled)
+        except Exception:
+            self._discard(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        with self._available:
+            if len(self._idle) < self.size:
+                self._idle.append(pooled)
+                self._available.notify()
+                return
+        self._discard(pooled)
+
+    @contextmanager
+    def connection(self):
+        """Yields a PooledConnection and returns it to the pool afterwards.
+
+        A connection that raised a database error is closed instead of being
+        reused, since it may be in an unknown state.
+        """
+        pooled = self._checkout()
+        try:
+            yield pooled
+        except self._errors:
+            self._discard(pooled)
+            raise
+        except BaseException:
+            self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+
+    def close(self):
+        """Closes every idle connection."""
+        with self._available:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
@@ -1,71 +1,107 @@
+import asyncio
+import atexit
+import math
+
 import flet as ft
-import mysql.connector
-from mysql.connector import Error
-import db_connection as db
+from auth_backend import create_backend
+from db_connection import DatabaseError
+from rate_limit import LoginRateLimiter
+
+# One backend (and connection pool) shared by every session of the app.
+backend = create_backend()
+
+# Attempt limits per username and per client, checked before the database is touched.
+limiter = LoginRateLimiter()
+# Writes attempts still pending in memory, so they count after a restart.
+atexit.register(limiter.close)
+
+# Seconds a login may take (database round-trip plus password check) before giving up.
+LOGIN_TIMEOUT = 10.0
 
 def main(page: ft.Page):
-    def login_click(e):
+    # Dialogs are built once; login_click only fills in the text that changes.
+    welcome_text = ft.Text(text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK)
+    success_dialog = ft.AlertDialog(
+        icon=ft.Icon(name=ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN),
+        title=ft.Text("Login Successful", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
+        content=welcome_text,
+        alignment=ft.alignment.center,
+        actions=[ft.TextButton("OK", on_click=lambda e: page.close(success_dialog))],
+        bgcolor=ft.Colors.WHITE,
+        )
+    failure_dialog = ft.AlertDialog(
+        icon=ft.Icon(name=ft.Icons.ERROR, color=ft.Colors.RED),
+        title=ft.Text("Login Failed", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
+        content=ft.Text(f"Invalid username or password", text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK),
+        alignment=ft.alignment.center,
+        actions=[ft.TextButton("OK", on_click=lambda e: page.close(failure_dialog))],
+        bgcolor=ft.Colors.WHITE,
+        )
+    invalid_input_dialog = ft.AlertDialog(
+        icon=ft.Icon(name=ft.Icons.INFO, color=ft.Colors.BLUE),
+        title=ft.Text("Input Error", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
+        content=ft.Text(f"Please enter username and password", text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK),
+        alignment=ft.alignment.center,
+        actions=[ft.TextButton("OK", on_click=lambda e: page.close(invalid_input_dialog))],
+        bgcolor=ft.Colors.WHITE,
+        )
+    locked_text = ft.Text(text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK)
+    locked_dialog = ft.AlertDialog(
+        icon=ft.Icon(name=ft.Icons.LOCK_CLOCK, color=ft.Colors.RED),
+        title=ft.Text("Too Many Attempts", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
+        content=locked_text,
+        alignment=ft.alignment.center,
+        actions=[ft.TextButton("OK", on_click=lambda e: page.close(locked_dialog))],
+        bgcolor=ft.Colors.WHITE,
+        )
+    database_error_text = ft.Text(color=ft.Colors.BLACK)
+    database_error_dialog = ft.AlertDialog(
+        title=ft.Text("Database Error",color=ft.Colors.BLACK),
+        content=database_error_text,
+        alignment=ft.alignment.center,
+        actions=[ft.TextButton("OK", on_click=lambda e: page.close(database_error_dialog))],
+        bgcolor=ft.Colors.WHITE,
+        )
+
+    async def login_click(e):
         input_username = username_box.value
         input_password = password_box.value
 
-        success_dialog = ft.AlertDialog(
-            icon=ft.Icon(name=ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN),
-            title=ft.Text("Login Successful", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
-            content=ft.Text(f"Welcome, {input_username}", text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK),
-            alignment=ft.alignment.center,
-            actions=[ft.TextButton("OK", on_click=lambda e: page.close(success_dialog))],
-            bgcolor=ft.Colors.WHITE,
-            )
-        failure_dialog = ft.AlertDialog(
-            icon=ft.Icon(name=ft.Icons.ERROR, color=ft.Colors.RED),
-            title=ft.Text("Login Failed", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
-            content=ft.Text(f"Invalid username or password", text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK),
-            alignment=ft.alignment.center,
-            actions=[ft.TextButton("OK", on_click=lambda e: page.close(failure_dialog))],
-            bgcolor=ft.Colors.WHITE,
-            )
-        invalid_input_dialog = ft.AlertDialog(
-            icon=ft.Icon(name=ft.Icons.INFO, color=ft.Colors.BLUE),
-            title=ft.Text("Input Error", text_align=ft.TextAlign.CENTER,color=ft.Colors.BLACK),
-            content=ft.Text(f"Please enter username and password", text_align=ft.TextAlign.CENTER, color=ft.Colors.BLACK),
-            alignment=ft.alignment.center,
-            actions=[ft.TextButton("OK", on_click=lambda e: page.close(invalid_input_dialog))],
-            bgcolor=ft.Colors.WHITE,
-            )
-        database_error_dialog = ft.AlertDialog(
-            title=ft.Text("Database Error",color=ft.Colors.BLACK),
-            content=ft.Text(f"An error occurred while connecting to the database", color=ft.Colors.BLACK),
-            alignment=ft.alignment.center,
-            actions=[ft.TextButton("OK", on_click=lambda e: page.close(database_error_dialog))],
-            bgcolor=ft.Colors.WHITE,
-            )
-        
-        try:
-            connection = db.connect_db()
-            cursor = connection.cursor()
+        # Checked before anything touches the database.
+        if not input_username or not input_password:
+            page.open(invalid_input_dialog)
+            return
 
-            sql = "SELECT id, username, password FROM users WHERE username = %s AND password = %s"
-            cursor.execute(sql, (input_username, input_password))
-            result = cursor.fetchone()
+        retry_after = limiter.check(input_username, page.client_ip)
+        if retry_after:
+            locked_text.value = f"Please try again in {math.ceil(retry_after)} seconds"
+            page.open(locked_dialog)
+            return
 
-            if not input_username or not input_password:
-                page.open(invalid_input_dialog)
-            elif result:
+        login_button.disabled = True
+        spinner.visible = True
+        page.update()
+        try:
+            result = await asyncio.wait_for(backend.authenticate_async(input_username, input_password),
+                                            timeout=LOGIN_TIMEOUT)
+            if result:
+                limiter.succeeded(input_username)
+                welcome_text.value = f"Welcome, {input_username}"
                 page.open(success_dialog)
-            elif not result:
+            else:
                 page.open(failure_dialog)
-            
-            page.update()
 
-        except Error as err:
+        except asyncio.TimeoutError:
+            database_error_text.value = f"The database did not answer within {LOGIN_TIMEOUT:g} seconds"
+            page.open(database_error_dialog)
+        except DatabaseError as err:
             print(f"Error: {err}")
+            database_error_text.value = "An error occurred while connecting to the database"
             page.open(database_error_dialog)
         finally:
-            # Close the connection
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
-                connection.close()
-                print("MySQL connection closed.")
+            login_button.disabled = False
+            spinner.visible = False
+            page.update()
 
     page.window.center()
     page.window.frameless = True
@@ -95,12 +131,14 @@ def main(page: ft.Page):
                     bgcolor=ft.Colors.LIGHT_BLUE_ACCENT,)
     
     login_button = ft.ElevatedButton(text="Login", on_click=login_click, width=100, icon=ft.Icons.LOGIN)
+    spinner = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
 
     page.add(
         ft.Text(value="User Login", text_align=ft.MainAxisAlignment.CENTER, size=20, weight="bold", font_family="Arial"),
         ft.Container(ft.Column([username_box, password_box],
                                spacing=20,)),
-        ft.Container(content=login_button, alignment=ft.alignment.top_right, margin=ft.margin.only(0, 20, 40, 0)),
+        ft.Container(content=ft.Row([spinner, login_button], alignment=ft.MainAxisAlignment.END),
+                     alignment=ft.alignment.top_right, margin=ft.margin.only(0, 20, 40, 0)),
     )
 
 ft.app(target=main)
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Salted password hashing with scrypt or PBKDF2.
+
+Hashes are stored as self-describing strings, so the cost can be raised
+later without breaking existing accounts:
+
+    scrypt$n=16384,r=8,p=1$<salt>$<hash>
+    pbkdf2_sha256$600000$<salt>$<hash>
+
+The algorithm and cost come from the PASSWORD_HASH environment variable in
+the same "algorithm$parameters" form (e.g. "scrypt$n=32768,r=8,p=1"); the
+calibrate command below picks a value for a target latency on this machine.
+A stored hash made with other parameters, or a legacy plaintext password,
+verifies as before and is reported by needs_rehash() so the login can
+upgrade it.
+
+Hashing is deliberately slow, so it runs on a small thread pool (hashlib
+releases the GIL while it works) instead of the Flet event loop.
+
+Usage:
+    python src/passwords.py calibrate [--target-ms 250] [--algorithm scrypt]
+    python src/passwords.py hash <password>
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+DEFAULT_PARAMS = {
+    "scrypt": {"n": 2 ** 14, "r": 8, "p": 1},
+    "pbkdf2_sha256": {"iterations": 600_000},
+}
+DEFAULT_ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def format_params(algorithm, params):
+    """'scrypt', {'n': 16384, 'r': 8, 'p': 1} -> 'scrypt$n=16384,r=8,p=1'."""
+    if algorithm == "pbkdf2_sha256":
+        return f"{algorithm}${params['iterations']}"
+    return f"{algorithm}$" + ",".join(f"{key}={params[key]}" for key in ("n", "r", "p"))
+
+
+def parse_params(text):
+    """Inverse of format_params; raises ValueError for anything else."""
+    algorithm, _, body = text.partition("$")
+    if algorithm == "pbkdf2_sha256":
+        return algorithm, {"iterations": int(body)}
+    if algorithm == "scrypt":
+        params = dict(item.split("=", 1) for item in body.split(","))
+        return algorithm, {key: int(params[key]) for key in ("n", "r", "p")}
+    raise ValueError(f"Unknown password hash algorithm: {algorithm!r}")
+
+
+def _derive(algorithm, params, password, salt):
+    secret = password.encode("utf-8")
+    if algorithm == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 2 ** 20, dklen=KEY_BYTES)
+    return hashlib.pbkdf2_hmac("sha256", secret, salt, params["iterations"], dklen=KEY_BYTES)
+
+
+def _split(encoded):
+    """Returns (algorithm, params, salt, key), or None for a legacy plaintext value."""
+    parts = encoded.split("$")
+    if len(parts) != 4 or parts[0] not in DEFAULT_PARAMS:
+        return None
+    try:
+        algorithm, params = parse_params(f"{parts[0]}${parts[1]}")
+        return algorithm, params, _b64decode(parts[2]), _b64decode(parts[3])
+    except (ValueError, KeyError):
+        return None
+
+
+def is_hashed(encoded):
+    """False for a legacy plaintext password."""
+    return encoded is not None and _split(encoded) is not None
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with one algorithm and cost, on its own thread pool."""
+
+    def __init__(self, algorithm=None, params=None, workers=2):
+        if algorithm is None:
+            configured = os.environ.get("PASSWORD_HASH")
+            algorithm, params = parse_params(configured) if configured else (DEFAULT_ALGORITHM, params)
+        self.algorithm = algorithm
+        self.params = dict(params or DEFAULT_PARAMS[algorithm])
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # Verified against when the user does not exist, so a failed login
+        # takes as long as a wrong password.
+        self._dummy = self.hash(secrets.token_hex(8))
+
+    @property
+    def setting(self):
+        """The PASSWORD_HASH string for this hasher's algorithm and cost."""
+        return format_params(self.algorithm, self.params)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        key = _derive(self.algorithm, self.params, password, salt)
+        return f"{self.setting}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password, encoded):
+        """Checks password against a stored hash (or legacy plaintext); constant-time compare."""
+        if encoded is None:
+            self.verify(password, self._dummy)
+            return False
+        parsed = _split(encoded)
+        if parsed is None:
+            return hmac.compare_digest(password.encode("utf-8"), encoded.encode("utf-8"))
+        algorithm, params, salt, key = parsed
+        return hmac.compare_digest(_derive(algorithm, params, password, salt), key)
+
+    def needs_rehash(self, encoded):
+        """True for plaintext or hashes made with a different algorithm or cost."""
+        parsed = _split(encoded)
+        return parsed is None or (parsed[0], parsed[1]) != (self.algorithm, self.params)
+
+    def submit(self, func, *args):
+        """Runs a hasher method on the hashing thread pool; returns a concurrent Future."""
+        return self._executor.submit(func, *args)
+
+    async def verify_async(self, password, encoded):
+        return await asyncio.wrap_future(self.submit(self.verify, password, encoded))
+
+    async def hash_async(self, password):
+        return await asyncio.wrap_future(self.submit(self.hash, password))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def calibrate(algorithm=DEFAULT_ALGORITHM, target_ms=250, samples=3):
+    """Returns the cheapest params of algorithm taking at least target_ms per hash here."""
+    def time_hash(params):
+        start = time.perf_counter()
+        for _ in range(samples):
+            _derive(algorithm, params, "calibration", b"\0" * SALT_BYTES)
+        return (time.perf_counter() - start) / samples * 1000
+
+    if algorithm == "scrypt":
+        # Memory grows with n as well as time, so double n until the target is met.
+        params = {"n": 2 ** 12, "r": 8, "p": 1}
+        while time_hash(params) < target_ms and params["n"] < 2 ** 20:
+            params["n"] *= 2
+        return params
+
+    params = {"iterations": 10_000}
+    elapsed = time_hash(params)
+    params["iterations"] = max(10_000, int(params["iterations"] * target_ms / elapsed))
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = commands.add_parser("calibrate", help="pick a cost for a target latency")
+    calibrate_parser.add_argument("--target-ms", type=float, default=250)
+    calibrate_parser.add_argument("--algorithm", choices=DEFAULT_PARAMS, default=DEFAULT_ALGORITHM)
+    hash_parser = commands.add_parser("hash", help="hash a password with the configured cost")
+    hash_parser.add_argument("password")
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        params = calibrate(args.algorithm, args.target_ms)
+        hasher = PasswordHasher(args.algorithm, params, workers=1)
+        start = time.perf_counter()
+        hasher.verify("calibration", hasher.hash("calibration"))
+        verify_ms = (time.perf_counter() - start) * 1000 / 2
+        hasher.close()
+        print(f"{verify_ms:.0f} ms per hash with these settings. Use them with:")
+        print(f"PASSWORD_HASH='{format_params(args.algorithm, params)}'")
+    else:
+        hasher = PasswordHasher(workers=1)
+        print(hasher.hash(args.password))
+        hasher.close()
+
+
+if __name__ == "__main__":
+    main()
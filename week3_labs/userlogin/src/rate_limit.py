@@ -0,0 +1,227 @@
+"""Login rate limiting with sliding windows and lockout.
+
+Each key (a username or a client address) keeps two counters: attempts in
+the current fixed window and in the previous one. The attempts in the last
+`window` seconds are estimated as
+
+    previous * (time left of the previous window that still overlaps) + current
+
+which needs four numbers per key instead of a timestamp per attempt. A key
+that reaches its limit is locked out for `lockout` seconds. Entries expire
+once both windows and any lockout are over. Imposing a lockout clears the
+key's counts, so the first attempt after it ends starts a fresh window
+instead of being locked out again by the attempts that caused it.
+
+With a path, state is also kept in SQLite so limits survive a restart.
+Changes, lockouts included, are written by a background thread once per
+flush_interval (and by any check made after the interval is up) and on
+close(); call close() before exiting so the last attempts are not lost.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+# Attempts allowed per window before the key is locked out.
+USER_LIMIT = 5
+CLIENT_LIMIT = 20
+WINDOW = 60.0
+LOCKOUT = 300.0
+FLUSH_INTERVAL = 1.0
+
+
+class RateLimitStore:
+    """SQLite persistence for limiter state."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                limiter TEXT NOT NULL,
+                key TEXT NOT NULL,
+                window_start REAL NOT NULL,
+                previous INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                locked_until REAL NOT NULL,
+                PRIMARY KEY (limiter, key)
+            ) WITHOUT ROWID
+        ''')
+        self._lock = threading.Lock()
+
+    def load(self, limiter, now, window):
+        """Returns {key: [window_start, previous, current, locked_until]} still relevant at now."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, window_start, previous, current, locked_until FROM rate_limits"
+                " WHERE limiter = ? AND (window_start > ? OR locked_until > ?)",
+                (limiter, now - 2 * window, now)
+            ).fetchall()
+        return {key: list(state) for key, *state in rows}
+
+    def save(self, limiter, entries, expired):
+        """Writes changed entries and deletes expired keys in one transaction."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?, ?)",
+                [(limiter, key, *state) for key, state in entries.items()]
+            )
+            self.conn.executemany(
+                "DELETE FROM rate_limits WHERE limiter = ? AND key = ?",
+                [(limiter, key) for key in expired]
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SlidingWindowLimiter:
+    """Counts attempts per key and refuses them past limit per window (see module docstring)."""
+
+    def __init__(self, name, limit, window=WINDOW, lockout=LOCKOUT, store=None,
+                 clock=time.time, flush_interval=FLUSH_INTERVAL):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.lockout = lockout
+        self.store = store
+        self.clock = clock
+        self.flush_interval = flush_interval
+        now = clock()
+        # key -> [window_start, previous, current, locked_until]
+        self._entries = store.load(name, now, window) if store else {}
+        self._dirty = set()
+        self._expired = set()
+        self._next_sweep = now + window
+        self._next_flush = now + flush_interval
+        self._lock = threading.Lock()
+
+    def _roll(self, entry, now):
+        """Moves entry's windows forward to the one containing now."""
+        start = entry[0]
+        if now - start >= 2 * self.window:
+            entry[0:3] = [now - (now - start) % self.window, 0, 0]
+        elif now - start >= self.window:
+            entry[0:3] = [start + self.window, entry[2], 0]
+
+    def acquire(self, key, now=None):
+        """Counts an attempt for key; returns 0 if allowed, else seconds until it may retry."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [now, 0, 0, 0.0]
+                self._expired.discard(key)
+            if entry[3] > now:
+                return entry[3] - now
+            self._roll(entry, now)
+            overlap = 1 - (now - entry[0]) / self.window
+            if entry[1] * overlap + entry[2] >= self.limit:
+                if self.lockout:
+                    entry[1:4] = [0, 0, now + self.lockout]
+                    retry_after = self.lockout
+                else:
+                    retry_after = entry[0] + self.window - now
+                self._dirty.add(key)
+                self._maintain(now)
+                return retry_after
+            entry[2] += 1
+            self._dirty.add(key)
+            self._maintain(now)
+            return 0.0
+
+    def reset(self, key):
+        """Forgets key's attempts, e.g. after a successful login."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty.discard(key)
+                self._expired.add(key)
+                self._maintain(self.clock())
+
+    def _maintain(self, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.window
+            stale = [key for key, (start, _, _, locked_until) in self._entries.items()
+                     if now - start >= 2 * self.window and locked_until <= now]
+            for key in stale:
+                del self._entries[key]
+                self._dirty.discard(key)
+            self._expired.update(stale)
+        if self.store and now >= self._next_flush:
+            self._flush(now)
+
+    def _flush(self, now):
+        self._next_flush = now + self.flush_interval
+        if not (self._dirty or self._expired):
+            return
+        changed = {key: list(self._entries[key]) for key in self._dirty}
+        expired = list(self._expired)
+        self._dirty.clear()
+        self._expired.clear()
+        self.store.save(self.name, changed, expired)
+
+    def flush(self):
+        """Writes pending changes to the store now."""
+        with self._lock:
+            if self.store:
+                self._flush(self.clock())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        self.flush()
+
+
+class LoginRateLimiter:
+    """Per-username and per-client limits for login attempts.
+
+    Set AUTH_RATE_LIMIT_DB to a file path to keep the limits across restarts.
+    """
+
+    def __init__(self, path=None, user_limit=USER_LIMIT, client_limit=CLIENT_LIMIT,
+                 window=WINDOW, lockout=LOCKOUT, clock=time.time, flush_interval=FLUSH_INTERVAL):
+        path = path or os.environ.get("AUTH_RATE_LIMIT_DB")
+        self.store = RateLimitStore(path) if path else None
+        self.users = SlidingWindowLimiter("user", user_limit, window, lockout, self.store, clock, flush_interval)
+        self.clients = SlidingWindowLimiter("client", client_limit, window, lockout, self.store, clock,
+                                            flush_interval)
+        self._closed = threading.Event()
+        self._flusher = None
+        if self.store:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                             name="rate-limit-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self, interval):
+        while not self._closed.wait(interval):
+            self.users.flush()
+            self.clients.flush()
+
+    @staticmethod
+    def _user_key(username):
+        return username.strip().lower()
+
+    def check(self, username, client=None):
+        """Counts a login attempt; returns 0 if it may proceed, else seconds to wait."""
+        retry_after = self.clients.acquire(client) if client else 0.0
+        if retry_after:
+            return retry_after
+        return self.users.acquire(self._user_key(username))
+
+    def succeeded(self, username):
+        """Clears the username's failed attempts after a successful login."""
+        self.users.reset(self._user_key(username))
+
+    def close(self):
+        """Stops the background writer and writes what is still pending."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+        self.users.close()
+        self.clients.close()
+        if self.store:
+            self.store.close()
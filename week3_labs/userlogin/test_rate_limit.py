@@ -0,0 +1,82 @@
+# test_rate_limit.py
+"""Simple tests for the login rate limiter.
+
+Usage:
+    python test_rate_limit.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from rate_limit import LoginRateLimiter, SlidingWindowLimiter  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_lockout():
+    """A key past its limit is refused until the lockout is over."""
+    limiter = SlidingWindowLimiter("user", limit=3, window=60, lockout=30, clock=FakeClock())
+    allowed = [limiter.acquire("ann", now) for now in (0, 1, 2)]
+    retry_after = limiter.acquire("ann", 3)
+    if allowed == [0, 0, 0] and retry_after == 30 and limiter.acquire("ann", 20) == 13:
+        print("✅ Lockout refuses attempts past the limit")
+        return True
+    print(f"❌ Lockout: allowed {allowed}, retry after {retry_after}")
+    return False
+
+
+def test_attempt_after_lockout():
+    """The attempts that caused a lockout do not lock the key out again."""
+    limiter = SlidingWindowLimiter("user", limit=3, window=60, lockout=30, clock=FakeClock())
+    for now in (0, 1, 2, 3):
+        limiter.acquire("ann", now)
+    retry_after = limiter.acquire("ann", 34)
+    if retry_after == 0:
+        print("✅ First attempt after the lockout is allowed")
+        return True
+    print(f"❌ Attempt after the lockout was refused for {retry_after} s")
+    return False
+
+
+def test_lockout_persisted_in_background():
+    """A lockout is not written during the check but by the flush thread or close()."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "limits.db")
+        clock = FakeClock(1000.0)
+        limiter = LoginRateLimiter(path, user_limit=1, clock=clock, flush_interval=3600)
+        limiter.check("ann")
+        retry_after = limiter.check("ann")
+        pending = len(limiter.users._dirty)
+        limiter.close()
+        restored = LoginRateLimiter(path, user_limit=1, clock=clock, flush_interval=3600)
+        still_locked = restored.check("ann")
+        restored.close()
+    if retry_after and pending == 1 and still_locked:
+        print("✅ Lockout is written in the background and survives a restart")
+        return True
+    print(f"❌ Persisted lockout: retry after {retry_after}, {pending} pending, restored {still_locked}")
+    return False
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running rate limiter tests...\n")
+    results = [
+        test_lockout(),
+        test_attempt_after_lockout(),
+        test_lockout_persisted_in_background(),
+    ]
+    print(f"\n{sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_tests() else 1)
@@ -0,0 +1,109 @@
+# bench_storage.py
+"""Compares insert and search throughput of the default SQLite setup with the tuned one.
+
+Usage:
+    python benchmarks/bench_storage.py [--rows 5000] [--searches 500]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import database  # noqa: E402
+
+
+class BaselineStore:
+    """The storage code as it was before tuning: defaults, no indexes, commit per write."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(database.MIGRATIONS[0])
+
+    def add(self, name, phone, email):
+        self.conn.execute("INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)", (name, phone, email))
+        self.conn.commit()
+
+    def search(self, term):
+        return self.conn.execute("SELECT id, name, phone, email FROM contacts WHERE name LIKE ?",
+                                 (f"%{term}%",)).fetchall()
+
+    def find_phone(self, phone):
+        return self.conn.execute("SELECT id FROM contacts WHERE phone = ?", (phone,)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+class TunedStore:
+    """The current database.py code path."""
+
+    def __init__(self, path):
+        self.db = database.init_db(path)
+
+    def add(self, name, phone, email):
+        database.add_contact_db(self.db, name, phone, email)
+
+    def search(self, term):
+        return database.get_all_contacts_db(self.db, term)
+
+    def find_phone(self, phone):
+        return database.find_by_phone_db(self.db, phone)
+
+    def close(self):
+        self.db.close()
+
+
+def random_contact(rng):
+    name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))).title()
+    phone = "".join(rng.choices(string.digits, k=11))
+    return name, phone, f"{name.lower()}@example.com"
+
+
+def run(label, store_class, rows, searches, seed):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = store_class(os.path.join(tmp, "bench.db"))
+        contacts = [random_contact(rng) for _ in range(rows)]
+
+        start = time.perf_counter()
+        for name, phone, email in contacts:
+            store.add(name, phone, email)
+        insert_secs = time.perf_counter() - start
+
+        terms = [name[:3] for name, _, _ in rng.sample(contacts, min(searches, rows))]
+        start = time.perf_counter()
+        for term in terms:
+            store.search(term)
+        search_secs = time.perf_counter() - start
+
+        phones = [phone for _, phone, _ in rng.sample(contacts, min(searches, rows))]
+        start = time.perf_counter()
+        for phone in phones:
+            store.find_phone(phone)
+        lookup_secs = time.perf_counter() - start
+        store.close()
+
+    print(f"{label:<10} inserts/s: {rows / insert_secs:>10.0f}   "
+          f"searches/s: {len(terms) / search_secs:>8.0f}   "
+          f"phone lookups/s: {len(phones) / lookup_secs:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run("baseline", BaselineStore, args.rows, args.searches, args.seed)
+    run("tuned", TunedStore, args.rows, args.searches, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# bench_suite.py
+"""Headless benchmark suite for the contact book data layer.
+
+Measures, for each database size:
+  - bulk insert throughput (bulk_io.import_contacts, fuzzy-search index included)
+    and single-row add latency
+  - search latency through the repository, cold (SQLite) and warm (cache),
+    and fuzzy search latency for misspelled names
+  - list render time: building the Flet cards for the first pages of results
+  - memory: Python heap peak of an import (up to 50k rows), process max RSS, database file size
+
+Results are printed and written to benchmarks/results/<timestamp>-<commit>.json
+so runs from different commits can be compared.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 100000 1000000] [--distribution zipf]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import database  # noqa: E402
+from bulk_io import import_contacts  # noqa: E402
+from repository import ContactRepository  # noqa: E402
+from datagen import DISTRIBUTIONS, FIRST_NAMES, LAST_NAMES, generate_contacts  # noqa: E402
+
+try:
+    from app_logic import contact_card  # noqa: E402
+except ImportError:  # flet not installed: skip the render benchmark
+    contact_card = None
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def import_heap_peak(size, distribution, seed):
+    """Python heap peak of an import, measured separately because tracing slows it down."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database.init_db(os.path.join(tmp, "heap.db"))
+        tracemalloc.start()
+        import_contacts(db, generate_contacts(size, seed, distribution))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.close()
+    return peak
+
+
+def bench_insert(db, size, distribution, seed):
+    start = time.perf_counter()
+    imported, _ = import_contacts(db, generate_contacts(size, seed, distribution))
+    elapsed = time.perf_counter() - start
+    # Memory use of a streaming import should not depend on its size, so a
+    # capped sample is enough to see it.
+    peak = import_heap_peak(min(size, 50_000), distribution, seed)
+
+    samples = []
+    for i in range(200):
+        start = time.perf_counter()
+        database.add_contact_db(db, f"Single Add {i}", f"+1 555 {i:07d}", None)
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "rows": imported,
+        "seconds": elapsed,
+        "rows_per_sec": imported / elapsed,
+        "python_heap_peak_mb": peak / 2**20,
+        "heap_sample_rows": min(size, 50_000),
+        "single_add": percentiles(samples),
+    }
+
+
+def bench_search(db, searches, seed):
+    rng = random.Random(seed)
+    terms = [rng.choice((rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)))[:rng.randint(2, 5)]
+             for _ in range(searches)]
+    repo = ContactRepository(db, max_queries=searches)
+
+    cold = []
+    for term in terms:
+        start = time.perf_counter()
+        repo.search(term)
+        cold.append(time.perf_counter() - start)
+
+    warm = []
+    for term in terms:
+        start = time.perf_counter()
+        repo.search(term)
+        warm.append(time.perf_counter() - start)
+
+    # Misspelled full names exercise the trigram/phonetic fallback search.
+    typos = []
+    for _ in range(min(searches, 50)):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".lower()
+        i = rng.randrange(len(name) - 1)
+        typos.append(name[:i] + name[i + 1] + name[i] + name[i + 2:])
+    fuzzy = []
+    for term in typos:
+        start = time.perf_counter()
+        repo.fuzzy_search(term)
+        fuzzy.append(time.perf_counter() - start)
+
+    return {"cold": percentiles(cold), "warm": percentiles(warm), "fuzzy": percentiles(fuzzy), "cache": repo.stats()}
+
+
+def bench_render(db, pages):
+    if contact_card is None:
+        return {"skipped": "flet is not installed"}
+    repo = ContactRepository(db)
+    rows = [row for number in range(pages) for row in repo.search(None, number)]
+    start = time.perf_counter()
+    cards = [contact_card(None, row, None, None) for row in rows]
+    elapsed = time.perf_counter() - start
+    return {"cards": len(cards), "ms": elapsed * 1000, "ms_per_card": elapsed * 1000 / max(len(cards), 1)}
+
+
+def run_size(size, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = database.init_db(path)
+        result = {"size": size}
+        result["insert"] = bench_insert(db, size, args.distribution, args.seed)
+        result["search"] = bench_search(db, args.searches, args.seed)
+        result["render"] = bench_render(db, args.pages)
+        db.close()
+        result["db_file_mb"] = os.path.getsize(path) / 2**20
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=4, help="pages of cards to build for the render benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "distribution": args.distribution,
+        "results": [],
+    }
+    for size in args.sizes:
+        result = run_size(size, args)
+        report["results"].append(result)
+        insert, search = result["insert"], result["search"]
+        print(f"{size:>9} contacts | insert {insert['rows_per_sec']:>9.0f} rows/s "
+              f"(heap peak {insert['python_heap_peak_mb']:.1f} MB) | "
+              f"search p50 cold {search['cold']['p50_ms']:.2f} ms, warm {search['warm']['p50_ms']:.3f} ms, "
+              f"fuzzy {search['fuzzy']['p50_ms']:.1f} ms (p95 {search['fuzzy']['p95_ms']:.1f}) | "
+              f"db {result['db_file_mb']:.1f} MB")
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(HERE, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(results_dir, f"{stamp}-{commit}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# datagen.py
+"""Synthetic contact generator for benchmarks.
+
+Usage:
+    python benchmarks/datagen.py 100000 contacts.csv [--distribution zipf] [--seed 42]
+"""
+import argparse
+import csv
+import itertools
+import random
+
+FIRST_NAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Christopher", "Nancy", "Daniel", "Lisa",
+    "Matthew", "Betty", "Anthony", "Margaret", "Mark", "Sandra", "Donald", "Ashley",
+    "Steven", "Kimberly", "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle",
+    "Kenneth", "Carol", "Kevin", "Amanda", "Brian", "Dorothy", "George", "Melissa",
+    "Justin", "Vince", "Maria", "Jose", "Juan", "Ana", "Miguel", "Sofia",
+)
+
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+    "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker",
+    "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Aguilar", "Santos", "Reyes", "Cruz", "Bautista", "Mendoza", "Villanueva", "Castro",
+)
+
+DISTRIBUTIONS = ("uniform", "zipf")
+
+
+def _weights(count, distribution, exponent=1.1):
+    if distribution == "uniform":
+        return None
+    if distribution == "zipf":
+        return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+
+def generate_contacts(count, seed=42, distribution="zipf", domains=("example.com", "mail.test")):
+    """Yields count (name, phone, email) tuples.
+
+    With the zipf distribution a few first and last names are very common,
+    like in a real address book; uniform picks every name equally often.
+    Phone numbers and emails are unique so an import never dedupes them.
+    """
+    rng = random.Random(seed)
+    first_cum = _cumulative(_weights(len(FIRST_NAMES), distribution))
+    last_cum = _cumulative(_weights(len(LAST_NAMES), distribution))
+    for i in range(count):
+        first = rng.choices(FIRST_NAMES, cum_weights=first_cum)[0]
+        last = rng.choices(LAST_NAMES, cum_weights=last_cum)[0]
+        phone = f"+63 9{i // 10_000_000 % 100:02d} {i // 10_000 % 1000:03d} {i % 10_000:04d}"
+        email = f"{first.lower()}.{last.lower()}{i}@{domains[i % len(domains)]}"
+        yield f"{first} {last}", phone, email
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights)) if weights else None
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("name", "phone", "email"))
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_csv(args.output, generate_contacts(args.count, args.seed, args.distribution))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # app_logic.py
+import sqlite3
 import flet as ft
-from database import update_contact_db, delete_contact_db, add_contact_db, get_all_contacts_db
+from bulk_io import read_contacts, import_contacts, export_contacts
+from repository import normalize_term, term_matches
 
 def theme_change(page, theme_value):
     page.theme_mode = (
@@ -13,96 +15,164 @@ def theme_change(page, theme_value):
     )
     page.update()
 
-def display_contacts(page, contacts_list_view, db_conn, search_query=None):
-    """Fetches and displays all contacts in the ListView."""
-    contacts_list_view.controls.clear()
-    contacts = get_all_contacts_db(db_conn, search_query)
-    if contacts == []:
+async def display_contacts(page, contacts_list_view, store, search_query=None, page_number=0):
+    """Fetches and displays contacts in the ListView, one page at a time."""
+    # Searches run concurrently while the user types; only the newest one may render.
+    request = (contacts_list_view.data or 0) + 1
+    contacts_list_view.data = request
+    contacts = await store.query_contacts(search_query, page_number)
+    if contacts_list_view.data != request:
+        return
+
+    if page_number == 0:
         contacts_list_view.controls.clear()
-        contacts_list_view.controls.append(ft.Text("No contacts found."))
-        page.update()
-        
+    elif contacts_list_view.controls:
+        # Drop the previous "Load more" button before appending the next page.
+        contacts_list_view.controls.pop()
+
+    suggestions = not contacts and page_number == 0 and bool(search_query)
+    if suggestions:
+        # Nothing contains the text as typed; offer the closest matches instead.
+        contacts = await store.fuzzy_contacts(search_query)
+        if contacts_list_view.data != request:
+            return
+        if contacts:
+            contacts_list_view.controls.append(ft.Text("No exact matches. Did you mean:", italic=True))
+
+    if not contacts and page_number == 0:
+        contacts_list_view.controls.append(ft.Text("No contacts found.", data="empty"))
+
     for contact in contacts:
-        contact_id, name, phone, email = contact
+        contacts_list_view.controls.append(contact_card(page, contact, store, contacts_list_view))
 
+    if len(contacts) == store.page_size and not suggestions:
         contacts_list_view.controls.append(
-            ft.Card(
-                ft.Container(
-                    ft.ListTile(
-                        title=ft.Text(name),
-                        subtitle=ft.Row([
-                                        ft.Icon(ft.Icons.PHONE),
-                                        ft.Text(f"Phone: {phone}"),
-                                        ft.Icon(ft.Icons.EMAIL), 
-                                        ft.Text(f"Email: {email}"),
-                                        ]),
-                        trailing=ft.PopupMenuButton(
-                            icon=ft.Icons.MORE_VERT,
-                            items=[
-                                ft.PopupMenuItem(
-                                    text="Edit",
-                                    icon=ft.Icons.EDIT,
-                                    on_click=lambda _, c=contact: open_edit_dialog(page, c, db_conn, contacts_list_view)
-                                ),
-                                ft.PopupMenuItem(),
-                                ft.PopupMenuItem(
-                                    text="Delete",
-                                    icon=ft.Icons.DELETE,
-                                    on_click=lambda _, cid=contact_id: delete_contact_confirmation(page, cid, db_conn, contacts_list_view)
-                                ),
-                            ],
-                        ),
-                    ),
-                ),
-                shadow_color=ft.Colors.ON_SURFACE_VARIANT,
+            ft.TextButton(
+                "Load more",
+                icon=ft.Icons.EXPAND_MORE,
+                on_click=lambda _: page.run_task(display_contacts, page, contacts_list_view, store, search_query, page_number + 1)
             )
         )
     page.update()
 
-def add_contact(page, inputs, contacts_list_view, db_conn):
+def contact_card(page, contact, store, contacts_list_view):
+    """Builds the card shown for one contact."""
+    contact_id, name, phone, email = contact
+
+    return ft.Card(
+        ft.Container(
+            ft.ListTile(
+                title=ft.Text(name),
+                subtitle=ft.Row([
+                                ft.Icon(ft.Icons.PHONE),
+                                ft.Text(f"Phone: {phone}"),
+                                ft.Icon(ft.Icons.EMAIL), 
+                                ft.Text(f"Email: {email}"),
+                                ]),
+                trailing=ft.PopupMenuButton(
+                    icon=ft.Icons.MORE_VERT,
+                    items=[
+                        ft.PopupMenuItem(
+                            text="Edit",
+                            icon=ft.Icons.EDIT,
+                            on_click=lambda _, c=contact: open_edit_dialog(page, c, store, contacts_list_view)
+                        ),
+                        ft.PopupMenuItem(),
+                        ft.PopupMenuItem(
+                            text="Delete",
+                            icon=ft.Icons.DELETE,
+                            on_click=lambda _, cid=contact_id: delete_contact_confirmation(page, cid, store, contacts_list_view)
+                        ),
+                    ],
+                ),
+            ),
+        ),
+        shadow_color=ft.Colors.ON_SURFACE_VARIANT,
+        data=contact_id,
+    )
+
+def patch_contacts(page, contacts_list_view, store, rows, search_query=None):
+    """Updates only the cards of the contacts in rows ({id: row or None}) instead of reloading the list.
+
+    Cards are replaced or removed in place. A contact that is not shown is
+    inserted in id order when it matches search_query and falls inside the
+    pages already loaded.
+    """
+    controls = contacts_list_view.controls
+    term = normalize_term(search_query)
+    cards = {control.data: control for control in controls if isinstance(control, ft.Card)}
+    has_more = bool(controls) and isinstance(controls[-1], ft.TextButton)
+    last_id = max(cards, default=0)
+
+    for contact_id, row in sorted(rows.items()):
+        card = cards.get(contact_id)
+        visible = row is not None and term_matches(term, row[1])
+        if card is not None:
+            index = controls.index(card)
+            if visible:
+                controls[index] = contact_card(page, row, store, contacts_list_view)
+            else:
+                del controls[index]
+        elif visible and (contact_id < last_id or not has_more):
+            index = next((i for i, control in enumerate(controls)
+                          if isinstance(control, ft.TextButton)
+                          or (isinstance(control, ft.Card) and control.data > contact_id)), len(controls))
+            controls.insert(index, contact_card(page, row, store, contacts_list_view))
+
+    has_cards = any(isinstance(control, ft.Card) for control in controls)
+    controls[:] = [control for control in controls if control.data != "empty"]
+    if not has_cards and not has_more:
+        controls.append(ft.Text("No contacts found.", data="empty"))
+    page.update()
+
+async def add_contact(page, inputs, contacts_list_view, store):
     """Adds a new contact and refreshes the list."""
     name_input, phone_input, email_input = inputs
 
     if name_input.value:
-        add_contact_db(db_conn, name_input.value, phone_input.value, email_input.value)
+        await store.add_contact(name_input.value, phone_input.value, email_input.value)
         for field in inputs:
             field.value = ""
         name_input.error_text = None
     else:
         name_input.error_text = "Name is required"
     
-    display_contacts(page, contacts_list_view, db_conn)
+    await display_contacts(page, contacts_list_view, store)
     page.update()
 
-def delete_contact_confirmation(page, contact_id, db_conn, contacts_list_view):
+def delete_contact_confirmation(page, contact_id, store, contacts_list_view):
     delete_contact_confirmation_dialog = ft.AlertDialog(
             icon=ft.Icon(name=ft.Icons.ERROR, color=ft.Colors.RED),
             title=ft.Text("Delete Confirmation", text_align=ft.TextAlign.CENTER),
             content=ft.Text(f"Are you sure you want to delete this contact?", text_align=ft.TextAlign.CENTER),
             alignment=ft.alignment.center,
-            actions=[ft.TextButton("Yes", on_click=lambda e: (page.close(delete_contact_confirmation_dialog), delete_contact(page, contact_id, db_conn, contacts_list_view))),
+            actions=[ft.TextButton("Yes", on_click=lambda e: (page.close(delete_contact_confirmation_dialog), page.run_task(delete_contact, page, contact_id, store, contacts_list_view))),
                      ft.TextButton("No", on_click=lambda e: (page.close(delete_contact_confirmation_dialog))),
                      ],
             )
     page.open(delete_contact_confirmation_dialog)
 
-def delete_contact(page, contact_id, db_conn, contacts_list_view):
-    """Deletes a contact and refreshes the list."""
-    delete_contact_db(db_conn, contact_id)
-    display_contacts(page, contacts_list_view, db_conn)
+async def delete_contact(page, contact_id, store, contacts_list_view):
+    """Deletes a contact and removes its card."""
+    await store.delete_contact(contact_id)
+    patch_contacts(page, contacts_list_view, store, {contact_id: None})
+
+async def undo_changes(page, contacts_list_view, store, search_query=None, redo=False):
+    """Undoes (or redoes) the last edit and patches the cards it touched."""
+    rows = await (store.redo() if redo else store.undo())
+    patch_contacts(page, contacts_list_view, store, rows, search_query)
 
-def open_edit_dialog(page, contact, db_conn, contacts_list_view):
+def open_edit_dialog(page, contact, store, contacts_list_view):
     """Opens a dialog to edit a contact's details."""
     contact_id, name, phone, email = contact
     edit_name = ft.TextField(label="Name", value=name)
     edit_phone = ft.TextField(label="Phone", value=phone)
     edit_email = ft.TextField(label="Email", value=email)
 
-    def save_and_close(e):
-        update_contact_db(db_conn, contact_id, edit_name.value, edit_phone.value, edit_email.value)
+    async def save_and_close(e):
+        row = await store.update_contact(contact_id, edit_name.value, edit_phone.value, edit_email.value)
         dialog.open = False
-        page.update()
-        display_contacts(page, contacts_list_view, db_conn)
+        patch_contacts(page, contacts_list_view, store, {contact_id: row})
 
     dialog = ft.AlertDialog(
         modal=True,
@@ -114,4 +184,31 @@ def open_edit_dialog(page, contact, db_conn, contacts_list_view):
         ],
     )
 
-    page.open(dialog)
\ No newline at end of file
+    page.open(dialog)
+
+async def import_contacts_file(page, path, contacts_list_view, store, status_text):
+    """Imports contacts from a CSV or vCard file on the database executor."""
+    def report(count):
+        status_text.value = f"Read {count} contacts..."
+        page.update()
+
+    status_text.value = "Importing..."
+    page.update()
+    try:
+        imported, skipped = await store.run(import_contacts, store.repo.db, read_contacts(path), progress=report)
+        status_text.value = f"Imported {imported} contacts, skipped {skipped} duplicates."
+    except (OSError, ValueError, sqlite3.Error) as e:
+        status_text.value = f"Import failed: {e}"
+    store.repo.invalidate_all()
+    await display_contacts(page, contacts_list_view, store)
+
+async def export_contacts_file(page, path, store, status_text):
+    """Exports all contacts to a CSV or vCard file on the database executor."""
+    status_text.value = "Exporting..."
+    page.update()
+    try:
+        written = await store.run(export_contacts, store.repo.db, path)
+        status_text.value = f"Exported {written} contacts."
+    except (OSError, ValueError, sqlite3.Error) as e:
+        status_text.value = f"Export failed: {e}"
+    page.update()
@@ -0,0 +1,75 @@
+# async_store.py
+"""Awaitable contact data API for Flet's event loop."""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from history import History
+
+
+class AsyncContactStore:
+    """Runs ContactRepository calls on a dedicated thread pool.
+
+    Every method is a coroutine, so Flet handlers (or tasks started with
+    page.run_task) can await SQLite work without blocking the event loop.
+    Several calls can be in flight at once: reads run in parallel on the
+    reader pool, writes queue up behind the single writer connection.
+    """
+
+    def __init__(self, repo, max_workers=4):
+        self.repo = repo
+        self.history = History(repo)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contacts-db")
+
+    @property
+    def page_size(self):
+        return self.repo.page_size
+
+    async def run(self, func, *args, **kwargs):
+        """Runs any blocking callable (e.g. a bulk import) on the database executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def add_contact(self, name, phone, email):
+        """Adds a contact and returns its id."""
+        row = await self.run(self.history.add, name, phone, email)
+        return row[0]
+
+    async def update_contact(self, contact_id, name, phone, email):
+        """Updates a contact and returns its new row."""
+        return await self.run(self.history.update, contact_id, name, phone, email)
+
+    async def delete_contact(self, contact_id):
+        await self.run(self.history.delete, contact_id)
+
+    async def undo(self, count=1):
+        """Undoes the last count edits; returns {contact_id: row or None} of what changed."""
+        return await self.run(self.history.undo, count)
+
+    async def redo(self, count=1):
+        """Redoes the last count undone edits; returns what changed like undo()."""
+        return await self.run(self.history.redo, count)
+
+    async def get_contact(self, contact_id):
+        return await self.run(self.repo.get, contact_id)
+
+    async def query_contacts(self, search_query=None, page_number=0):
+        """Returns one page of contacts matching search_query."""
+        return await self.run(self.repo.search, search_query, page_number)
+
+    async def fuzzy_contacts(self, search_query, limit=10):
+        """Returns contacts resembling search_query, best match first."""
+        return await self.run(self.repo.fuzzy_search, search_query, limit)
+
+    async def duplicate_clusters(self):
+        """Returns groups of contacts sharing a phone number or email address."""
+        return await self.run(self.repo.duplicate_clusters)
+
+    async def merge_contacts(self, keep_id, other_ids):
+        """Merges other_ids into keep_id and returns the merged contact."""
+        return await self.run(self.history.merge, keep_id, other_ids)
+
+    def close(self):
+        """Waits for queued work, then closes the executor and the database."""
+        self._executor.shutdown(wait=True)
+        self.repo.db.close()
@@ -0,0 +1,243 @@
+# bulk_io.py
+"""Streaming CSV / vCard import and export for the contact book."""
+import csv
+import os
+
+from database import normalize_phone, normalize_email, insert_index_terms
+from fuzzy import phonetic_key
+
+# Rows inserted per transaction during an import.
+CHUNK_SIZE = 5000
+
+# Stay below SQLite's default host-parameter limit when looking up keys.
+_MAX_PARAMS = 900
+
+CSV_FIELDS = ("name", "phone", "email")
+
+
+def read_csv(path):
+    """Yields (name, phone, email) tuples from a CSV file.
+
+    A header row naming the columns is used when present, otherwise the first
+    three columns are taken as name, phone and email.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is None:
+            return
+        header = [column.strip().lower() for column in first]
+        if "name" in header:
+            positions = [header.index(field) if field in header else None for field in CSV_FIELDS]
+        else:
+            positions = [0, 1, 2]
+            reader = _chain_row(first, reader)
+
+        for row in reader:
+            values = [row[i].strip() if i is not None and i < len(row) else "" for i in positions]
+            if values[0]:
+                yield tuple(values)
+
+
+def _chain_row(first, reader):
+    yield first
+    yield from reader
+
+
+def _unescape_vcard(value):
+    return (value.replace("\\n", "\n").replace("\\N", "\n")
+                 .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def _escape_vcard(value):
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+                 .replace(",", "\\,").replace(";", "\\;"))
+
+
+def _unfold_lines(f):
+    """Joins folded vCard lines (continuations start with a space or tab)."""
+    pending = None
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def read_vcard(path):
+    """Yields (name, phone, email) tuples from a vCard (.vcf) file."""
+    with open(path, encoding="utf-8-sig") as f:
+        card = None
+        for line in _unfold_lines(f):
+            if not line or ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            prop = key.split(";", 1)[0].split(".")[-1].upper()
+
+            if prop == "BEGIN" and value.strip().upper() == "VCARD":
+                card = {}
+            elif card is None:
+                continue
+            elif prop == "END":
+                name = card.get("FN") or card.get("N", "")
+                if name:
+                    yield name, card.get("TEL", ""), card.get("EMAIL", "")
+                card = None
+            elif prop == "N" and "N" not in card:
+                family, _, rest = value.partition(";")
+                given = rest.split(";", 1)[0]
+                card["N"] = _unescape_vcard(f"{given} {family}".strip())
+            elif prop in ("FN", "TEL", "EMAIL") and prop not in card:
+                card[prop] = _unescape_vcard(value.strip())
+
+
+def read_contacts(path):
+    """Picks the reader for a file based on its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".vcf", ".vcard"):
+        return read_vcard(path)
+    if extension == ".csv":
+        return read_csv(path)
+    raise ValueError(f"Unsupported file type: {extension or path}")
+
+
+def _dedupe_keys(phone, email):
+    keys = []
+    phone_key = normalize_phone(phone)
+    email_key = normalize_email(email)
+    if phone_key:
+        keys.append("p:" + phone_key)
+    if email_key:
+        keys.append("e:" + email_key)
+    return keys
+
+
+def _existing_keys(conn, keys):
+    """Returns the keys that already belong to a contact, via the normalized column indexes."""
+    found = set()
+    for prefix, column in (("p:", "phone_norm"), ("e:", "email_norm")):
+        values = [key[2:] for key in keys if key.startswith(prefix)]
+        for start in range(0, len(values), _MAX_PARAMS):
+            part = values[start:start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            found.update(prefix + row[0] for row in conn.execute(
+                f"SELECT {column} FROM contacts WHERE {column} IN ({placeholders})", part
+            ))
+    return found
+
+
+def _insert_chunk(conn, chunk):
+    """Inserts the rows of one chunk that are not duplicates; returns how many were new."""
+    seen = _existing_keys(conn, {key for _, keys in chunk for key in keys})
+    fresh_rows = []
+    for row, keys in chunk:
+        if any(key in seen for key in keys):
+            continue
+        seen.update(keys)
+        fresh_rows.append(row)
+
+    # The new rows are read back rather than their ids assumed to follow the
+    # sequence; the writer lock keeps other inserts out until the commit, so
+    # every id above the previous maximum belongs to this chunk.
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM contacts").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO contacts (name, phone, email, name_phonetic) VALUES (?, ?, ?, ?)",
+        ((name, phone, email, phonetic_key(name)) for name, phone, email in fresh_rows)
+    )
+    inserted = conn.execute(
+        "SELECT id, name, phone, email FROM contacts WHERE id > ? ORDER BY id", (last_id,)
+    ).fetchall()
+    insert_index_terms(conn, inserted)
+    return len(inserted)
+
+
+def import_contacts(db, rows, chunk_size=CHUNK_SIZE, progress=None):
+    """Imports (name, phone, email) rows, skipping contacts whose phone or email already exists.
+
+    Rows are consumed lazily and each chunk of chunk_size rows is inserted in
+    its own write transaction, so memory use does not grow with the size of
+    the input and other writers get a turn between chunks. progress, if
+    given, is called with the number of rows read after each chunk.
+
+    Returns a tuple (imported, skipped).
+    """
+    read = imported = 0
+    chunk = []
+    for name, phone, email in rows:
+        chunk.append(((name, phone or None, email or None), _dedupe_keys(phone, email)))
+        if len(chunk) >= chunk_size:
+            read += len(chunk)
+            with db.writer() as conn:
+                imported += _insert_chunk(conn, chunk)
+            chunk = []
+            if progress:
+                progress(read)
+    if chunk:
+        read += len(chunk)
+        with db.writer() as conn:
+            imported += _insert_chunk(conn, chunk)
+        if progress:
+            progress(read)
+
+    db.optimize()
+    return imported, read - imported
+
+
+def _iter_contacts(db, batch_size=CHUNK_SIZE):
+    with db.reader() as conn:
+        cursor = conn.execute("SELECT name, phone, email FROM contacts ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+
+
+def export_csv(db, path, progress=None):
+    """Writes every contact to a CSV file and returns the number written."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        for batch in _iter_contacts(db):
+            writer.writerows((name, phone or "", email or "") for name, phone, email in batch)
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
+
+
+def export_vcard(db, path, progress=None):
+    """Writes every contact to a vCard 3.0 file and returns the number written."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for batch in _iter_contacts(db):
+            lines = []
+            for name, phone, email in batch:
+                lines.append("BEGIN:VCARD\r\nVERSION:3.0\r\n")
+                lines.append(f"FN:{_escape_vcard(name)}\r\n")
+                if phone:
+                    lines.append(f"TEL:{_escape_vcard(phone)}\r\n")
+                if email:
+                    lines.append(f"EMAIL:{_escape_vcard(email)}\r\n")
+                lines.append("END:VCARD\r\n")
+            f.writelines(lines)
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
+
+
+def export_contacts(db, path, progress=None):
+    """Exports to CSV or vCard depending on the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".vcf", ".vcard"):
+        return export_vcard(db, path, progress)
+    if extension == ".csv":
+        return export_csv(db, path, progress)
+    raise ValueError(f"Unsupported file type: {extension or path}")
@@ -1,52 +1,522 @@
 # database.py
+import heapq
+import queue
 import sqlite3
+import string
+from contextlib import contextmanager
+from itertools import chain, islice
 
-def init_db():
-    """Initializes the database and creates the contacts table if it doesn't exist."""
-    conn = sqlite3.connect('contacts.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS contacts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT,
-            email TEXT
-        )
+from fuzzy import index_terms, phonetic_key, query_terms, score
+
+DB_PATH = 'contacts.db'
+
+# Run PRAGMA optimize after this many writes so the query planner statistics
+# stay fresh without paying for an ANALYZE on every commit.
+OPTIMIZE_EVERY = 500
+
+# Connection-level tuning. WAL lets readers run while a write is in progress and,
+# together with synchronous=NORMAL, only fsyncs on checkpoints instead of on every commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Fuzzy search: postings read per query term (caps the cost of very common
+# trigrams), candidates ranked by edit distance, and the lowest score returned.
+FUZZY_TERM_POSTINGS = 1000
+FUZZY_CANDIDATES = 50
+MIN_FUZZY_SCORE = 0.5
+# Fuzzy-index entries per INSERT statement (two parameters each, below
+# SQLite's default limit of 999).
+TERMS_PER_INSERT = 400
+
+# Characters dropped when normalizing a phone number. The same set is used by
+# normalize_phone() and by the phone_norm column, so both always agree.
+PHONE_SEPARATORS = " \t-.()/+"
+_PHONE_STRIP = str.maketrans("", "", PHONE_SEPARATORS)
+# SQLite's lower() and trim() only know ASCII, so the Python side does the same.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_BLANKS = " \t"
+
+def normalize_phone(phone):
+    """Reduces a phone number to its digits, keeping a leading '+', or None if empty.
+
+    '+63 917-555 (1234)' becomes '+639175551234'.
+    """
+    if not phone:
+        return None
+    digits = phone.translate(_PHONE_STRIP)
+    if not digits:
+        return None
+    return "+" + digits if phone.lstrip(_BLANKS).startswith("+") else digits
+
+def normalize_email(email):
+    """Lowercases and trims an email address, or returns None if empty."""
+    if not email:
+        return None
+    return email.strip(_BLANKS).translate(_ASCII_LOWER) or None
+
+def _sql_literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+def _phone_norm_sql(column):
+    """SQL expression computing normalize_phone(column)."""
+    digits = column
+    for ch in PHONE_SEPARATORS:
+        digits = f"replace({digits}, {_sql_literal(ch)}, '')"
+    # substr('+', 1, <bool>) is '+' or ''; concatenating NULL keeps empty numbers NULL.
+    starts_with_plus = f"substr(ltrim({column}, {_sql_literal(_BLANKS)}), 1, 1) = '+'"
+    return f"substr('+', 1, {starts_with_plus}) || nullif({digits}, '')"
+
+def _email_norm_sql(column):
+    """SQL expression computing normalize_email(column)."""
+    return f"nullif(lower(trim({column}, {_sql_literal(_BLANKS)})), '')"
+
+def _add_fuzzy_index(conn):
+    conn.execute("ALTER TABLE contacts ADD COLUMN name_phonetic TEXT")
+    conn.execute('''
+        CREATE TABLE contact_terms (
+            term TEXT NOT NULL,
+            contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+            PRIMARY KEY (term, contact_id)
+        ) WITHOUT ROWID
     ''')
-    conn.commit()
-    return conn
-
-def add_contact_db(conn, name, phone, email):
-    """Adds a new contact to the database."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
-        (name, phone, email)
-    )
-    conn.commit()
+    conn.execute("CREATE INDEX idx_contact_terms_contact ON contact_terms (contact_id)")
+    rows = conn.execute("SELECT id, name, phone, email FROM contacts").fetchall()
+    conn.executemany("UPDATE contacts SET name_phonetic = ? WHERE id = ?",
+                     [(phonetic_key(name), contact_id) for contact_id, name, _, _ in rows])
+    insert_index_terms(conn, rows)
+
+# Schema migrations, applied in order. The index of each entry + 1 is the schema
+# version stored in PRAGMA user_version once it has been applied. An entry is
+# either an SQL script or a function taking the connection.
+MIGRATIONS = [
+    # 1: initial schema
+    '''
+    CREATE TABLE IF NOT EXISTS contacts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        email TEXT
+    );
+    ''',
+    # 2: lookup indexes
+    '''
+    CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts (name COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_contacts_phone ON contacts (phone);
+    CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts (email);
+    ''',
+    # 3: trigram / phonetic index for fuzzy search
+    _add_fuzzy_index,
+    # 4: normalized phone / email columns. The indexes are partial (most
+    # lookups are for a value) and not unique, since existing books may
+    # already hold duplicates; duplicate_clusters_db() finds them.
+    f'''
+    ALTER TABLE contacts ADD COLUMN phone_norm TEXT GENERATED ALWAYS AS ({_phone_norm_sql("phone")}) VIRTUAL;
+    ALTER TABLE contacts ADD COLUMN email_norm TEXT GENERATED ALWAYS AS ({_email_norm_sql("email")}) VIRTUAL;
+    DROP INDEX IF EXISTS idx_contacts_phone;
+    DROP INDEX IF EXISTS idx_contacts_email;
+    CREATE INDEX idx_contacts_phone_norm ON contacts (phone_norm) WHERE phone_norm IS NOT NULL;
+    CREATE INDEX idx_contacts_email_norm ON contacts (email_norm) WHERE email_norm IS NOT NULL;
+    ''',
+    # 5: change journal for incremental sync (see sync.py). Every insert, update
+    # and delete appends the row image after the change; AUTOINCREMENT keeps
+    # seq increasing even after old entries are compacted away.
+    '''
+    CREATE TABLE contact_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        contact_id INTEGER NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+        name TEXT,
+        phone TEXT,
+        email TEXT
+    );
+    CREATE INDEX idx_contact_changes_contact ON contact_changes (contact_id, seq);
+    CREATE TABLE sync_state (
+        peer TEXT PRIMARY KEY,
+        pulled_seq INTEGER,    -- newest entry of the peer's journal applied here
+        pushed_seq INTEGER     -- newest entry of this journal the peer has applied
+    );
+    CREATE TRIGGER contacts_journal_insert AFTER INSERT ON contacts BEGIN
+        INSERT INTO contact_changes (contact_id, op, name, phone, email)
+        VALUES (NEW.id, 'insert', NEW.name, NEW.phone, NEW.email);
+    END;
+    CREATE TRIGGER contacts_journal_update AFTER UPDATE OF name, phone, email ON contacts
+    WHEN OLD.name IS NOT NEW.name OR OLD.phone IS NOT NEW.phone OR OLD.email IS NOT NEW.email
+    BEGIN
+        INSERT INTO contact_changes (contact_id, op, name, phone, email)
+        VALUES (NEW.id, 'update', NEW.name, NEW.phone, NEW.email);
+    END;
+    CREATE TRIGGER contacts_journal_delete AFTER DELETE ON contacts BEGIN
+        INSERT INTO contact_changes (contact_id, op) VALUES (OLD.id, 'delete');
+    END;
+    INSERT INTO contact_changes (contact_id, op, name, phone, email)
+    SELECT id, 'insert', name, phone, email FROM contacts ORDER BY id;
+    ''',
+    # 6: drop the first-letter trigrams ('  j') from the fuzzy index; trigrams()
+    # no longer produces them.
+    '''
+    DELETE FROM contact_terms WHERE substr(term, 1, 2) = '  ';
+    ''',
+]
+
+def configure_connection(conn):
+    """Applies the storage pragmas to a freshly opened connection."""
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+def migrate(conn):
+    """Brings the schema up to the latest version and returns that version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        if callable(step):
+            conn.execute("BEGIN")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        else:
+            # executescript() commits any pending transaction first, so the
+            # migration and its version bump are wrapped in one explicit transaction.
+            conn.executescript(f"BEGIN; {step} PRAGMA user_version = {target}; COMMIT;")
+    return len(MIGRATIONS)
+
+def _insert_terms_sql(count):
+    return "INSERT OR IGNORE INTO contact_terms (term, contact_id) VALUES " + ",".join(["(?, ?)"] * count)
+
+def insert_index_terms(conn, rows):
+    """Adds the fuzzy-search index entries of (id, name, phone, email) rows.
+
+    A contact has a couple of dozen entries, so they are written
+    TERMS_PER_INSERT to a statement rather than one statement each.
+    """
+    values = chain.from_iterable((term, contact_id) for contact_id, name, phone, email in rows
+                                 for term in index_terms(name, phone, email))
+    sql = _insert_terms_sql(TERMS_PER_INSERT)
+    while True:
+        batch = list(islice(values, 2 * TERMS_PER_INSERT))
+        if len(batch) < 2 * TERMS_PER_INSERT:
+            break
+        conn.execute(sql, batch)
+    if batch:
+        conn.execute(_insert_terms_sql(len(batch) // 2), batch)
+
+class ConnectionManager:
+    """Hands out SQLite connections: one shared writer and a pool of read-only readers.
+
+    The writer connection sits in a one-slot queue, so writes from different
+    threads are serialized instead of interleaving on the same connection.
+    Readers are checked out of their own queue; in WAL mode they keep working
+    while a write transaction is open.
+    """
+
+    def __init__(self, path=DB_PATH, readers=4, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._writes_since_optimize = 0
+        self._writer = queue.Queue(maxsize=1)
+        self._readers = queue.Queue(maxsize=readers)
+
+        writer = self._connect()
+        migrate(writer)
+        writer.execute("PRAGMA optimize")
+        self._writer.put(writer)
+
+        for _ in range(readers):
+            reader = self._connect()
+            reader.execute("PRAGMA query_only = ON")
+            self._readers.put(reader)
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly by writer().
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               timeout=self.timeout, isolation_level=None)
+        configure_connection(conn)
+        return conn
+
+    def _checkout(self, pool):
+        try:
+            return pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("timed out waiting for a database connection") from None
+
+    @contextmanager
+    def writer(self):
+        """Yields the writer connection inside a transaction committed on exit."""
+        conn = self._checkout(self._writer)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        else:
+            self._writes_since_optimize += 1
+            if self._writes_since_optimize >= OPTIMIZE_EVERY:
+                self._writes_since_optimize = 0
+                conn.execute("PRAGMA optimize")
+        finally:
+            self._writer.put(conn)
+
+    @contextmanager
+    def reader(self):
+        """Yields a read-only connection from the pool."""
+        conn = self._checkout(self._readers)
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
 
-def get_all_contacts_db(conn, search_value):
-    """Retrieves all contacts from the database."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, phone, email FROM contacts")
-    results = cursor.fetchall()
+    def optimize(self):
+        """Lets SQLite refresh planner statistics for tables that need it."""
+        conn = self._checkout(self._writer)
+        try:
+            self._writes_since_optimize = 0
+            conn.execute("PRAGMA optimize")
+        finally:
+            self._writer.put(conn)
+
+    def close(self):
+        """Closes every connection; the manager cannot be used afterwards."""
+        self.optimize()
+        self._checkout(self._writer).close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+def init_db(path=DB_PATH, readers=4):
+    """Initializes the database, applies migrations and returns its ConnectionManager."""
+    return ConnectionManager(path, readers=readers)
+
+def add_contact_db(db, name, phone, email):
+    """Adds a new contact to the database and returns its id."""
+    with db.writer() as conn:
+        cursor = conn.execute(
+            "INSERT INTO contacts (name, phone, email, name_phonetic) VALUES (?, ?, ?, ?)",
+            (name, phone, email, phonetic_key(name))
+        )
+        insert_index_terms(conn, [(cursor.lastrowid, name, phone, email)])
+        return cursor.lastrowid
+
+def get_contact_db(db, contact_id):
+    """Retrieves a single contact by id, or None if it does not exist."""
+    with db.reader() as conn:
+        return conn.execute("SELECT id, name, phone, email FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+
+def get_all_contacts_db(db, search_value, limit=None, offset=0):
+    """Retrieves all contacts from the database, optionally one page at a time."""
+    sql = "SELECT id, name, phone, email FROM contacts"
+    params = []
     if search_value:
-        cursor.execute("SELECT id, name, phone, email FROM contacts WHERE name LIKE ?", (f"%{search_value}%",))
-        results = cursor.fetchall()
-    
-    return results
+        sql += " WHERE name LIKE ?"
+        params.append(f"%{search_value}%")
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    with db.reader() as conn:
+        return conn.execute(sql, params).fetchall()
 
-def update_contact_db(conn, contact_id, name, phone, email):
-    """Updates an existing contact in the database."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE contacts SET name = ?, phone = ?, email = ? WHERE id = ?",
-        (name, phone, email, contact_id)
+def fuzzy_search_db(db, query, limit=10):
+    """Returns up to limit contacts whose name, phone or email resemble query, best first.
+
+    Candidates sharing the most trigrams or Soundex codes with the query are
+    pulled from the contact_terms index (newest postings first for very
+    common terms) and then ranked by edit distance. Once limit matches are
+    found, candidates that cannot beat the worst of them are skipped or have
+    their edit distances cut short.
+    """
+    terms = list(query_terms(query))
+    if not terms or limit <= 0:
+        return []
+    postings = " UNION ALL ".join(
+        ["SELECT contact_id FROM (SELECT contact_id FROM contact_terms"
+         " WHERE term = ? ORDER BY contact_id DESC LIMIT ?)"] * len(terms)
     )
-    conn.commit()
+    params = [value for term in terms for value in (term, FUZZY_TERM_POSTINGS)]
+    with db.reader() as conn:
+        candidates = conn.execute(f'''
+            SELECT c.id, c.name, c.phone, c.email, c.name_phonetic
+            FROM (
+                SELECT contact_id, COUNT(*) AS shared FROM ({postings})
+                GROUP BY contact_id ORDER BY shared DESC, contact_id DESC LIMIT ?
+            ) AS matches
+            JOIN contacts c ON c.id = matches.contact_id
+            ORDER BY matches.shared DESC, matches.contact_id DESC
+        ''', params + [FUZZY_CANDIDATES]).fetchall()
 
-def delete_contact_db(conn, contact_id):
+    # Candidates are scored in order of an upper bound of their score, so the
+    # best limit matches are found early and the remaining candidates are
+    # dropped once their bound falls below the worst of them. best is a
+    # min-heap of (score, -position, row); on equal scores the candidate
+    # sharing more terms wins.
+    bounded = sorted(
+        ((score(query, name, phone, email, name_phonetic, estimate=True), -position,
+          (contact_id, name, phone, email, name_phonetic))
+         for position, (contact_id, name, phone, email, name_phonetic) in enumerate(candidates)),
+        reverse=True
+    )
+    best = []
+    for bound, position, (contact_id, name, phone, email, name_phonetic) in bounded:
+        minimum = max(MIN_FUZZY_SCORE, best[0][0]) if len(best) == limit else MIN_FUZZY_SCORE
+        if bound < minimum:
+            break
+        rank = score(query, name, phone, email, name_phonetic, minimum)
+        if rank < minimum:
+            continue
+        item = (rank, position, (contact_id, name, phone, email))
+        if len(best) < limit:
+            heapq.heappush(best, item)
+        elif item > best[0]:
+            heapq.heapreplace(best, item)
+    return [row for rank, position, row in sorted(best, reverse=True)]
+
+def update_contact_db(db, contact_id, name, phone, email):
+    """Updates an existing contact in the database."""
+    with db.writer() as conn:
+        conn.execute(
+            "UPDATE contacts SET name = ?, phone = ?, email = ?, name_phonetic = ? WHERE id = ?",
+            (name, phone, email, phonetic_key(name), contact_id)
+        )
+        conn.execute("DELETE FROM contact_terms WHERE contact_id = ?", (contact_id,))
+        insert_index_terms(conn, [(contact_id, name, phone, email)])
+
+def delete_contact_db(db, contact_id):
     """Deletes a contact from the database."""
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
-    conn.commit()
\ No newline at end of file
+    with db.writer() as conn:
+        conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+
+def apply_row_images(conn, images):
+    """Writes (contact_id, row) pairs on an open connection.
+
+    row is (name, phone, email) to insert or overwrite the contact with that
+    id, or None to delete it. Used to restore earlier states (undo/redo) and
+    to replay journal entries (sync.py).
+    """
+    images = list(images)
+    upserts = [(contact_id, *row) for contact_id, row in images if row is not None]
+    conn.executemany("DELETE FROM contacts WHERE id = ?",
+                     [(contact_id,) for contact_id, row in images if row is None])
+    conn.executemany(
+        "INSERT INTO contacts (id, name, phone, email, name_phonetic) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT (id) DO UPDATE SET name = excluded.name, phone = excluded.phone,"
+        " email = excluded.email, name_phonetic = excluded.name_phonetic",
+        [(contact_id, name, phone, email, phonetic_key(name)) for contact_id, name, phone, email in upserts]
+    )
+    conn.executemany("DELETE FROM contact_terms WHERE contact_id = ?", [(row[0],) for row in upserts])
+    insert_index_terms(conn, upserts)
+
+def apply_row_images_db(db, images):
+    """Applies apply_row_images() in a single transaction and returns the resulting
+    {contact_id: (id, name, phone, email) or None} rows."""
+    images = list(images)
+    with db.writer() as conn:
+        apply_row_images(conn, images)
+    return {contact_id: (contact_id, *row) if row is not None else None for contact_id, row in images}
+
+def find_by_phone_db(db, phone):
+    """Returns the contacts whose phone number normalizes to the same value as phone."""
+    phone = normalize_phone(phone)
+    if phone is None:
+        return []
+    with db.reader() as conn:
+        return conn.execute(
+            "SELECT id, name, phone, email FROM contacts WHERE phone_norm = ? ORDER BY id", (phone,)
+        ).fetchall()
+
+def find_by_email_db(db, email):
+    """Returns the contacts whose email matches email, ignoring case and surrounding blanks."""
+    email = normalize_email(email)
+    if email is None:
+        return []
+    with db.reader() as conn:
+        return conn.execute(
+            "SELECT id, name, phone, email FROM contacts WHERE email_norm = ? ORDER BY id", (email,)
+        ).fetchall()
+
+def duplicate_clusters_db(db):
+    """Groups contacts that share a normalized phone number or email address.
+
+    Each key is read in sorted order straight from its partial index, so equal
+    values are adjacent and one pass finds them; a union-find then merges
+    groups linked through either key (A shares a phone with B, B an email
+    with C). Only contacts that have a duplicate are kept in memory.
+
+    Returns a list of clusters, each a list of (id, name, phone, email) rows
+    ordered by id, with the clusters ordered by their first id.
+    """
+    parent = {}
+
+    def find(contact_id):
+        root = contact_id
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[contact_id] != root:
+            parent[contact_id], contact_id = root, parent[contact_id]
+        return root
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    with db.reader() as conn:
+        for column in ("phone_norm", "email_norm"):
+            previous_key = first_id = None
+            cursor = conn.execute(
+                f"SELECT {column}, id FROM contacts WHERE {column} IS NOT NULL ORDER BY {column}"
+            )
+            for key, contact_id in cursor:
+                if key == previous_key:
+                    union(first_id, contact_id)
+                else:
+                    previous_key, first_id = key, contact_id
+
+        clusters = {}
+        for contact_id in parent:
+            clusters.setdefault(find(contact_id), []).append(contact_id)
+
+        rows = {}
+        ids = list(parent)
+        for start in range(0, len(ids), 900):
+            part = ids[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            rows.update((row[0], row) for row in conn.execute(
+                f"SELECT id, name, phone, email FROM contacts WHERE id IN ({placeholders})", part
+            ))
+    return [[rows[contact_id] for contact_id in sorted(members)]
+            for _, members in sorted(clusters.items())]
+
+def merge_contacts_db(db, keep_id, other_ids):
+    """Merges other_ids into keep_id and deletes them.
+
+    The kept contact keeps its own name; a missing phone or email is filled
+    in from the first of the other contacts (by id) that has one. Returns the
+    merged row, or None if keep_id does not exist.
+    """
+    other_ids = sorted(set(other_ids) - {keep_id})
+    with db.writer() as conn:
+        kept = conn.execute("SELECT id, name, phone, email FROM contacts WHERE id = ?", (keep_id,)).fetchone()
+        if kept is None:
+            return None
+        _, name, phone, email = kept
+        for other_id in other_ids:
+            other = conn.execute("SELECT phone, email FROM contacts WHERE id = ?", (other_id,)).fetchone()
+            if other is None:
+                continue
+            phone = phone or other[0]
+            email = email or other[1]
+            conn.execute("DELETE FROM contacts WHERE id = ?", (other_id,))
+        if (phone, email) != kept[2:]:
+            conn.execute("UPDATE contacts SET phone = ?, email = ? WHERE id = ?", (phone, email, keep_id))
+            conn.execute("DELETE FROM contact_terms WHERE contact_id = ?", (keep_id,))
+            insert_index_terms(conn, [(keep_id, name, phone, email)])
+        return keep_id, name, phone, email
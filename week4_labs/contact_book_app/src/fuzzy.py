@@ -0,0 +1,226 @@
+# fuzzy.py
+"""String helpers for typo-tolerant contact search: trigrams, Soundex and edit distance."""
+import re
+from collections import Counter
+from functools import lru_cache
+
+_WORDS = re.compile(r"[^\W_]+")
+_NON_DIGITS = re.compile(r"\D+")
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+# Name words whose Soundex code and trigrams are kept. Names repeat a lot
+# across an address book, so an import mostly finds them here.
+WORD_CACHE_SIZE = 4096
+
+# Only the subscriber part of a phone number is indexed; country and area
+# codes are shared by too many contacts to help narrow a search.
+PHONE_DIGITS_INDEXED = 7
+
+
+def words(text):
+    """Splits text into lowercase alphanumeric words."""
+    return _WORDS.findall((text or "").lower())
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def soundex(word):
+    """Returns the American Soundex code of a word, e.g. 'Robert' -> 'R163'."""
+    letters = [ch for ch in word.lower() if "a" <= ch <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do.
+        if ch not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_key(name):
+    """Space-separated Soundex codes of every word of a name."""
+    return " ".join(code for code in (soundex(word) for word in words(name)) if code)
+
+
+def trigrams(text):
+    """Returns the set of padded character trigrams of every word in text.
+
+    Words are padded with one space on each side. A second leading space
+    would add a trigram for the first letter alone, which matches so many
+    contacts that it only slows searches down.
+    """
+    grams = set()
+    for word in words(text):
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _name_word_trigrams(word):
+    return frozenset(trigrams(word))
+
+
+def name_trigrams(name):
+    """trigrams() of a name, from the per-word cache."""
+    grams = set()
+    for word in words(name):
+        grams |= _name_word_trigrams(word)
+    return grams
+
+
+def phone_digits(phone):
+    return _NON_DIGITS.sub("", phone or "")
+
+
+def index_terms(name, phone, email):
+    """All index entries for a contact: trigrams of name, email local part and
+    phone subscriber digits, plus '#'-prefixed Soundex codes of the name."""
+    terms = name_trigrams(name)
+    if email:
+        terms |= trigrams(email.split("@", 1)[0])
+    digits = phone_digits(phone)[-PHONE_DIGITS_INDEXED:]
+    if digits:
+        terms |= trigrams(digits)
+    terms.update("#" + code for code in phonetic_key(name).split())
+    return terms
+
+
+def query_terms(query):
+    """Index entries to look up for a search query."""
+    terms = trigrams(query)
+    digits = phone_digits(query)
+    if len(digits) >= 3:
+        terms |= trigrams(digits[-PHONE_DIGITS_INDEXED:])
+    terms.update("#" + code for code in phonetic_key(query).split())
+    return terms
+
+
+def damerau_levenshtein(a, b, limit=None):
+    """Edit distance counting insertions, deletions, substitutions and adjacent transpositions.
+
+    With limit, only the cells that can stay within it are computed and
+    limit + 1 is returned as soon as the distance is known to exceed it.
+    """
+    if a == b:
+        return 0
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return max(len(a), len(b))
+    # Cells further than limit from the diagonal cost more than limit, so
+    # each row is only computed within that band; everything else counts
+    # as limit + 1.
+    over = limit + 1
+    previous_previous = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca, ca_before = a[i - 1], a[i - 2] if i > 1 else None
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        left = current[0]
+        best = over
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            # Cheapest of substitution, deletion and insertion, then transposition.
+            cell = previous[j - 1] + (ca != cb)
+            if previous[j] + 1 < cell:
+                cell = previous[j] + 1
+            if left + 1 < cell:
+                cell = left + 1
+            if ca_before == cb and j > 1 and ca == b[j - 2] and previous_previous[j - 2] + 1 < cell:
+                cell = previous_previous[j - 2] + 1
+            if cell > over:
+                cell = over
+            current[j] = left = cell
+            if cell < best:
+                best = cell
+        # No cell of a later row is smaller than the smallest of this one.
+        if best > limit:
+            return over
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+def _letter_difference(a, b):
+    """Lower bound of the edit distance: the larger count of characters one string has in excess."""
+    extra = Counter(a)
+    extra.subtract(b)
+    surplus = sum(n for n in extra.values() if n > 0)
+    return max(surplus, surplus - len(a) + len(b))
+
+
+def similarity(a, b, minimum=None):
+    """1.0 for identical strings, 0.0 for completely different ones.
+
+    With minimum, a similarity that would fall below it is not computed
+    exactly and 0.0 is returned instead.
+    """
+    if not a or not b:
+        return 0.0
+    length = max(len(a), len(b))
+    if minimum is None or minimum <= 0:
+        return 1 - damerau_levenshtein(a, b) / length
+    limit = int((1 - minimum) * length + 1e-9)
+    # Every edit adds or removes at most one character of each kind, so
+    # strings whose letters differ by more than limit are skipped outright.
+    if limit < 0 or _letter_difference(a, b) > limit:
+        return 0.0
+    distance = damerau_levenshtein(a, b, limit)
+    return 0.0 if distance > limit else 1 - distance / length
+
+
+def _similarity_bound(a, b, minimum=None):
+    """An upper bound of similarity() from character counts alone."""
+    if not a or not b:
+        return 0.0
+    return 1 - _letter_difference(a, b) / max(len(a), len(b))
+
+
+def score(query, name, phone, email, name_phonetic=None, minimum=None, estimate=False):
+    """Ranks how well a contact matches a query; higher is better.
+
+    With minimum, a score below it may come back lower than it really is,
+    which lets the edit distances of contacts that cannot reach it stop early.
+    With estimate, an upper bound of the score is returned instead, computed
+    from character counts without any edit distance.
+    """
+    compare = _similarity_bound if estimate else similarity
+    query = query.strip().lower()
+    query_words = words(query)
+    name = (name or "").lower()
+
+    # Names that sound alike get a boost proportional to how many query words match.
+    boost = 0.0
+    query_codes = phonetic_key(query).split()
+    if query_codes:
+        codes = set((name_phonetic if name_phonetic is not None else phonetic_key(name)).split())
+        boost = 0.3 * sum(code in codes for code in query_codes) / len(query_codes)
+    floor = None if minimum is None else minimum - boost
+
+    best = compare(query, name, floor)
+    if len(query_words) == 1:
+        best = max([best] + [compare(query_words[0], word, floor) for word in words(name)])
+    if email:
+        best = max(best, compare(query, email.split("@", 1)[0].lower(), floor))
+    digits = phone_digits(query)
+    if len(digits) >= 3 and phone:
+        contact_digits = phone_digits(phone)
+        best = max(best, compare(digits, contact_digits[-len(digits):], floor))
+    return best + boost
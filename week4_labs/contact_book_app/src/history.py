@@ -0,0 +1,121 @@
+# history.py
+"""Undo/redo for contact edits."""
+import threading
+from collections import namedtuple
+
+# before and after map contact_id -> (name, phone, email), or None when the
+# contact does not exist on that side of the command.
+Command = namedtuple("Command", "label before after")
+
+
+def _image(row):
+    return tuple(row[1:]) if row is not None else None
+
+
+class History:
+    """Runs add/update/delete through a ContactRepository and remembers how to reverse them.
+
+    Each command keeps only the row images of the contacts it touched. Undoing
+    or redoing several commands folds their images into one state per contact
+    and writes them in a single transaction, so undoing hundreds of edits
+    costs about as much as one bulk write.
+    """
+
+    def __init__(self, repo, limit=500):
+        self.repo = repo
+        self.limit = limit
+        self._undo = []   # oldest first
+        self._redo = []   # next command to redo last
+        self._lock = threading.Lock()
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def labels(self):
+        """Returns the labels of the next command to undo and to redo (None if there is none)."""
+        with self._lock:
+            return (self._undo[-1].label if self._undo else None,
+                    self._redo[-1].label if self._redo else None)
+
+    # Commands
+
+    def add(self, name, phone, email):
+        """Adds a contact and returns its row."""
+        with self._lock:
+            contact_id = self.repo.add(name, phone, email)
+            self._record("Add", {contact_id: None}, {contact_id: (name, phone, email)})
+        return contact_id, name, phone, email
+
+    def update(self, contact_id, name, phone, email):
+        """Updates a contact and returns its new row."""
+        with self._lock:
+            before = _image(self.repo.get(contact_id))
+            self.repo.update(contact_id, name, phone, email)
+            if before is not None:
+                self._record("Edit", {contact_id: before}, {contact_id: (name, phone, email)})
+        return contact_id, name, phone, email
+
+    def delete(self, contact_id):
+        """Deletes a contact."""
+        with self._lock:
+            before = _image(self.repo.get(contact_id))
+            self.repo.delete(contact_id)
+            if before is not None:
+                self._record("Delete", {contact_id: before}, {contact_id: None})
+
+    def merge(self, keep_id, other_ids):
+        """Merges duplicates (see ContactRepository.merge) and returns the merged row."""
+        with self._lock:
+            ids = {keep_id, *other_ids}
+            before = {contact_id: _image(self.repo.get(contact_id)) for contact_id in ids}
+            merged = self.repo.merge(keep_id, other_ids)
+            if merged is not None:
+                after = dict.fromkeys(ids)
+                after[keep_id] = _image(merged)
+                self._record("Merge", before, after)
+        return merged
+
+    # Undo / redo
+
+    def undo(self, count=1):
+        """Reverts the last count commands; returns {contact_id: row or None} of what changed."""
+        with self._lock:
+            commands = self._undo[-count:] if count > 0 else []
+            images = {}
+            # Newest first, so a contact touched several times ends up as it
+            # was before the oldest of the commands.
+            for command in reversed(commands):
+                images.update(command.before)
+            rows = self.repo.apply_images(images)
+            del self._undo[len(self._undo) - len(commands):]
+            self._redo.extend(reversed(commands))
+            return rows
+
+    def redo(self, count=1):
+        """Re-applies the last count undone commands; returns what changed like undo()."""
+        with self._lock:
+            commands = list(reversed(self._redo[-count:])) if count > 0 else []
+            images = {}
+            for command in commands:
+                images.update(command.after)
+            rows = self.repo.apply_images(images)
+            del self._redo[len(self._redo) - len(commands):]
+            self._undo.extend(commands)
+            return rows
+
+    def clear(self):
+        """Forgets all commands."""
+        with self._lock:
+            self._undo.clear()
+            self._redo.clear()
+
+    def _record(self, label, before, after):
+        self._undo.append(Command(label, before, after))
+        if len(self._undo) > self.limit:
+            del self._undo[:len(self._undo) - self.limit]
+        self._redo.clear()
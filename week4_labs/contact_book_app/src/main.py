@@ -1,7 +1,9 @@
 # main.py
 import flet as ft
 from database import init_db
-from app_logic import display_contacts, add_contact, theme_change
+from repository import ContactRepository
+from async_store import AsyncContactStore
+from app_logic import display_contacts, add_contact, theme_change, import_contacts_file, export_contacts_file, undo_changes
 
 def main(page: ft.Page):
     page.title = "Contact Book"
@@ -11,7 +13,7 @@ def main(page: ft.Page):
     page.window_height = 600
     page.theme_mode = ft.ThemeMode.LIGHT
 
-    db_conn = init_db()
+    store = AsyncContactStore(ContactRepository(init_db()))
 
     name_input = ft.TextField(label="Name", width=350, icon=ft.Icons.PERSON)
     phone_input = ft.TextField(label="Phone", width=350, icon=ft.Icons.PHONE)
@@ -23,7 +25,7 @@ def main(page: ft.Page):
 
     add_button = ft.ElevatedButton(
         text="Add Contact",
-        on_click=lambda e: add_contact(page, inputs, contacts_list_view, db_conn)
+        on_click=lambda e: page.run_task(add_contact, page, inputs, contacts_list_view, store)
     )
 
     theme_change_switch = ft.Switch(label="Light theme", 
@@ -32,7 +34,46 @@ def main(page: ft.Page):
                                         ft.ControlState.SELECTED: ft.Icons.DARK_MODE
                                         }, 
                                     on_change=lambda e: theme_change(page, theme_change_switch))
-    search_box = ft.TextField(label="Search", width=350, icon=ft.Icons.SEARCH, on_change=lambda e: display_contacts(page, contacts_list_view, db_conn, search_query=e.control.value))
+    transfer_status = ft.Text(size=12)
+    import_picker = ft.FilePicker(
+        on_result=lambda e: e.files and page.run_task(import_contacts_file, page, e.files[0].path, contacts_list_view, store, transfer_status)
+    )
+    export_picker = ft.FilePicker(
+        on_result=lambda e: e.path and page.run_task(export_contacts_file, page, e.path, store, transfer_status)
+    )
+    page.overlay.extend([import_picker, export_picker])
+
+    import_button = ft.OutlinedButton(
+        text="Import",
+        icon=ft.Icons.UPLOAD_FILE,
+        on_click=lambda e: import_picker.pick_files(allowed_extensions=["csv", "vcf"])
+    )
+    export_button = ft.OutlinedButton(
+        text="Export",
+        icon=ft.Icons.DOWNLOAD,
+        on_click=lambda e: export_picker.save_file(file_name="contacts.csv", allowed_extensions=["csv", "vcf"])
+    )
+
+    search_box = ft.TextField(label="Search", width=350, icon=ft.Icons.SEARCH, on_change=lambda e: page.run_task(display_contacts, page, contacts_list_view, store, e.control.value))
+
+    undo_button = ft.IconButton(
+        icon=ft.Icons.UNDO,
+        tooltip="Undo (Ctrl+Z)",
+        on_click=lambda e: page.run_task(undo_changes, page, contacts_list_view, store, search_box.value)
+    )
+    redo_button = ft.IconButton(
+        icon=ft.Icons.REDO,
+        tooltip="Redo (Ctrl+Y)",
+        on_click=lambda e: page.run_task(undo_changes, page, contacts_list_view, store, search_box.value, True)
+    )
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        if e.ctrl and e.key == "Z":
+            page.run_task(undo_changes, page, contacts_list_view, store, search_box.value, e.shift)
+        elif e.ctrl and e.key == "Y":
+            page.run_task(undo_changes, page, contacts_list_view, store, search_box.value, True)
+
+    page.on_keyboard_event = on_keyboard
     
     page.add(
         ft.Column(
@@ -66,12 +107,21 @@ def main(page: ft.Page):
                     ], 
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                 ),
+                ft.Row(
+                    [
+                        import_button,
+                        export_button,
+                        undo_button,
+                        redo_button,
+                        transfer_status,
+                    ]
+                ),
                 contacts_list_view,
             ],
             expand=True,
         )
     )
-    display_contacts(page, contacts_list_view, db_conn, search_query=None)
+    page.run_task(display_contacts, page, contacts_list_view, store)
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
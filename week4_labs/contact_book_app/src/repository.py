@@ -0,0 +1,248 @@
+# repository.py
+"""Cached access to the contacts table."""
+import threading
+from collections import OrderedDict
+
+from database import (
+    add_contact_db,
+    apply_row_images_db,
+    delete_contact_db,
+    duplicate_clusters_db,
+    find_by_email_db,
+    find_by_phone_db,
+    fuzzy_search_db,
+    get_all_contacts_db,
+    get_contact_db,
+    merge_contacts_db,
+    update_contact_db,
+)
+
+PAGE_SIZE = 50
+
+
+def normalize_term(term):
+    """Normalizes a search term so equivalent searches share a cache entry."""
+    return (term or "").strip().lower()
+
+
+def term_matches(term, name):
+    """Whether a contact named name can appear in the results for normalized term."""
+    # LIKE treats % and _ as wildcards; be conservative and assume they match.
+    if not term or "%" in term or "_" in term:
+        return True
+    return term in name.lower()
+
+
+class ContactRepository:
+    """Wraps database.py with a bounded LRU cache of contacts and search result pages.
+
+    Reads are served from memory when possible. Writes go straight to the
+    database and then drop only the cache entries they could have changed.
+    """
+
+    def __init__(self, db, page_size=PAGE_SIZE, max_contacts=5000, max_queries=200):
+        self.db = db
+        self.page_size = page_size
+        self.max_contacts = max_contacts
+        self.max_queries = max_queries
+        self.hits = 0
+        self.misses = 0
+        self._contacts = OrderedDict()  # id -> row
+        self._queries = OrderedDict()   # (term, page) -> list of rows
+        self._fuzzy = OrderedDict()     # term -> ranked rows, dropped on any write
+        self._generation = 0            # bumped on every write, guards racing fills
+        self._lock = threading.RLock()
+
+    # Reads
+
+    def get(self, contact_id):
+        """Returns the contact row with the given id, or None."""
+        with self._lock:
+            row = self._contacts.get(contact_id)
+            if row is not None:
+                self._contacts.move_to_end(contact_id)
+                self.hits += 1
+                return row
+            self.misses += 1
+            generation = self._generation
+
+        row = get_contact_db(self.db, contact_id)
+        if row is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._remember_contacts([row])
+        return row
+
+    def search(self, term=None, page=0):
+        """Returns one page of contacts whose name contains term (all contacts if empty)."""
+        key = (normalize_term(term), page)
+        with self._lock:
+            rows = self._queries.get(key)
+            if rows is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+            generation = self._generation
+
+        rows = get_all_contacts_db(self.db, key[0], limit=self.page_size, offset=page * self.page_size)
+        with self._lock:
+            if generation == self._generation:
+                self._queries[key] = rows
+                if len(self._queries) > self.max_queries:
+                    self._queries.popitem(last=False)
+                self._remember_contacts(rows)
+        return rows
+
+    def fuzzy_search(self, term, limit=10):
+        """Returns up to limit contacts resembling term, best match first."""
+        key = normalize_term(term)
+        with self._lock:
+            rows = self._fuzzy.get(key)
+            if rows is not None:
+                self._fuzzy.move_to_end(key)
+                self.hits += 1
+                return rows[:limit]
+            self.misses += 1
+            generation = self._generation
+
+        rows = fuzzy_search_db(self.db, key, limit)
+        with self._lock:
+            if generation == self._generation:
+                self._fuzzy[key] = rows
+                if len(self._fuzzy) > self.max_queries:
+                    self._fuzzy.popitem(last=False)
+        return rows
+
+    def find_by_phone(self, phone):
+        """Returns the contacts with this phone number, however it is formatted."""
+        return find_by_phone_db(self.db, phone)
+
+    def find_by_email(self, email):
+        """Returns the contacts with this email address, ignoring case."""
+        return find_by_email_db(self.db, email)
+
+    def duplicate_clusters(self):
+        """Returns groups of contacts sharing a phone number or email address."""
+        return duplicate_clusters_db(self.db)
+
+    # Writes
+
+    def add(self, name, phone, email):
+        """Adds a contact and returns its id."""
+        contact_id = add_contact_db(self.db, name, phone, email)
+        with self._lock:
+            self._generation += 1
+            self._fuzzy.clear()
+            # Results are ordered by id, so a new contact can only land on the
+            # last, partially filled page of each search it matches.
+            for key, rows in list(self._queries.items()):
+                if term_matches(key[0], name) and len(rows) < self.page_size:
+                    del self._queries[key]
+        return contact_id
+
+    def update(self, contact_id, name, phone, email):
+        """Updates a contact."""
+        old_name = self._name_of(contact_id)
+        update_contact_db(self.db, contact_id, name, phone, email)
+        with self._lock:
+            self._generation += 1
+            self._fuzzy.clear()
+            self._contacts.pop(contact_id, None)
+            for term in {key[0] for key in self._queries}:
+                if term_matches(term, name) or old_name is None or term_matches(term, old_name):
+                    self._drop_pages_after(term, contact_id)
+
+    def delete(self, contact_id):
+        """Deletes a contact."""
+        old_name = self._name_of(contact_id)
+        delete_contact_db(self.db, contact_id)
+        with self._lock:
+            self._generation += 1
+            self._fuzzy.clear()
+            self._contacts.pop(contact_id, None)
+            for term in {key[0] for key in self._queries}:
+                if old_name is None or term_matches(term, old_name):
+                    self._drop_pages_after(term, contact_id)
+
+    def merge(self, keep_id, other_ids):
+        """Merges other_ids into keep_id (see merge_contacts_db) and returns the merged row."""
+        affected = {keep_id, *other_ids}
+        names = [self._name_of(contact_id) for contact_id in affected]
+        merged = merge_contacts_db(self.db, keep_id, other_ids)
+        with self._lock:
+            self._generation += 1
+            self._fuzzy.clear()
+            for contact_id in affected:
+                self._contacts.pop(contact_id, None)
+            first_id = min(affected)
+            for term in {key[0] for key in self._queries}:
+                if None in names or any(term_matches(term, name) for name in names):
+                    self._drop_pages_after(term, first_id)
+        return merged
+
+    def apply_images(self, images):
+        """Restores contacts to given states in one transaction (see apply_row_images_db).
+
+        images maps contact_id to (name, phone, email), or None to delete it.
+        Returns the resulting {contact_id: row or None}.
+        """
+        if not images:
+            return {}
+        # Names before (contacts that do not exist yet have none) and after.
+        names = [name for name in map(self._name_of, images) if name is not None]
+        names += [row[0] for row in images.values() if row is not None]
+        rows = apply_row_images_db(self.db, images.items())
+        with self._lock:
+            self._generation += 1
+            self._fuzzy.clear()
+            for contact_id in images:
+                self._contacts.pop(contact_id, None)
+            first_id = min(images)
+            for term in {key[0] for key in self._queries}:
+                if any(term_matches(term, name) for name in names):
+                    self._drop_pages_after(term, first_id)
+        return rows
+
+    def invalidate_all(self):
+        """Forgets everything, e.g. after a bulk import that bypassed the repository."""
+        with self._lock:
+            self._generation += 1
+            self._contacts.clear()
+            self._queries.clear()
+            self._fuzzy.clear()
+
+    def stats(self):
+        """Returns cache hit/miss counters and current sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "cached_contacts": len(self._contacts),
+                "cached_queries": len(self._queries),
+            }
+
+    # Helpers
+
+    def _remember_contacts(self, rows):
+        for row in rows:
+            self._contacts[row[0]] = row
+            self._contacts.move_to_end(row[0])
+        while len(self._contacts) > self.max_contacts:
+            self._contacts.popitem(last=False)
+
+    def _name_of(self, contact_id):
+        with self._lock:
+            row = self._contacts.get(contact_id)
+        if row is None:
+            row = get_contact_db(self.db, contact_id)
+        return row[1] if row else None
+
+    def _drop_pages_after(self, term, contact_id):
+        # Results are ordered by id, so a contact changing, joining or leaving a
+        # search only affects the partial last page and the pages ending at or after its id.
+        for key in [k for k, rows in self._queries.items()
+                    if k[0] == term and (len(rows) < self.page_size or rows[-1][0] >= contact_id)]:
+            del self._queries[key]
@@ -0,0 +1,192 @@
+# sync.py
+"""Incremental export and sync of the contact database using its change journal.
+
+Triggers (migration 5 in database.py) append one contact_changes entry per
+insert, update or delete, holding the row as it is after the change. A peer
+remembers the last seq it applied and only asks for newer entries. Because
+entries carry whole rows rather than diffs, applying them is idempotent and
+older entries for the same contact can be dropped by compact_journal().
+"""
+import json
+import os
+
+from database import apply_row_images, init_db
+
+# Journal entries read and applied per transaction.
+BATCH_SIZE = 5000
+
+CHANGE_FIELDS = ("seq", "id", "op", "name", "phone", "email")
+
+
+def current_seq(db):
+    """Returns the seq of the newest journal entry (0 for an empty journal)."""
+    with db.reader() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'contact_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def iter_changes(db, since_seq=0, batch_size=BATCH_SIZE):
+    """Yields lists of (seq, contact_id, op, name, phone, email) entries newer than since_seq."""
+    with db.reader() as conn:
+        cursor = conn.execute(
+            "SELECT seq, contact_id, op, name, phone, email FROM contact_changes WHERE seq > ? ORDER BY seq",
+            (since_seq,)
+        )
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+
+
+def changes_since(db, since_seq=0, limit=None):
+    """Returns the journal entries newer than since_seq, oldest first."""
+    sql = "SELECT seq, contact_id, op, name, phone, email FROM contact_changes WHERE seq > ? ORDER BY seq"
+    params = [since_seq]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with db.reader() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def get_peer_seq(db, peer, column="pulled_seq"):
+    """Returns the pulled_seq or pushed_seq recorded for peer, or 0 if none."""
+    with db.reader() as conn:
+        row = conn.execute(f"SELECT {_seq_column(column)} FROM sync_state WHERE peer = ?", (peer,)).fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def _seq_column(column):
+    if column not in ("pulled_seq", "pushed_seq"):
+        raise ValueError(f"Unknown sync_state column: {column}")
+    return column
+
+
+def _set_peer_seq(conn, peer, column, seq):
+    column = _seq_column(column)
+    conn.execute(
+        f"INSERT INTO sync_state (peer, {column}) VALUES (?, ?)"
+        f" ON CONFLICT (peer) DO UPDATE SET {column} = excluded.{column}",
+        (peer, seq)
+    )
+
+
+def set_peer_seq(db, peer, seq, column="pulled_seq"):
+    """Records how far this database and peer are in sync (see sync_state in database.py)."""
+    with db.writer() as conn:
+        _set_peer_seq(conn, peer, column, seq)
+
+
+def _apply_batch(conn, batch):
+    # Later entries win; the journal is ordered by seq.
+    images = {}
+    for _, contact_id, op, name, phone, email in batch:
+        images[contact_id] = None if op == "delete" else (name, phone, email)
+    apply_row_images(conn, images.items())
+
+
+def apply_changes(db, batches, peer=None, progress=None):
+    """Applies batches of journal entries to a replica database.
+
+    Each batch is applied in one write transaction together with the peer's
+    new pulled_seq in sync_state, so an interrupted sync resumes where it stopped.
+    Returns (applied, last_seq).
+    """
+    applied = 0
+    last_seq = get_peer_seq(db, peer) if peer else 0
+    for batch in batches:
+        batch = [entry for entry in batch if entry[0] > last_seq]
+        if not batch:
+            continue
+        with db.writer() as conn:
+            _apply_batch(conn, batch)
+            last_seq = batch[-1][0]
+            if peer:
+                _set_peer_seq(conn, peer, "pulled_seq", last_seq)
+        applied += len(batch)
+        if progress:
+            progress(applied)
+    return applied, last_seq
+
+
+def export_changes(db, path, since_seq=0, progress=None):
+    """Writes the journal entries newer than since_seq to a JSON Lines file.
+
+    Returns (written, last_seq); pass last_seq as since_seq next time to ship
+    only what changed in between.
+    """
+    written = 0
+    last_seq = since_seq
+    with open(path, "w", encoding="utf-8") as f:
+        for batch in iter_changes(db, since_seq):
+            f.writelines(json.dumps(dict(zip(CHANGE_FIELDS, entry))) + "\n" for entry in batch)
+            written += len(batch)
+            last_seq = batch[-1][0]
+            if progress:
+                progress(written)
+    return written, last_seq
+
+
+def read_changes(path, batch_size=BATCH_SIZE):
+    """Yields batches of journal entries from a file written by export_changes."""
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            change = json.loads(line)
+            batch.append(tuple(change.get(field) for field in CHANGE_FIELDS))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def import_changes(db, path, peer=None, progress=None):
+    """Applies a delta file from export_changes; returns (applied, last_seq)."""
+    return apply_changes(db, read_changes(path), peer=peer, progress=progress)
+
+
+def sync_database(db, target_path, progress=None):
+    """Brings the replica database at target_path up to date with db.
+
+    The replica keeps the seq it has applied from this database in its own
+    sync_state (pulled_seq), and this database records how far the replica
+    got (pushed_seq) so compact_journal() knows which deletes are safe to
+    forget. Returns (applied, last_seq).
+    """
+    source = os.path.abspath(db.path)
+    target_path = os.path.abspath(target_path)
+    target = init_db(target_path, readers=1)
+    try:
+        since_seq = get_peer_seq(target, source)
+        applied, last_seq = apply_changes(target, iter_changes(db, since_seq), peer=source, progress=progress)
+    finally:
+        target.close()
+    set_peer_seq(db, target_path, last_seq, column="pushed_seq")
+    return applied, last_seq
+
+
+def compact_journal(db, through_seq=None):
+    """Shrinks the journal without changing what a peer ends up with.
+
+    Only the newest entry per contact is kept. Delete entries up to
+    through_seq are dropped as well; by default that is the lowest
+    pushed_seq in sync_state, and deletes are kept if nothing was pushed
+    yet. Returns the number of entries removed.
+    """
+    with db.writer() as conn:
+        if through_seq is None:
+            through_seq = conn.execute("SELECT MIN(pushed_seq) FROM sync_state").fetchone()[0]
+        removed = conn.execute('''
+            DELETE FROM contact_changes
+            WHERE seq < (SELECT MAX(seq) FROM contact_changes newer
+                         WHERE newer.contact_id = contact_changes.contact_id)
+        ''').rowcount
+        if through_seq is not None:
+            removed += conn.execute(
+                "DELETE FROM contact_changes WHERE op = 'delete' AND seq <= ?", (through_seq,)
+            ).rowcount
+    return removed